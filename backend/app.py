@@ -1,11 +1,14 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from database import init_db
+from services.idempotency import idempotency_cli
+from services import content_index, content_snapshot, events, feed_cache, notifications, reminder_dispatcher
 import os
 from dotenv import load_dotenv
 
 # Import blueprints
 from routes.auth import auth_bp
+from routes.events import events_bp
 from routes.health_feed import health_feed_bp
 from routes.health_workers import health_workers_bp
 from routes.reminders import reminders_bp
@@ -34,7 +37,24 @@ def create_app(test_config=None):
             SECRET_KEY='dev',
             SQLALCHEMY_DATABASE_URI=db_url,
             SQLALCHEMY_TRACK_MODIFICATIONS=False,
-            SQLALCHEMY_ENGINE_OPTIONS={'pool_pre_ping': True}
+            SQLALCHEMY_ENGINE_OPTIONS={'pool_pre_ping': True},
+            # Fire reminders from this process; otherwise run `flask reminders dispatch`
+            REMINDER_DISPATCHER_ENABLED=os.environ.get('REMINDER_DISPATCHER_ENABLED') == '1',
+            # After downtime, 'fire' or 'skip' reminders that fell due while nothing was running
+            REMINDER_CATCH_UP=os.environ.get('REMINDER_CATCH_UP', 'fire'),
+            # Serve /api/health-feed/search from an in-process index built on the first request
+            CONTENT_INDEX_ENABLED=os.environ.get('CONTENT_INDEX_ENABLED', '1') == '1',
+            # Serve feeds and content by id from a memory-mapped snapshot shared by all workers
+            CONTENT_SNAPSHOT_ENABLED=os.environ.get('CONTENT_SNAPSHOT_ENABLED', '1') == '1',
+            NOTIFICATION_WORKER_ENABLED=os.environ.get('NOTIFICATION_WORKER_ENABLED') == '1',
+            # Delivery channel for reminders: file (development), sms, push (SMS for users without a device token) or ivr
+            REMINDER_CHANNEL=os.environ.get('REMINDER_CHANNEL', 'file'),
+            SMS_GATEWAY_URL=os.environ.get('SMS_GATEWAY_URL'),
+            SMS_GATEWAY_TOKEN=os.environ.get('SMS_GATEWAY_TOKEN'),
+            PUSH_GATEWAY_URL=os.environ.get('PUSH_GATEWAY_URL'),
+            PUSH_GATEWAY_TOKEN=os.environ.get('PUSH_GATEWAY_TOKEN'),
+            IVR_GATEWAY_URL=os.environ.get('IVR_GATEWAY_URL'),
+            IVR_GATEWAY_TOKEN=os.environ.get('IVR_GATEWAY_TOKEN')
         )
     else:
         # Load the test config if passed in
@@ -54,11 +74,32 @@ def create_app(test_config=None):
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(events_bp, url_prefix='/api/events')
     app.register_blueprint(health_feed_bp, url_prefix='/api/health-feed')
     app.register_blueprint(health_workers_bp, url_prefix='/api/health-workers')
     app.register_blueprint(reminders_bp, url_prefix='/api/reminders')
     app.register_blueprint(vitals_bp, url_prefix='/api/vitals')
     
+    # Register CLI commands
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(notifications.notifications_cli)
+    
+    # Per-process hub behind /api/events streams, fed from the stream_events table
+    events.init_app(app)
+    
+    # In-memory search index over health content
+    content_index.init_app(app)
+    
+    # Per-segment personalized feed cache
+    feed_cache.init_app(app)
+    
+    # Memory-mapped health content snapshot shared by all workers
+    content_snapshot.init_app(app)
+    
+    # Reminder dispatcher and notification delivery (started only when enabled in config)
+    reminder_dispatcher.init_app(app)
+    notifications.init_app(app)
+    
     # Root route
     @app.route('/')
     def index():
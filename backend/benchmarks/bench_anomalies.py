@@ -0,0 +1,68 @@
+"""Throughput of the per-patient anomaly engine in readings/sec.
+
+    python benchmarks/bench_anomalies.py --users 1000 --vitals-per-user 500
+
+Reports three numbers:
+  * fold        - the in-memory Welford/EWMA update and scoring alone
+  * replay      - bulk recompute from vital_records (streaming + writes)
+  * incremental - anomalies.record_vitals() for small write batches, as on /log
+"""
+import time
+from datetime import datetime
+
+from common import base_parser, make_app, rng_from, seed_users, seed_vitals
+from database import db
+from models.vitals import VitalRecord
+from services import anomalies
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--vitals-per-user', type=int, default=400)
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--incremental-writes', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+    with app.app_context():
+        user_ids = seed_users(args.users, rng)
+        total = seed_vitals(user_ids, args.vitals_per_user, 365, rng)
+        print(f'Seeded {total} readings for {len(user_ids)} users')
+
+        # Pure fold over pre-fetched tuples
+        metric_names = list(anomalies.METRICS)
+        rows = db.session.execute(
+            db.select(VitalRecord.id, VitalRecord.user_id, VitalRecord.recorded_at,
+                      *[getattr(VitalRecord, m) for m in metric_names])
+            .order_by(VitalRecord.user_id, VitalRecord.recorded_at)
+        ).all()
+        readings = [(r[0], r[1], r[2], dict(zip(metric_names, r[3:]))) for r in rows]
+        start = time.perf_counter()
+        flagged, processed = anomalies.fold(readings, {}, anomalies.settings())
+        fold_seconds = time.perf_counter() - start
+        print(f'fold:        {processed / fold_seconds:12.0f} readings/s  ({len(flagged)} anomalies)')
+
+        start = time.perf_counter()
+        _, replayed = anomalies.replay(chunk_size=args.chunk_size)
+        replay_seconds = time.perf_counter() - start
+        print(f'replay:      {replayed / replay_seconds:12.0f} readings/s  ({replay_seconds:.2f}s total)')
+
+        # Incremental path: one record_vitals() call + commit per new reading
+        now = datetime.utcnow()
+        sample = [
+            VitalRecord(id=r[0], user_id=r[1], recorded_at=now, **r[3])
+            for r in rng.sample(readings, min(args.incremental_writes, len(readings)))
+        ]
+        start = time.perf_counter()
+        for vital in sample:
+            anomalies.record_vitals([vital])
+            db.session.commit()
+        incremental_seconds = time.perf_counter() - start
+        print(f'incremental: {len(sample) / incremental_seconds:12.0f} readings/s  '
+              f'({incremental_seconds / len(sample) * 1000:.3f} ms per write incl. commit)')
+
+
+if __name__ == '__main__':
+    main()
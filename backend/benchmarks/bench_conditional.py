@@ -0,0 +1,57 @@
+"""Conditional GET: full responses against 304 revalidations on the read endpoints.
+
+    python benchmarks/bench_conditional.py --content 20000 --vitals 2000
+
+Seeds health content and one user with --vitals readings and a few
+reminders, then requests each endpoint through the test client, once
+unconditionally and once with the ETag it returned in If-None-Match,
+reporting latency and bytes sent for both. Feeds and content by id are
+read from the database here (no snapshot or feed cache); a 304 costs the
+validator query and sends no body.
+"""
+from datetime import datetime
+
+from common import base_parser, make_app, rng_from, seed_health_content, seed_reminders, seed_users, seed_vitals, timed
+from database import db
+from models.health_content import HealthContent
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--content', type=int, default=20000, help='Articles to seed')
+    parser.add_argument('--vitals', type=int, default=2000, help='Readings for the user')
+    parser.add_argument('--reminders', type=int, default=20, help='Reminders for the user')
+    args = parser.parse_args()
+
+    # Feeds from the database on every request, without the per-segment cache
+    app = make_app(args.database_url, {'CONTENT_INDEX_ENABLED': False, 'FEED_CACHE_SIZE': 0})
+    rng = rng_from(args)
+    with app.app_context():
+        seed_health_content(args.content, rng, words=60)
+        user_id = seed_users(1, rng)[0]
+        seed_vitals([user_id], args.vitals, 30, rng)
+        seed_reminders([user_id], args.reminders, datetime.utcnow(), 86400, rng)
+        content_id = db.session.scalar(db.select(HealthContent.id).where(HealthContent.is_active == True).limit(1))
+
+    client = app.test_client()
+    endpoints = [
+        ('feed', f'/api/health-feed/user/{user_id}?limit=50'),
+        ('content by id', f'/api/health-feed/content/{content_id}'),
+        ('categories', '/api/health-feed/categories'),
+        ('conditions', '/api/health-feed/conditions'),
+        ('vitals', f'/api/vitals/user/{user_id}?limit=200'),
+        ('reminders', f'/api/reminders/user/{user_id}'),
+    ]
+    print(f'{"endpoint":>14s} {"200 p50":>9s} {"p95":>8s} {"bytes":>7s} {"304 p50":>9s} {"p95":>8s} {"bytes":>6s}')
+    for label, url in endpoints:
+        full_p50, full_p95, full = timed(lambda: client.get(url), args.repeat)
+        assert full.status_code == 200, full.get_data(as_text=True)
+        etag = full.headers['ETag']
+        fresh_p50, fresh_p95, fresh = timed(lambda: client.get(url, headers={'If-None-Match': etag}), args.repeat)
+        assert fresh.status_code == 304, fresh.status_code
+        print(f'{label:>14s} {full_p50:8.2f}ms {full_p95:6.2f}ms {len(full.data):7d} '
+              f'{fresh_p50:8.2f}ms {fresh_p95:6.2f}ms {len(fresh.data):6d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""In-memory content index: build time, memory and lookup latency against the database.
+
+    python benchmarks/bench_content_index.py --content 100000
+
+Seeds --content articles like bench_content_search.py, builds a
+ContentIndex from them (reporting time, peak traced memory, terms and
+postings), then times ContentIndex.search() against content_search.search(),
+the database full-text path, for common, mid-frequency and rare words, a
+two-word query, a prefix and a romanized query matched through
+transliteration keys. Finally it times incremental updates of single
+articles. The p95 column is the first, cold query, which ranks the term's
+postings; later queries read the cached ranking.
+"""
+import time
+import tracemalloc
+
+from common import VOCABULARY, base_parser, make_app, rng_from, seed_health_content, timed
+from database import db
+from models.health_content import HealthContent
+from services import content_search
+from services.content_index import ContentIndex
+
+ROMANIZED = {'hindi': 'madhumeh', 'marathi': 'madhumeh', 'tamil': 'neerizhivu', 'english': 'diabetis'}
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--content', type=int, default=100000, help='Articles to seed')
+    parser.add_argument('--words', type=int, default=60, help='Words per article body')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--languages', default='hindi,english', help='Comma-separated languages to query')
+    parser.add_argument('--updates', type=int, default=1000, help='Incremental article updates to time')
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+
+    with app.app_context():
+        seed_health_content(args.content, rng, words=args.words)
+
+        index = ContentIndex()
+        started = time.perf_counter()
+        index.build()
+        elapsed = time.perf_counter() - started
+        stats = index.stats()
+
+        # A second build under tracemalloc, which slows it down too much to time
+        tracemalloc.start()
+        measured = ContentIndex()
+        measured.build()
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del measured
+        print(f'built index over {stats["documents"]} active articles in {elapsed:.1f}s: '
+              f'{stats["terms"]} terms, {stats["postings"]} postings, '
+              f'{held / 2 ** 20:.0f} MiB held ({peak / 2 ** 20:.0f} MiB peak)')
+
+        print(f'{"language":>8s} {"query":>24s} {"memory p50":>11s} {"p95":>8s} {"hits":>5s} '
+              f'{"database p50":>13s} {"p95":>8s} {"hits":>5s}')
+        for language in args.languages.split(','):
+            common, mid = VOCABULARY[language][0], VOCABULARY[language][-1]
+            body = db.session.scalar(
+                db.select(HealthContent.content).where(HealthContent.language == language).limit(1)
+            )
+            queries = [
+                ('common', common),
+                ('mid', mid),
+                ('rare', rng.choice(body.split())),
+                ('two words', f'{common} {mid}'),
+                ('prefix', common[:3]),
+                ('romanized', ROMANIZED[language]),
+            ]
+            for label, query_text in queries:
+                memory_p50, memory_p95, memory_rows = timed(
+                    lambda: index.search(query_text, language, limit=args.limit), args.repeat)
+                db_p50, db_p95, (_, db_rows) = timed(
+                    lambda: content_search.search(query_text, language, limit=args.limit), args.repeat)
+                db.session.rollback()
+                print(f'{language:>8s} {f"{label} {query_text}":>24s} {memory_p50:10.3f}ms {memory_p95:6.3f}ms '
+                      f'{len(memory_rows):5d} {db_p50:12.2f}ms {db_p95:6.2f}ms {len(db_rows):5d}')
+
+        ids = list(db.session.scalars(db.select(HealthContent.id).where(HealthContent.is_active == True)))
+        rows = db.session.scalars(
+            db.select(HealthContent).where(HealthContent.id.in_(rng.sample(ids, min(args.updates, len(ids)))))
+        ).all()
+        started = time.perf_counter()
+        for content in rows:
+            index.add(content)
+        elapsed = time.perf_counter() - started
+        print(f'{len(rows)} incremental updates: {elapsed / max(len(rows), 1) * 1000:.3f}ms each')
+
+
+if __name__ == '__main__':
+    main()
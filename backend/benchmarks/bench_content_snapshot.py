@@ -0,0 +1,95 @@
+"""Memory-mapped content snapshot: build time, size, per-worker memory and read latency.
+
+    python benchmarks/bench_content_snapshot.py --content 100000
+
+Seeds --content articles, writes a snapshot and reports its build time and
+file size, then the Python heap a worker needs to hold the same content as
+to_dict()s (what a per-process cache of every article would hold) against
+mapping the snapshot, which lives once in the page cache whatever the
+number of workers. Finally it times personalized feeds and reads by id:
+the database query with to_dict() and jsonify, against the snapshot's
+feed merge and spliced response. With 100k articles on SQLite a worker
+holds about 150 MiB less, feeds take tens of microseconds instead of
+20-50ms, and a read by id a few microseconds.
+"""
+import os
+import time
+import tracemalloc
+
+from common import CATEGORIES, CONDITIONS, LANGUAGES, base_parser, make_app, rng_from, seed_health_content, timed
+from database import db
+from flask import jsonify
+from models.health_content import HealthContent
+from routes.health_feed import personalized_feed_query
+from services import content_snapshot
+from services.content_snapshot import ContentSnapshots, Snapshot
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--content', type=int, default=100000, help='Articles to seed')
+    parser.add_argument('--words', type=int, default=60, help='Words per article body')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+    path = os.path.join(app.instance_path, f'bench_{os.getpid()}.snapshot')
+
+    with app.app_context():
+        seed_health_content(args.content, rng, words=args.words)
+
+        snapshots = ContentSnapshots(path)
+        started = time.perf_counter()
+        metadata = snapshots.build(content_snapshot.compact_dumps(app))
+        print(f'wrote snapshot of {metadata["items"]} active articles in {time.perf_counter() - started:.1f}s: '
+              f'{os.path.getsize(path) / 2 ** 20:.1f} MiB, {len(metadata["segments"])} segments')
+
+        tracemalloc.start()
+        held = [content.to_dict() for content in db.session.scalars(
+            db.select(HealthContent).where(HealthContent.is_active == True))]
+        db.session.expunge_all()
+        heap = tracemalloc.get_traced_memory()[0]
+        del held
+        tracemalloc.stop()
+        tracemalloc.start()
+        snapshot = Snapshot(path)
+        mapped = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'per worker: {heap / 2 ** 20:.1f} MiB of to_dict()s on the heap, '
+              f'{mapped / 2 ** 10:.1f} KiB of heap with the snapshot mapped')
+
+        print(f'{"read":>36s} {"database p50":>13s} {"p95":>8s} {"snapshot p50":>13s} {"p95":>8s}')
+        cases = [
+            ('feed, one condition', (rng.choice(LANGUAGES), [CONDITIONS[0]], None, None)),
+            ('feed, two conditions', (rng.choice(LANGUAGES), CONDITIONS[:2], None, None)),
+            ('feed, category', (rng.choice(LANGUAGES), [CONDITIONS[0]], rng.choice(CATEGORIES), None)),
+            ('feed, content_type', (rng.choice(LANGUAGES), CONDITIONS[:2], None, 'video')),
+        ]
+        for label, (language, conditions, category, content_type) in cases:
+            db_p50, db_p95, _ = timed(lambda: jsonify({
+                'content': [item.to_dict() for item in personalized_feed_query(
+                    language, conditions, category, content_type, args.limit)],
+                'language': language, 'user_conditions': conditions}), args.repeat)
+            db.session.rollback()
+            snapshot_p50, snapshot_p95, _ = timed(lambda: content_snapshot.json_response(
+                app, 'content', b'[' + b','.join(snapshot.feed(language, conditions, category, content_type,
+                                                               args.limit)) + b']',
+                language=language, user_conditions=conditions), args.repeat)
+            print(f'{label:>36s} {db_p50:12.3f}ms {db_p95:6.3f}ms {snapshot_p50:12.3f}ms {snapshot_p95:6.3f}ms')
+
+        content_id = snapshot.sorted_ids[len(snapshot.sorted_ids) // 2]
+        db_p50, db_p95, _ = timed(
+            lambda: jsonify({'content': HealthContent.query.filter_by(id=content_id).one().to_dict()}), args.repeat)
+        db.session.expunge_all()
+        snapshot_p50, snapshot_p95, _ = timed(
+            lambda: content_snapshot.json_response(app, 'content', snapshot.content(content_id)), args.repeat)
+        print(f'{"content by id":>36s} {db_p50:12.3f}ms {db_p95:6.3f}ms {snapshot_p50:12.3f}ms {snapshot_p95:6.3f}ms')
+
+    del snapshot
+    os.remove(path)
+    os.remove(path + '.lock')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Event hub cost of many idle streams and of publishing to them.
+
+    python benchmarks/bench_event_stream.py --connections 10000 --events 100000
+
+Opens --connections subscriptions on a worker's hub behind
+/api/events/stream (as many idle SSE clients would), reports the memory each
+one costs, then publishes --events events to random users, half of whom have
+no open stream, as the worker's feed hands them over from stream_events, and
+drains every subscription the way its stream would. No threads are started:
+an idle stream only waits on its Event, which is what lets a gevent worker
+hold thousands of them.
+"""
+import json
+import time
+import tracemalloc
+
+from common import base_parser, rng_from
+from services.events import EventHub, format_event
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=500, help='Events per publish_many call')
+    args = parser.parse_args()
+    rng = rng_from(args)
+
+    hub = EventHub(max_connections=args.connections)
+    tracemalloc.start()
+    subscriptions = [hub.subscribe(user_id) for user_id in range(args.connections)]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{args.connections} idle subscriptions: {memory / 2 ** 20:.1f} MiB, '
+          f'{memory / args.connections:.0f} bytes each')
+
+    # Users 0..connections-1 are connected, as many again are not
+    items = [
+        (i, rng.randrange(args.connections * 2), 'reminder', json.dumps({'reminders': [{'id': i, 'title': 'Metformin'}]}))
+        for i in range(1, args.events + 1)
+    ]
+    started = time.perf_counter()
+    for i in range(0, len(items), args.batch):
+        hub.publish_many(items[i:i + args.batch])
+    published = time.perf_counter() - started
+
+    started = time.perf_counter()
+    written = 0
+    for subscription in subscriptions:
+        if subscription.ready.is_set():
+            written += len(''.join(format_event(event) for event in subscription.drain()))
+    drained = time.perf_counter() - started
+
+    stats = hub.stats()
+    print(f'publish:  {args.events / published:10.0f} events/s ({stats["delivered"]} delivered to open streams)')
+    print(f'drain:    {stats["delivered"] / drained:10.0f} events/s formatted as SSE ({written / 2 ** 20:.1f} MiB)')
+    print(f'dropped:  {stats["dropped"]} events from full queues')
+
+
+if __name__ == '__main__':
+    main()
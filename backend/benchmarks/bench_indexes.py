@@ -0,0 +1,214 @@
+"""Query plans and latencies for the hot filters, before and after the composite indexes.
+
+    python benchmarks/bench_indexes.py --users 5000 --vitals-per-user 200
+
+Seeds users, vitals, reminders, health content, health workers and
+patient-worker connections, drops the indexes added in migration
+1a7c2e9d4b10, times each query, recreates the indexes and times again.
+"""
+from datetime import datetime, time, timedelta
+
+from common import (CATEGORIES, CONDITIONS, LANGUAGES, STATES, base_parser, make_app,
+                    rng_from, seed_users, seed_vitals, timed)
+from database import db
+from models.health_content import HealthContent
+from models.health_worker import HealthWorker, PatientWorkerConnection
+from models.reminder import Reminder
+from models.vitals import VitalRecord
+
+HOT_INDEX_NAMES = {
+    'ix_vital_records_user_id_recorded_at',
+    'ix_reminders_user_id_is_active_scheduled_time',
+    'ix_health_content_feed',
+    'ix_health_workers_location',
+    'ix_patient_worker_connections_user_id_status',
+    'ix_patient_worker_connections_health_worker_id_status',
+}
+
+
+def hot_indexes():
+    indexes = []
+    for table in db.metadata.sorted_tables:
+        indexes.extend(ix for ix in table.indexes if ix.name in HOT_INDEX_NAMES)
+    return indexes
+
+
+def seed(args, rng):
+    user_ids = seed_users(args.users, rng)
+    seed_vitals(user_ids, args.vitals_per_user, 365, rng)
+
+    now = datetime.utcnow()
+    reminders = []
+    for user_id in user_ids:
+        for i in range(args.reminders_per_user):
+            reminders.append({
+                'user_id': user_id,
+                'title': f'Medicine {i}',
+                'reminder_type': 'medication',
+                'scheduled_time': time(rng.randint(6, 22), rng.choice([0, 15, 30, 45])),
+                'frequency': 'daily',
+                'days_of_week': '[]',
+                'is_active': rng.random() < 0.8,
+                'notification_enabled': True,
+                'language': 'hindi',
+                'next_trigger': now + timedelta(minutes=rng.randint(0, 1440)),
+                'created_at': now,
+                'updated_at': now,
+            })
+    db.session.execute(db.insert(Reminder), reminders)
+
+    content = []
+    for i in range(args.content):
+        content.append({
+            'title': f'Health tip {i}',
+            'content': f'Body of article {i} about managing your health',
+            'content_type': rng.choice(['article', 'tip', 'video']),
+            'condition': rng.choice(CONDITIONS),
+            'category': rng.choice(CATEGORIES),
+            'language': rng.choice(LANGUAGES),
+            'priority': rng.randint(1, 3),
+            'is_active': rng.random() < 0.9,
+            'tags': '[]',
+            'created_at': now - timedelta(minutes=i),
+            'updated_at': now,
+        })
+    db.session.execute(db.insert(HealthContent), content)
+
+    workers = []
+    for i in range(args.workers):
+        state = rng.choice(list(STATES))
+        workers.append({
+            'name': f'Worker {i}',
+            'email': f'worker{i}@example.org',
+            'phone': f'8{i:09d}',
+            'worker_type': rng.choice(['ASHA', 'ANM', 'CHO']),
+            'certification_id': f'CERT-{i}',
+            'state': state,
+            'district': rng.choice(STATES[state]),
+            'languages': '["hindi"]',
+            'is_active': rng.random() < 0.9,
+            'verified': rng.random() < 0.7,
+            'created_at': now,
+            'updated_at': now,
+        })
+    db.session.execute(db.insert(HealthWorker), workers)
+    worker_ids = list(db.session.scalars(db.select(HealthWorker.id)))
+
+    connections = [{
+        'user_id': user_id,
+        'health_worker_id': rng.choice(worker_ids),
+        'connection_type': 'primary',
+        'status': 'active' if rng.random() < 0.85 else 'inactive',
+        'connected_at': now,
+    } for user_id in user_ids]
+    db.session.execute(db.insert(PatientWorkerConnection), connections)
+    db.session.commit()
+    return user_ids, worker_ids
+
+
+def build_queries(user_id, worker_id):
+    now = datetime.utcnow()
+    return {
+        'vitals history (user_id, recorded_at)': db.select(VitalRecord).where(
+            VitalRecord.user_id == user_id,
+            VitalRecord.recorded_at >= now - timedelta(days=30),
+            VitalRecord.recorded_at <= now
+        ).order_by(VitalRecord.recorded_at.desc()).limit(50),
+        'latest vitals': db.select(VitalRecord).where(
+            VitalRecord.user_id == user_id
+        ).order_by(VitalRecord.recorded_at.desc()).limit(1),
+        'active reminders': db.select(Reminder).where(
+            Reminder.user_id == user_id, Reminder.is_active == True
+        ).order_by(Reminder.scheduled_time),
+        'personalized feed': db.select(HealthContent).where(
+            HealthContent.language == 'hindi',
+            HealthContent.is_active == True,
+            HealthContent.condition.in_(['diabetes', 'general'])
+        ).order_by(HealthContent.priority.asc(), HealthContent.created_at.desc()).limit(10),
+        'find health workers': db.select(HealthWorker).where(
+            HealthWorker.is_active == True, HealthWorker.verified == True,
+            HealthWorker.state == 'Maharashtra', HealthWorker.district == 'Pune'
+        ),
+        'patient connections': db.select(PatientWorkerConnection).where(
+            PatientWorkerConnection.user_id == user_id, PatientWorkerConnection.status == 'active'
+        ),
+        'worker patients': db.select(PatientWorkerConnection).where(
+            PatientWorkerConnection.health_worker_id == worker_id, PatientWorkerConnection.status == 'active'
+        ),
+    }
+
+
+def explain(stmt):
+    """Return the database's query plan for stmt as a list of lines"""
+    dialect = db.engine.dialect
+    compiled = stmt.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    if dialect.name == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN ANALYZE '
+    params = compiled.params
+    if dialect.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(prefix + compiled.string, params).fetchall()
+    return [' | '.join(str(col) for col in row) for row in rows]
+
+
+def run_queries(queries, repeat):
+    results = {}
+    for name, stmt in queries.items():
+        median, p95, _ = timed(lambda: db.session.execute(stmt).all(), repeat)
+        results[name] = (median, p95, explain(stmt))
+    return results
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--vitals-per-user', type=int, default=100)
+    parser.add_argument('--reminders-per-user', type=int, default=4)
+    parser.add_argument('--content', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+    with app.app_context():
+        print(f'Seeding {args.users} users x {args.vitals_per_user} vitals on {db.engine.url.get_backend_name()}...')
+        user_ids, worker_ids = seed(args, rng)
+        queries = build_queries(rng.choice(user_ids), rng.choice(worker_ids))
+
+        indexes = hot_indexes()
+        db.session.close()
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+            if db.engine.dialect.name == 'sqlite':
+                conn.exec_driver_sql('ANALYZE')
+        before = run_queries(queries, args.repeat)
+
+        db.session.close()
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            conn.exec_driver_sql('ANALYZE')
+        after = run_queries(queries, args.repeat)
+
+    print(f'\n{"query":40} {"before p50":>11} {"after p50":>10} {"before p95":>11} {"after p95":>10} {"speedup":>8}')
+    for name in queries:
+        b_med, b_p95, _ = before[name]
+        a_med, a_p95, _ = after[name]
+        speedup = b_med / a_med if a_med else float('inf')
+        print(f'{name:40} {b_med:10.3f}ms {a_med:9.3f}ms {b_p95:10.3f}ms {a_p95:9.3f}ms {speedup:7.1f}x')
+
+    for name in queries:
+        print(f'\n== {name}')
+        print('  before:')
+        for line in before[name][2]:
+            print(f'    {line}')
+        print('  after:')
+        for line in after[name][2]:
+            print(f'    {line}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Next-trigger computation: legacy per-reminder loop vs the compiled recurrence engine.
+
+    python benchmarks/bench_recurrence.py --reminders 100000
+
+Runs on in-memory reminder-like objects, no database. The legacy function is
+the pre-compiled implementation (json.loads and a day-by-day strftime loop),
+kept here only for comparison; unlike the engine it ignores timezones, so it
+skips the conversion of every occurrence to UTC.
+"""
+import json
+import time
+from datetime import datetime, time as dtime, timedelta
+from types import SimpleNamespace
+
+from common import base_parser, rng_from
+from services import recurrence
+
+TIMEZONES = ['Asia/Kolkata', 'Asia/Kolkata', 'Asia/Dubai', 'Europe/London', 'America/New_York']
+DAY_SETS = [['monday', 'wednesday', 'friday'], ['tuesday', 'thursday'], ['sunday'], ['saturday', 'sunday']]
+
+
+def legacy_next_trigger(reminder, now):
+    next_trigger = datetime.combine(now.date(), reminder.scheduled_time)
+    if next_trigger <= now:
+        next_trigger += timedelta(days=1)
+    if reminder.frequency == 'daily':
+        return next_trigger
+    elif reminder.frequency == 'weekly':
+        return next_trigger + timedelta(days=7)
+    elif reminder.frequency == 'custom' and reminder.days_of_week:
+        days_of_week = json.loads(reminder.days_of_week)
+        while next_trigger.strftime('%A').lower() not in [day.lower() for day in days_of_week]:
+            next_trigger += timedelta(days=1)
+        return next_trigger
+    return next_trigger
+
+
+def make_reminders(count, rng):
+    reminders = []
+    for _ in range(count):
+        frequency = rng.choice(['daily', 'daily', 'custom', 'weekly', 'monthly'])
+        days = rng.choice(DAY_SETS) if frequency == 'custom' else []
+        reminders.append(SimpleNamespace(
+            frequency=frequency,
+            scheduled_time=dtime(rng.choice([7, 8, 9, 13, 20, 21]), rng.choice([0, 30])),
+            days_of_week=json.dumps(days),
+            timezone=rng.choice(TIMEZONES),
+            created_at=datetime(2026, 1, 1) + timedelta(days=rng.randint(0, 280))
+        ))
+    return reminders
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--reminders', type=int, default=100000)
+    args = parser.parse_args()
+
+    reminders = make_reminders(args.reminders, rng_from(args))
+    now = datetime.utcnow()
+
+    cases = [
+        ('legacy per reminder', lambda: [legacy_next_trigger(r, now) for r in reminders]),
+        ('compiled per reminder', lambda: [recurrence.calculate_next_trigger(r, now) for r in reminders]),
+        ('compiled batch', lambda: recurrence.next_triggers(reminders, now)),
+    ]
+    for label, fn in cases:
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        print(f'{label:24s} {len(reminders) / seconds:12.0f} reminders/s  ({seconds * 1000:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
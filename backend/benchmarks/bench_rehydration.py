@@ -0,0 +1,89 @@
+"""Dispatcher startup rehydration as the reminders table grows.
+
+    python benchmarks/bench_rehydration.py --sizes 10000,100000,1000000
+    python benchmarks/bench_rehydration.py --catch-up skip
+
+For each table size, tops the table up with active reminders spread over the
+next --days days, adds --overdue reminders that fell due during a simulated
+--outage, then times a fresh dispatcher's rehydrate(): catching up on the
+overdue reminders with the chosen policy and loading the --horizon window.
+Peak Python memory (tracemalloc) and the number of heap entries are reported
+next to the legacy approach of loading every active reminder at startup.
+Rehydration time and memory should stay flat as the table grows.
+"""
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from common import base_parser, make_app, rng_from, seed_reminders, seed_users
+from database import db
+from models.reminder import Reminder
+from services.reminder_dispatcher import CATCH_UP_POLICIES, ReminderDispatcher
+
+
+def measure(fn):
+    """Run fn, returning (result, seconds, peak traced MiB)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def load_everything():
+    """What a scheduler holding a job per reminder has to read on startup"""
+    rows = db.session.execute(
+        db.select(Reminder.id, Reminder.next_trigger).where(Reminder.is_active == True)
+    ).all()
+    db.session.rollback()
+    return len(rows)
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated active reminder counts')
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--days', type=float, default=7, help='Days over which future reminders fall due')
+    parser.add_argument('--overdue', type=int, default=5000, help='Reminders that fell due during the outage')
+    parser.add_argument('--outage', type=float, default=6, help='Hours the dispatcher was down')
+    parser.add_argument('--catch-up', choices=CATCH_UP_POLICIES, default='fire')
+    parser.add_argument('--horizon', type=int, default=60)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    print(f'catch-up policy {args.catch_up}, {args.overdue} reminders overdue by up to {args.outage:g}h')
+    print(f'{"reminders":>10s} {"rehydrate":>10s} {"peak MiB":>9s} {"caught up":>10s} {"skipped":>8s} '
+          f'{"in heap":>8s} {"load all":>10s} {"peak MiB":>9s}')
+    with app.app_context():
+        user_ids = seed_users(args.users, rng)
+        for size in sizes:
+            now = datetime.utcnow()
+            # Earlier rounds' overdue reminders have since moved into the future
+            active = db.session.scalar(db.select(db.func.count()).select_from(Reminder))
+            seed_reminders(user_ids, max(size - active - args.overdue, 0), now, args.days * 86400, rng)
+            seed_reminders(user_ids, args.overdue, now - timedelta(hours=args.outage), args.outage * 3600, rng)
+
+            dispatcher = ReminderDispatcher(
+                app, horizon=args.horizon, batch_size=args.batch_size, workers=args.workers,
+                catch_up=args.catch_up, coalesce_seconds=0,
+                notify=lambda reminders, now: len(reminders)
+            )
+            dispatcher.executor = ThreadPoolExecutor(max_workers=args.workers)
+            counts, elapsed, peak = measure(lambda: dispatcher.rehydrate(datetime.utcnow()))
+            dispatcher.executor.shutdown()
+
+            total, load_elapsed, load_peak = measure(load_everything)
+            print(f'{total:10d} {elapsed:9.2f}s {peak:9.1f} {counts["caught_up"]:10d} {counts["skipped"]:8d} '
+                  f'{len(dispatcher.heap):8d} {load_elapsed:9.2f}s {load_peak:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Throughput and lateness of the reminder dispatcher.
+
+    python benchmarks/bench_reminder_dispatch.py --reminders 50000 --spread 10
+    python benchmarks/bench_reminder_dispatch.py --processes 4
+
+Seeds reminders due over the next --spread seconds (after a short lead time)
+plus a larger population due tomorrow that the dispatcher must never load,
+runs --processes dispatchers against the same database with a no-op notifier
+(or, with --enqueue, the real notification outbox writes) until every due
+reminder has fired and reports reminders dispatched per
+second, firing lateness percentiles and any reminder fired more than once.
+With --spread 0 --lead 0 every reminder is already due, which measures the
+dispatchers' burst capacity rather than the arrival rate.
+"""
+import multiprocessing
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from common import base_parser, make_app, percentiles, rng_from, seed_reminders, seed_users
+from app import create_app
+from database import db
+from models.reminder import Reminder
+from services.notifications import enqueue_reminders
+from services.reminder_dispatcher import ReminderDispatcher
+
+
+def run_dispatcher(database_url, last_due, args, results):
+    """Run one dispatcher until nothing due by last_due is left; report what it fired"""
+    app = create_app({
+        'SECRET_KEY': 'bench',
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    })
+    fired = []
+
+    def record(reminders, now):
+        fired_at = datetime.utcnow()
+        fired.extend((reminder.id, (fired_at - reminder.next_trigger).total_seconds()) for reminder in reminders)
+        if args.enqueue:
+            return enqueue_reminders(reminders, now)
+        return len(reminders)
+
+    dispatcher = ReminderDispatcher(
+        app, horizon=args.horizon, poll_interval=args.poll_interval,
+        batch_size=args.batch_size, workers=args.workers, coalesce_seconds=args.coalesce, notify=record
+    )
+    dispatcher.start()
+    deadline = time.perf_counter() + args.lead + args.spread + 120
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            time.sleep(0.05)
+            if datetime.utcnow() < last_due:
+                continue
+            remaining = db.session.scalar(
+                db.select(db.func.count()).select_from(Reminder)
+                .where(Reminder.is_active == True, Reminder.next_trigger <= last_due)
+            )
+            db.session.rollback()
+            if not remaining:
+                break
+    finished = datetime.utcnow()
+    dispatcher.stop()
+    results.put((fired, finished, dispatcher.stats.to_dict()))
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--reminders', type=int, default=50000, help='Reminders due during the run')
+    parser.add_argument('--idle-reminders', type=int, default=200000, help='Reminders due tomorrow')
+    parser.add_argument('--spread', type=float, default=10.0, help='Seconds over which reminders fall due')
+    parser.add_argument('--lead', type=float, default=3.0, help='Seconds before the first reminder is due')
+    parser.add_argument('--processes', type=int, default=1, help='Dispatchers racing for the same reminders')
+    parser.add_argument('--enqueue', action='store_true', help='Write notifications to the outbox')
+    parser.add_argument('--coalesce', type=int, default=0,
+                        help='Coalescing window in seconds (only reduces fan-out with --enqueue)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--horizon', type=int, default=60)
+    parser.add_argument('--poll-interval', type=float, default=5)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    rng = rng_from(args)
+    with app.app_context():
+        user_ids = seed_users(args.users, rng)
+        seed_reminders(user_ids, args.idle_reminders, datetime.utcnow() + timedelta(days=1), 86400, rng)
+        start = datetime.utcnow() + timedelta(seconds=args.lead)
+        seed_reminders(user_ids, args.reminders, start, args.spread, rng)
+        last_due = db.session.scalar(
+            db.select(db.func.max(Reminder.next_trigger)).where(Reminder.next_trigger < start + timedelta(hours=1))
+        )
+        print(f'Seeded {args.reminders} reminders due in the next {args.lead + args.spread:.0f}s '
+              f'and {args.idle_reminders} due tomorrow')
+
+    started_at = datetime.utcnow()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_dispatcher, args=(database_url, last_due, args, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    fired = [item for report in reports for item in report[0]]
+    finished = max(report[1] for report in reports)
+    # From the moment reminders started falling due (or the dispatchers started, if later)
+    active = (finished - max(start, started_at)).total_seconds()
+    duplicates = sum(count - 1 for count in Counter(reminder_id for reminder_id, _ in fired).values() if count > 1)
+
+    for i, (_, _, stats) in enumerate(reports):
+        print(f'dispatcher {i}: fired {stats["fired"]} in {stats["batches"]} batches ({stats["errors"]} errors), '
+              f'{stats["notifications"]} notifications (fan-out reduction {stats["fan_out_reduction"]})')
+    print(f'dispatch rate: {len(fired) / active:10.0f} reminders/s over the {active:.1f}s due window')
+    late = percentiles([lateness for _, lateness in fired], (50, 95, 99, 100))
+    print('lateness:      ' + '  '.join(f'p{p} {value * 1000:8.1f} ms' for p, value in late.items()))
+    print(f'fired {len(fired)} of {args.reminders}, {duplicates} fired more than once')
+
+
+if __name__ == '__main__':
+    main()
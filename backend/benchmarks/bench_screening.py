@@ -0,0 +1,84 @@
+"""Latency of GET /api/vitals/screening over a large cohort.
+
+    python benchmarks/bench_screening.py --users 100000
+
+Seeds one latest_vitals snapshot per patient directly (the screen only reads
+snapshots) and times the endpoint for the whole population, one state and
+one district, next to the per-patient get_health_insights() loop it replaces.
+"""
+import json
+import time
+from datetime import datetime
+
+from common import STATES, base_parser, make_app, random_vital_row, rng_from, seed_users, timed
+from database import db
+from models.latest_vitals import LatestVitals
+from models.vitals import VitalRecord
+from services import latest_vitals
+
+
+def seed_snapshots(user_ids, rng, batch_size=10000):
+    """Bulk insert one snapshot per user with a random reading taken now"""
+    now = datetime.utcnow()
+    batch = []
+    for user_id in user_ids:
+        row = random_vital_row(user_id, now, rng)
+        snapshot = {
+            'user_id': user_id,
+            'vital_id': user_id,
+            'recorded_at': now,
+            'vital': '{}',
+            'insights': '[]',
+            'blood_sugar_meal': row['before_after_meal'],
+        }
+        for metric in latest_vitals.METRICS:
+            snapshot[metric] = row[metric]
+            snapshot[f'{metric}_at'] = now
+        batch.append(snapshot)
+        if len(batch) >= batch_size:
+            db.session.execute(db.insert(LatestVitals), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(LatestVitals), batch)
+    db.session.commit()
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = make_app(args.database_url)
+    rng = rng_from(args)
+    with app.app_context():
+        user_ids = seed_users(args.users, rng)
+        seed_snapshots(user_ids, rng)
+        print(f'Seeded {len(user_ids)} latest_vitals snapshots')
+
+        # Baseline: the per-patient path, insights computed one ORM object at a time
+        now = datetime.utcnow()
+        vitals = [VitalRecord(**random_vital_row(user_id, now, rng)) for user_id in user_ids]
+        start = time.perf_counter()
+        looped = sum(1 for vital in vitals if vital.get_health_insights())
+        loop_ms = (time.perf_counter() - start) * 1000
+        print(f'{"per-patient insights loop (no I/O)":40s} {loop_ms:10.1f} ms  ({looped} flagged)')
+
+    client = app.test_client()
+    state = next(iter(STATES))
+    cases = [
+        ('whole population', {}),
+        (f'state={state}', {'state': state}),
+        (f'district={STATES[state][0]}', {'state': state, 'district': STATES[state][0]}),
+        ('all rules', {'rules': 'high_bp,low_bp,high_fasting_sugar,high_post_meal_sugar,low_oxygen,fever'}),
+    ]
+    for label, params in cases:
+        median, p95, response = timed(
+            lambda: client.get('/api/vitals/screening', query_string=params), args.repeat
+        )
+        body = json.loads(response.data)
+        print(f'{label:40s} {median:10.1f} ms median  {p95:8.1f} ms p95  '
+              f'(cohort {body["cohort_size"]}, flagged {body["flagged_count"]})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Throughput of POST /api/vitals/log-batch against one POST /api/vitals/log per reading.
+
+    python benchmarks/bench_vitals_batch.py --readings 5000 --batch-size 500
+
+Both paths go through the Flask test client so request parsing, the user
+lookup(s), inserts, rollup upserts and commits are all included.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from common import base_parser, make_app, random_vital_row, rng_from, seed_users
+
+
+def make_readings(user_ids, count, rng):
+    now = datetime.utcnow()
+    readings = []
+    for _ in range(count):
+        row = random_vital_row(rng.choice(user_ids), now - timedelta(minutes=rng.randint(0, 7 * 1440)), rng)
+        row['recorded_at'] = row['recorded_at'].isoformat()
+        del row['created_at']
+        readings.append(row)
+    return readings
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--readings', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = rng_from(args)
+
+    # Single-row path
+    app = make_app(args.database_url)
+    with app.app_context():
+        user_ids = seed_users(args.users, rng)
+    readings = make_readings(user_ids, args.readings, rng)
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for reading in readings:
+        response = client.post('/api/vitals/log', json=reading)
+        assert response.status_code == 201, response.get_json()
+    single_seconds = time.perf_counter() - start
+
+    # Batch path, JSON array and NDJSON bodies, on fresh databases
+    batch_seconds = {}
+    for body_format in ('json', 'ndjson'):
+        app = make_app(args.database_url)
+        with app.app_context():
+            seed_users(args.users, rng_from(args))
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for i in range(0, len(readings), args.batch_size):
+            chunk = readings[i:i + args.batch_size]
+            if body_format == 'json':
+                response = client.post('/api/vitals/log-batch', json=chunk)
+            else:
+                response = client.post('/api/vitals/log-batch',
+                                       data='\n'.join(json.dumps(r) for r in chunk),
+                                       content_type='application/x-ndjson')
+            assert response.status_code == 201 and response.get_json()['rejected'] == 0, response.get_json()
+        batch_seconds[body_format] = time.perf_counter() - start
+
+    print(f'{args.readings} readings for {args.users} users on {app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0]}')
+    print(f'{"path":30} {"seconds":>9} {"readings/s":>12} {"speedup":>8}')
+    print(f'{"POST /log (one per reading)":30} {single_seconds:9.3f} {args.readings / single_seconds:12.0f} {1.0:7.1f}x')
+    for body_format, seconds in batch_seconds.items():
+        label = f'POST /log-batch ({body_format}, {args.batch_size})'
+        print(f'{label:30} {seconds:9.3f} {args.readings / seconds:12.0f} {single_seconds / seconds:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
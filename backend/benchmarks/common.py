@@ -0,0 +1,248 @@
+"""Shared helpers for the benchmark scripts.
+
+Run benchmarks from the backend directory, e.g.:
+
+    python benchmarks/bench_indexes.py --users 2000
+
+By default every benchmark uses a throwaway SQLite file so the instance
+database is never touched. Pass --database-url to point at Postgres.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Make the backend modules importable when run as `python benchmarks/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import db
+
+STATES = {
+    'Maharashtra': ['Pune', 'Nagpur', 'Nashik', 'Satara'],
+    'Uttar Pradesh': ['Lucknow', 'Varanasi', 'Agra', 'Kanpur'],
+    'Tamil Nadu': ['Chennai', 'Madurai', 'Salem', 'Vellore'],
+}
+LANGUAGES = ['hindi', 'marathi', 'tamil', 'english']
+CONDITIONS = ['diabetes', 'hypertension', 'general']
+CATEGORIES = ['diet', 'exercise', 'medication', 'lifestyle']
+MEASUREMENT_TIMES = ['morning', 'afternoon', 'evening', 'night']
+# Common health words per language; articles mix them with generated filler words
+VOCABULARY = {
+    'hindi': 'मधुमेह रक्तचाप आहार व्यायाम दवा चीनी नमक पानी नींद तनाव योग फल सब्ज़ी डॉक्टर जाँच इंसुलिन'.split(),
+    'marathi': 'मधुमेह रक्तदाब आहार व्यायाम औषध साखर मीठ पाणी झोप ताण योग फळे भाज्या डॉक्टर तपासणी इन्सुलिन'.split(),
+    'tamil': 'நீரிழிவு இரத்தஅழுத்தம் உணவு உடற்பயிற்சி மருந்து சர்க்கரை உப்பு தண்ணீர் தூக்கம் யோகா பழம் மருத்துவர்'.split(),
+    'english': 'diabetes hypertension diet exercise medicine sugar salt water sleep stress yoga fruit vegetables doctor checkup insulin'.split(),
+}
+SCRIPTS = {
+    'hindi': ('कखगचजटडतदनपबमयरलवसह', 'ािीुूेैोौ'),
+    'marathi': ('कखगचजटडतदनपबमयरलवसहळ', 'ािीुूेैोौ'),
+    'tamil': ('கஙசஞடணதநபமயரலவழளறன', 'ாிீுூெேைொோ'),
+    'english': ('bcdfghjklmnprstvwyz', 'aeiou'),
+}
+
+
+def base_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--database-url', default=None,
+                        help='SQLAlchemy URL to benchmark against (default: temporary SQLite file)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed repetitions per query')
+    return parser
+
+
+def make_app(database_url=None, config=None):
+    """Create an app bound to a fresh benchmark database with all tables created"""
+    if not database_url:
+        fd, path = tempfile.mkstemp(prefix='aarogya_bench_', suffix='.db')
+        os.close(fd)
+        database_url = 'sqlite:///' + path
+    app = create_app({
+        'SECRET_KEY': 'bench',
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        **(config or {}),
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def timed(fn, repeat=20):
+    """Run fn repeat times and return (median_ms, p95_ms, last_result)"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    median = samples[len(samples) // 2]
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return median, p95, result
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Return {p: value} for the given percentiles of a list of numbers"""
+    if not values:
+        return {p: 0.0 for p in points}
+    ordered = sorted(values)
+    return {p: ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+
+
+def seed_users(n_users, rng):
+    """Bulk insert n_users users spread over STATES; returns the list of user ids"""
+    from models.user import User
+
+    now = datetime.utcnow()
+    rows = []
+    for i in range(n_users):
+        state = rng.choice(list(STATES))
+        rows.append({
+            'name': f'Patient {i}',
+            'email': f'patient{i}@example.org',
+            'phone': f'9{i:09d}',
+            'password_hash': 'x',
+            'age': rng.randint(18, 90),
+            'gender': rng.choice(['male', 'female']),
+            'state': state,
+            'district': rng.choice(STATES[state]),
+            'village_city': f'Village {i % 500}',
+            'conditions': '["diabetes", "hypertension"]' if i % 3 == 0 else '["diabetes"]',
+            'preferred_language': rng.choice(LANGUAGES),
+            'created_at': now,
+            'updated_at': now,
+        })
+    db.session.execute(db.insert(User), rows)
+    db.session.commit()
+    return list(db.session.scalars(db.select(User.id).order_by(User.id)))
+
+
+def random_vital_row(user_id, recorded_at, rng):
+    """One plausible vitals reading as an insert dict"""
+    return {
+        'user_id': user_id,
+        'blood_sugar': round(rng.gauss(130, 30), 1),
+        'blood_pressure_systolic': int(rng.gauss(130, 15)),
+        'blood_pressure_diastolic': int(rng.gauss(85, 10)),
+        'weight': round(rng.gauss(68, 8), 1),
+        'heart_rate': int(rng.gauss(78, 9)),
+        'temperature': round(rng.gauss(36.8, 0.4), 1),
+        'oxygen_level': round(min(100.0, rng.gauss(97, 1.5)), 1),
+        'measurement_time': rng.choice(MEASUREMENT_TIMES),
+        'before_after_meal': rng.choice(['before', 'after']),
+        'recorded_at': recorded_at,
+        'created_at': recorded_at,
+    }
+
+
+def seed_vitals(user_ids, per_user, days, rng, batch_size=10000):
+    """Bulk insert per_user readings for each user spread over the last `days` days"""
+    from models.vitals import VitalRecord
+
+    now = datetime.utcnow()
+    span = days * 86400
+    batch = []
+    total = 0
+    for user_id in user_ids:
+        for _ in range(per_user):
+            batch.append(random_vital_row(user_id, now - timedelta(seconds=rng.randint(0, span)), rng))
+            if len(batch) >= batch_size:
+                db.session.execute(db.insert(VitalRecord), batch)
+                total += len(batch)
+                batch = []
+    if batch:
+        db.session.execute(db.insert(VitalRecord), batch)
+        total += len(batch)
+    db.session.commit()
+    return total
+
+
+def seed_reminders(user_ids, count, start, spread_seconds, rng, batch_size=10000):
+    """Bulk insert count active daily reminders with next_trigger (UTC) spread
+    over [start, start + spread_seconds); returns the number inserted"""
+    from models.reminder import Reminder
+    from services.recurrence import DEFAULT_TIMEZONE, to_local
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        next_trigger = start + timedelta(seconds=rng.uniform(0, spread_seconds))
+        batch.append({
+            'user_id': user_ids[i % len(user_ids)],
+            'title': f'Medicine {i % 4 + 1}',
+            'reminder_type': 'medication',
+            'medication_name': rng.choice(['Metformin', 'Amlodipine', 'Telmisartan', 'Glimepiride']),
+            'dosage': '1 tablet',
+            'scheduled_time': to_local(next_trigger, DEFAULT_TIMEZONE).time().replace(microsecond=0),
+            'frequency': 'daily',
+            'days_of_week': '[]',
+            'timezone': DEFAULT_TIMEZONE,
+            'is_active': True,
+            'notification_enabled': True,
+            # One language per patient, as reminders default to the user's preferred_language
+            'language': LANGUAGES[user_ids[i % len(user_ids)] % len(LANGUAGES)],
+            'next_trigger': next_trigger,
+            'created_at': now,
+            'updated_at': now,
+        })
+        if len(batch) >= batch_size:
+            db.session.execute(db.insert(Reminder), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(Reminder), batch)
+    db.session.commit()
+    return count
+
+
+def filler_words(language, count, rng):
+    """count made-up words in the language's script, consonant plus vowel sign syllables"""
+    consonants, vowels = SCRIPTS[language]
+    return [''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+            for _ in range(count)]
+
+
+def seed_health_content(count, rng, words=60, filler=5000, batch_size=10000):
+    """Bulk insert count articles of about `words` words, Zipf-distributed over
+    VOCABULARY plus `filler` generated words per language; returns the number inserted"""
+    from models.health_content import HealthContent
+
+    vocabularies = {}
+    for language, common in VOCABULARY.items():
+        vocabulary = common + filler_words(language, filler, rng)
+        vocabularies[language] = (vocabulary, [1.0 / (rank + 1) for rank in range(len(vocabulary))])
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        language = rng.choice(LANGUAGES)
+        vocabulary, weights = vocabularies[language]
+        body = rng.choices(vocabulary, weights, k=words)
+        batch.append({
+            'title': ' '.join(rng.choices(vocabulary, weights, k=5)),
+            'content': ' '.join(body),
+            'content_type': rng.choice(['article', 'tip', 'video']),
+            'condition': rng.choice(CONDITIONS),
+            'category': rng.choice(CATEGORIES),
+            'language': language,
+            'priority': rng.randint(1, 3),
+            'is_active': rng.random() < 0.9,
+            'tags': '[]',
+            'created_at': now - timedelta(minutes=i),
+            'updated_at': now,
+        })
+        if len(batch) >= batch_size:
+            db.session.execute(db.insert(HealthContent), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(HealthContent), batch)
+    db.session.commit()
+    return count
+
+
+def rng_from(args):
+    return random.Random(args.seed)
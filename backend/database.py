@@ -1,9 +1,42 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.dialects import postgresql, sqlite
 
 db = SQLAlchemy()
 migrate = Migrate()
 
 def init_db(app):
     db.init_app(app)
-    migrate.init_app(app, db)
\ No newline at end of file
+    migrate.init_app(app, db)
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+def upsert_insert(model):
+    """Dialect-specific INSERT supporting on_conflict_do_update (SQLite and Postgres)"""
+    if dialect_name() == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def claim_rows(table, conditions, values, order_by=None, limit=None):
+    """Atomically UPDATE rows matching conditions with values and return their ids.
+
+    Used for work-queue leases. On Postgres, rows another transaction is
+    claiming at the same moment are skipped (FOR UPDATE SKIP LOCKED) rather
+    than waited on; SQLite serializes writers, so the guarded UPDATE is
+    atomic on its own. The caller commits.
+    """
+    candidates = db.select(table.c.id).where(*conditions)
+    if order_by is not None:
+        candidates = candidates.order_by(*order_by)
+    if limit:
+        candidates = candidates.limit(limit)
+    if dialect_name() == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    return db.session.scalars(
+        db.update(table)
+        .where(table.c.id.in_(candidates.scalar_subquery()))
+        .values(**values)
+        .returning(table.c.id)
+    ).all()
@@ -0,0 +1,23 @@
+"""Gunicorn settings for serving the API.
+
+    gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+gevent workers patch threading and sockets, so each open /api/events stream
+is a greenlet waiting on its Event rather than a thread, and a worker holds
+thousands of them. Any number of workers can serve streams: each one's event
+feed reads what the others (and the dispatcher) committed to stream_events.
+"""
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gevent'
+# Concurrent requests per worker, open event streams included
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 2000))
+# Streams send a keep-alive every EVENT_STREAM_HEARTBEAT_SECONDS, well inside this
+timeout = 60
+
+def post_fork(server, worker):
+    # psycopg2 waits on sockets in C; let other greenlets run while a query waits
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
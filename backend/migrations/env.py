@@ -90,9 +90,19 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the SQLite full-text index (health_content_fts and its FTS5 shadow
+    # tables) is maintained by migrations and services/content_search.py,
+    # not by the models, so autogenerate must not try to drop it
+    def include_name(name, type_, parent_names):
+        if type_ == 'table':
+            return not name.startswith('health_content_fts')
+        return True
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
 
     connectable = get_engine()
 
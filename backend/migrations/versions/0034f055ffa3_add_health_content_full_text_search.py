@@ -0,0 +1,70 @@
+"""add health content full text search
+
+SQLite gets an external-content FTS5 table kept in sync by triggers,
+Postgres a GIN index over a weighted tsvector expression. Any later
+batch_alter_table on health_content recreates the table and drops the
+SQLite triggers; run `flask health_feed rebuild-search` after such a
+migration.
+
+Revision ID: 0034f055ffa3
+Revises: 99984830b435
+Create Date: 2026-10-18 22:58:16.071662
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import unicodedata
+
+
+# revision identifiers, used by Alembic.
+revision = '0034f055ffa3'
+down_revision = '99984830b435'
+branch_labels = None
+depends_on = None
+
+# Indic combining marks are token characters, so words are not split at matras
+INDIC_MARKS = ''.join(chr(c) for c in range(0x0900, 0x0E00) if unicodedata.category(chr(c)) in ('Mn', 'Mc'))
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE health_content_fts USING fts5("
+    "title, content, tags, content='health_content', content_rowid='id', "
+    f"tokenize=\"unicode61 remove_diacritics 0 tokenchars '{INDIC_MARKS}'\")",
+    "CREATE TRIGGER health_content_fts_ai AFTER INSERT ON health_content BEGIN "
+    "INSERT INTO health_content_fts(rowid, title, content, tags) VALUES (new.id, new.title, new.content, new.tags); END",
+    "CREATE TRIGGER health_content_fts_ad AFTER DELETE ON health_content BEGIN "
+    "INSERT INTO health_content_fts(health_content_fts, rowid, title, content, tags) "
+    "VALUES ('delete', old.id, old.title, old.content, old.tags); END",
+    "CREATE TRIGGER health_content_fts_au AFTER UPDATE OF title, content, tags ON health_content BEGIN "
+    "INSERT INTO health_content_fts(health_content_fts, rowid, title, content, tags) "
+    "VALUES ('delete', old.id, old.title, old.content, old.tags); "
+    "INSERT INTO health_content_fts(rowid, title, content, tags) VALUES (new.id, new.title, new.content, new.tags); END",
+    "INSERT INTO health_content_fts(health_content_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    'DROP TRIGGER IF EXISTS health_content_fts_au',
+    'DROP TRIGGER IF EXISTS health_content_fts_ad',
+    'DROP TRIGGER IF EXISTS health_content_fts_ai',
+    'DROP TABLE IF EXISTS health_content_fts',
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.create_index('ix_health_content_search', 'health_content', [sa.text(
+            "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B'))"
+        )], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.drop_index('ix_health_content_search', table_name='health_content')
@@ -0,0 +1,54 @@
+"""add composite indexes for hot query paths
+
+Revision ID: 1a7c2e9d4b10
+Revises: e3d41416b2db
+Create Date: 2026-10-18 09:12:04.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a7c2e9d4b10'
+down_revision = 'e3d41416b2db'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain CREATE INDEX works on both SQLite and Postgres. On a large Postgres
+    # table run this during a quiet window, the build takes a SHARE lock.
+    with op.batch_alter_table('vital_records', schema=None) as batch_op:
+        batch_op.create_index('ix_vital_records_user_id_recorded_at', ['user_id', 'recorded_at'], unique=False)
+
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.create_index('ix_reminders_user_id_is_active_scheduled_time', ['user_id', 'is_active', 'scheduled_time'], unique=False)
+
+    with op.batch_alter_table('health_content', schema=None) as batch_op:
+        batch_op.create_index('ix_health_content_feed', ['language', 'is_active', 'condition', 'priority', 'created_at'], unique=False)
+
+    with op.batch_alter_table('health_workers', schema=None) as batch_op:
+        batch_op.create_index('ix_health_workers_location', ['state', 'district', 'is_active', 'verified'], unique=False)
+
+    with op.batch_alter_table('patient_worker_connections', schema=None) as batch_op:
+        batch_op.create_index('ix_patient_worker_connections_user_id_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_patient_worker_connections_health_worker_id_status', ['health_worker_id', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('patient_worker_connections', schema=None) as batch_op:
+        batch_op.drop_index('ix_patient_worker_connections_health_worker_id_status')
+        batch_op.drop_index('ix_patient_worker_connections_user_id_status')
+
+    with op.batch_alter_table('health_workers', schema=None) as batch_op:
+        batch_op.drop_index('ix_health_workers_location')
+
+    with op.batch_alter_table('health_content', schema=None) as batch_op:
+        batch_op.drop_index('ix_health_content_feed')
+
+    with op.batch_alter_table('reminders', schema=None) as batch_op:
+        batch_op.drop_index('ix_reminders_user_id_is_active_scheduled_time')
+
+    with op.batch_alter_table('vital_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_vital_records_user_id_recorded_at')
@@ -0,0 +1,45 @@
+"""add tags to health content search index
+
+The Postgres tsvector covered title and content while SQLite's FTS5 table
+also indexes tags. Recreate ix_health_content_search weighted title A,
+tags B, content C, matching COLUMN_WEIGHTS' order on SQLite. SQLite needs
+no change.
+
+Revision ID: d7c42e9a5dd0
+Revises: dab4e5e99be0
+Create Date: 2026-10-18 06:10:42.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7c42e9a5dd0'
+down_revision = 'dab4e5e99be0'
+branch_labels = None
+depends_on = None
+
+TITLE_TAGS_CONTENT = (
+    "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(tags, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'C'))"
+)
+TITLE_CONTENT = (
+    "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B'))"
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_health_content_search', table_name='health_content')
+        op.create_index('ix_health_content_search', 'health_content', [sa.text(TITLE_TAGS_CONTENT)],
+                        unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_health_content_search', table_name='health_content')
+        op.create_index('ix_health_content_search', 'health_content', [sa.text(TITLE_CONTENT)],
+                        unique=False, postgresql_using='gin')
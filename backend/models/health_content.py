@@ -3,6 +3,20 @@ from datetime import datetime
 
 class HealthContent(db.Model):
     __tablename__ = 'health_content'
+    __table_args__ = (
+        # Feed and search filter on language/is_active/condition, ordered by priority then recency
+        db.Index('ix_health_content_feed', 'language', 'is_active', 'condition', 'priority', 'created_at'),
+        # In-memory content index refreshes read the rows changed since the last refresh
+        db.Index('ix_health_content_updated_at', 'updated_at'),
+        # Full-text search on Postgres; SQLite uses the health_content_fts table (services/content_search.py)
+        db.Index(
+            'ix_health_content_search',
+            db.text("(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                    "setweight(to_tsvector('simple', coalesce(tags, '')), 'B') || "
+                    "setweight(to_tsvector('simple', coalesce(content, '')), 'C'))"),
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
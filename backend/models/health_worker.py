@@ -3,6 +3,10 @@ from datetime import datetime
 
 class HealthWorker(db.Model):
     __tablename__ = 'health_workers'
+    __table_args__ = (
+        # /find always filters on is_active/verified, usually narrowed by state and district
+        db.Index('ix_health_workers_location', 'state', 'district', 'is_active', 'verified'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -52,6 +56,10 @@ class HealthWorker(db.Model):
 
 class PatientWorkerConnection(db.Model):
     __tablename__ = 'patient_worker_connections'
+    __table_args__ = (
+        db.Index('ix_patient_worker_connections_user_id_status', 'user_id', 'status'),
+        db.Index('ix_patient_worker_connections_health_worker_id_status', 'health_worker_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
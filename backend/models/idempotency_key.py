@@ -0,0 +1,24 @@
+from database import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        # Keys are unique per endpoint; expires_at drives TTL purges
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_keys_scope_key'),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)  # endpoint name, e.g. vitals.log_vitals
+    key = db.Column(db.String(255), nullable=False)  # client supplied Idempotency-Key header
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    
+    # Stored response, NULL while the original request is still in flight
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,51 @@
+from database import db
+from datetime import datetime
+import json
+
+class LatestVitals(db.Model):
+    __tablename__ = 'latest_vitals'
+    
+    # One snapshot row per user, served by primary key from /latest
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    
+    # Newest reading as returned by VitalRecord.to_dict() and its precomputed insights
+    vital_id = db.Column(db.Integer, nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    vital = db.Column(db.Text, nullable=False)  # JSON string
+    insights = db.Column(db.Text, nullable=False)  # JSON string
+    
+    # Newest non-null value of each metric, which may come from older readings
+    blood_sugar = db.Column(db.Float)
+    blood_sugar_at = db.Column(db.DateTime)
+    blood_sugar_meal = db.Column(db.String(10))  # before_after_meal of that blood sugar reading
+    blood_pressure_systolic = db.Column(db.Integer)
+    blood_pressure_systolic_at = db.Column(db.DateTime)
+    blood_pressure_diastolic = db.Column(db.Integer)
+    blood_pressure_diastolic_at = db.Column(db.DateTime)
+    weight = db.Column(db.Float)
+    weight_at = db.Column(db.DateTime)
+    heart_rate = db.Column(db.Integer)
+    heart_rate_at = db.Column(db.DateTime)
+    temperature = db.Column(db.Float)
+    temperature_at = db.Column(db.DateTime)
+    oxygen_level = db.Column(db.Float)
+    oxygen_level_at = db.Column(db.DateTime)
+    
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        latest_values = {}
+        for metric in ('blood_sugar', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+                       'weight', 'heart_rate', 'temperature', 'oxygen_level'):
+            recorded_at = getattr(self, f'{metric}_at')
+            latest_values[metric] = {
+                'value': getattr(self, metric),
+                'recorded_at': recorded_at.isoformat() if recorded_at else None
+            }
+        latest_values['blood_sugar']['before_after_meal'] = self.blood_sugar_meal
+        return {
+            'vital': json.loads(self.vital),
+            'insights': json.loads(self.insights),
+            'latest_values': latest_values
+        }
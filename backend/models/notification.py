@@ -0,0 +1,54 @@
+from database import db
+from datetime import datetime
+import json
+
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        # Delivery workers claim pending rows in next_attempt_at order
+        db.Index('ix_notification_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # No FKs to reminders, outbox rows outlive deleted reminders
+    reminder_id = db.Column(db.Integer)  # first reminder covered by this message
+    reminder_ids = db.Column(db.Text)  # JSON list of every reminder coalesced into it
+    reminder_count = db.Column(db.Integer, nullable=False, default=1)
+    
+    # Message
+    channel = db.Column(db.String(20), nullable=False)  # sms, push, ivr, file
+    recipient = db.Column(db.String(255), nullable=False)  # phone number or device token
+    message = db.Column(db.Text, nullable=False)
+    language = db.Column(db.String(20))
+    
+    # Delivery state
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Claiming pushes this past the lease, so a crashed worker's rows come back on their own
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'reminder_id': self.reminder_id,
+            'reminder_ids': json.loads(self.reminder_ids) if self.reminder_ids else [],
+            'reminder_count': self.reminder_count,
+            'channel': self.channel,
+            'recipient': self.recipient,
+            'message': self.message,
+            'language': self.language,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -3,6 +3,14 @@ from datetime import datetime
 
 class Reminder(db.Model):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        # Per-user reminder lists filter on is_active and sort by scheduled_time
+        db.Index('ix_reminders_user_id_is_active_scheduled_time', 'user_id', 'is_active', 'scheduled_time'),
+        # The dispatcher polls active reminders by next_trigger range
+        db.Index('ix_reminders_is_active_next_trigger', 'is_active', 'next_trigger'),
+        # Fired doses awaiting acknowledgement, swept into missed events once overdue
+        db.Index('ix_reminders_pending_occurrence', 'pending_occurrence'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -20,15 +28,21 @@ class Reminder(db.Model):
     scheduled_time = db.Column(db.Time, nullable=False)
     frequency = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly, custom
     days_of_week = db.Column(db.String(20))  # JSON string for custom schedules
+    timezone = db.Column(db.String(50), nullable=False, default='Asia/Kolkata')  # user's timezone; scheduled_time is local to it
     
     # Status and settings
     is_active = db.Column(db.Boolean, default=True)
     notification_enabled = db.Column(db.Boolean, default=True)
     language = db.Column(db.String(20), default='hindi')
     
-    # Tracking
+    # Tracking, all in UTC
     last_triggered = db.Column(db.DateTime)
-    next_trigger = db.Column(db.DateTime)
+    next_trigger = db.Column(db.DateTime)  # precomputed at write time, DST included
+    pending_occurrence = db.Column(db.DateTime)  # scheduled time of the last fired dose, until acknowledged or missed
+    
+    # Dispatch lease: the worker firing this reminder and when its claim lapses
+    claimed_by = db.Column(db.String(64))
+    claim_expires_at = db.Column(db.DateTime)
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -46,10 +60,12 @@ class Reminder(db.Model):
             'scheduled_time': self.scheduled_time.strftime('%H:%M') if self.scheduled_time else None,
             'frequency': self.frequency,
             'days_of_week': self.days_of_week,
+            'timezone': self.timezone,
             'is_active': self.is_active,
             'notification_enabled': self.notification_enabled,
             'language': self.language,
             'last_triggered': self.last_triggered.isoformat() if self.last_triggered else None,
             'next_trigger': self.next_trigger.isoformat() if self.next_trigger else None,
+            'pending_occurrence': self.pending_occurrence.isoformat() if self.pending_occurrence else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
\ No newline at end of file
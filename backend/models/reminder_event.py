@@ -0,0 +1,67 @@
+from database import db
+from datetime import datetime
+
+class ReminderEvent(db.Model):
+    __tablename__ = 'reminder_events'
+    __table_args__ = (
+        # Per-reminder and per-user history, newest first
+        db.Index('ix_reminder_events_reminder_id_created_at', 'reminder_id', 'created_at'),
+        db.Index('ix_reminder_events_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    # Append-only: rows are never updated, adherence is kept in reminder_adherence
+    id = db.Column(db.Integer, primary_key=True)
+    # No FK to reminders, the history outlives deleted reminders
+    reminder_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_type = db.Column(db.String(20), nullable=False)  # fired, delivered, acknowledged, missed
+    occurrence_at = db.Column(db.DateTime)  # scheduled time of the dose this event is about
+    medication_name = db.Column(db.String(100))
+    notification_id = db.Column(db.Integer)  # outbox row, for delivered events
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'reminder_id': self.reminder_id,
+            'user_id': self.user_id,
+            'event_type': self.event_type,
+            'occurrence_at': self.occurrence_at.isoformat() if self.occurrence_at else None,
+            'medication_name': self.medication_name,
+            'notification_id': self.notification_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ReminderAdherence(db.Model):
+    __tablename__ = 'reminder_adherence'
+
+    # One row per user and medication, plus a '*' row per user covering all reminders
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    medication = db.Column(db.String(100), primary_key=True)
+
+    # Running event counts; adherence = acknowledged / (acknowledged + missed)
+    fired_count = db.Column(db.Integer, nullable=False, default=0)
+    delivered_count = db.Column(db.Integer, nullable=False, default=0)
+    acknowledged_count = db.Column(db.Integer, nullable=False, default=0)
+    missed_count = db.Column(db.Integer, nullable=False, default=0)
+    last_acknowledged_at = db.Column(db.DateTime)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def adherence_percent(self):
+        resolved = (self.acknowledged_count or 0) + (self.missed_count or 0)
+        if not resolved:
+            return None
+        return round(100.0 * self.acknowledged_count / resolved, 1)
+
+    def to_dict(self):
+        return {
+            'medication': self.medication,
+            'adherence_percent': self.adherence_percent,
+            'fired': self.fired_count,
+            'delivered': self.delivered_count,
+            'acknowledged': self.acknowledged_count,
+            'missed': self.missed_count,
+            'last_acknowledged_at': self.last_acknowledged_at.isoformat() if self.last_acknowledged_at else None
+        }
@@ -0,0 +1,24 @@
+from database import db
+from datetime import datetime
+
+class StreamEvent(db.Model):
+    __tablename__ = 'stream_events'
+    __table_args__ = (
+        # Resuming a user's stream from Last-Event-ID
+        db.Index('ix_stream_events_user_id_id', 'user_id', 'id'),
+        # Pruning past the retention window
+        db.Index('ix_stream_events_created_at', 'created_at'),
+        # Ids are the SSE event ids: never reuse one, even after pruning empties the table
+        {'sqlite_autoincrement': True},
+    )
+
+    # Append-only, written in the publisher's transaction and pruned by age
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_type = db.Column(db.String(20), nullable=False)  # reminder, vitals
+    data = db.Column(db.Text, nullable=False)  # JSON, sent as is
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_event(self):
+        """(event_id, user_id, event_type, data) as the hub queues it"""
+        return (self.id, self.user_id, self.event_type, self.data)
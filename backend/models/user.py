@@ -20,6 +20,8 @@ class User(db.Model):
     # Health information
     conditions = db.Column(db.Text)  # JSON string of chronic conditions
     preferred_language = db.Column(db.String(20), default='hindi')
+    timezone = db.Column(db.String(50), nullable=False, default='Asia/Kolkata')  # IANA name, for reminder times
+    push_token = db.Column(db.String(255))  # device token registered by the app, for push reminders
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -42,5 +44,7 @@ class User(db.Model):
             'village_city': self.village_city,
             'conditions': self.conditions,
             'preferred_language': self.preferred_language,
+            'timezone': self.timezone,
+            'push_enabled': self.push_token is not None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
\ No newline at end of file
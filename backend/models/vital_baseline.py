@@ -0,0 +1,60 @@
+from database import db
+from datetime import datetime
+
+class VitalBaseline(db.Model):
+    __tablename__ = 'vital_baselines'
+    
+    # Running per-patient statistics for one metric, updated in O(1) per reading
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)
+    
+    # Welford running mean and sum of squared deviations (variance = m2 / (count - 1))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0)
+    m2 = db.Column(db.Float, nullable=False, default=0)
+    
+    # Exponentially weighted moving average, tracks recent drift
+    ewma = db.Column(db.Float)
+    
+    last_value = db.Column(db.Float)
+    last_recorded_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class VitalAnomaly(db.Model):
+    __tablename__ = 'vital_anomalies'
+    __table_args__ = (
+        db.Index('ix_vital_anomalies_user_id_recorded_at', 'user_id', 'recorded_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    vital_id = db.Column(db.Integer, db.ForeignKey('vital_records.id'), nullable=False)
+    
+    # The flagged reading and the baseline it was compared against
+    metric = db.Column(db.String(30), nullable=False)
+    value = db.Column(db.Float, nullable=False)
+    direction = db.Column(db.String(10), nullable=False)  # high, low
+    z_score = db.Column(db.Float, nullable=False)
+    baseline_mean = db.Column(db.Float, nullable=False)
+    baseline_std = db.Column(db.Float, nullable=False)
+    ewma = db.Column(db.Float)
+    
+    # Timestamps
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'vital_id': self.vital_id,
+            'metric': self.metric,
+            'value': self.value,
+            'direction': self.direction,
+            'z_score': self.z_score,
+            'baseline_mean': self.baseline_mean,
+            'baseline_std': self.baseline_std,
+            'ewma': self.ewma,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
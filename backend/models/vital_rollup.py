@@ -0,0 +1,50 @@
+from database import db
+from datetime import datetime
+
+class VitalDailyRollup(db.Model):
+    __tablename__ = 'vital_daily_rollups'
+
+    # One row per user, UTC day and measurement_time slot
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    measurement_time = db.Column(db.String(20), primary_key=True)  # morning, afternoon, evening, night, unspecified
+
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Running sum/min/max/count per metric; average = sum / count
+    blood_sugar_sum = db.Column(db.Float, nullable=False, default=0)
+    blood_sugar_min = db.Column(db.Float)
+    blood_sugar_max = db.Column(db.Float)
+    blood_sugar_count = db.Column(db.Integer, nullable=False, default=0)
+
+    systolic_sum = db.Column(db.Float, nullable=False, default=0)
+    systolic_min = db.Column(db.Integer)
+    systolic_max = db.Column(db.Integer)
+    systolic_count = db.Column(db.Integer, nullable=False, default=0)
+
+    diastolic_sum = db.Column(db.Float, nullable=False, default=0)
+    diastolic_min = db.Column(db.Integer)
+    diastolic_max = db.Column(db.Integer)
+    diastolic_count = db.Column(db.Integer, nullable=False, default=0)
+
+    weight_sum = db.Column(db.Float, nullable=False, default=0)
+    weight_min = db.Column(db.Float)
+    weight_max = db.Column(db.Float)
+    weight_count = db.Column(db.Integer, nullable=False, default=0)
+
+    heart_rate_sum = db.Column(db.Float, nullable=False, default=0)
+    heart_rate_min = db.Column(db.Integer)
+    heart_rate_max = db.Column(db.Integer)
+    heart_rate_count = db.Column(db.Integer, nullable=False, default=0)
+
+    temperature_sum = db.Column(db.Float, nullable=False, default=0)
+    temperature_min = db.Column(db.Float)
+    temperature_max = db.Column(db.Float)
+    temperature_count = db.Column(db.Integer, nullable=False, default=0)
+
+    oxygen_level_sum = db.Column(db.Float, nullable=False, default=0)
+    oxygen_level_min = db.Column(db.Float)
+    oxygen_level_max = db.Column(db.Float)
+    oxygen_level_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,12 +1,17 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, current_app, request, jsonify, render_template
 from database import db
 from models.user import User
+from services import feed_cache
+from services.idempotency import idempotent
+from services.recurrence import DEFAULT_TIMEZONE, is_valid_timezone
+from services.reminder_dispatcher import retime_reminders
 import json
 from werkzeug.security import generate_password_hash, check_password_hash
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/register', methods=['POST'])
+@idempotent
 def register():
     try:
         data = request.get_json()
@@ -17,6 +22,9 @@ def register():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
+        if not is_valid_timezone(data.get('timezone', DEFAULT_TIMEZONE)):
+            return jsonify({'error': 'Invalid timezone. Use an IANA name such as Asia/Kolkata'}), 400
+        
         # Check if user already exists
         existing_user = User.query.filter_by(email=data['email']).first()
         if existing_user:
@@ -41,7 +49,8 @@ def register():
             district=data['district'],
             village_city=data['village_city'],
             conditions=json.dumps(data.get('conditions', [])),
-            preferred_language=data.get('preferred_language', 'hindi')
+            preferred_language=data.get('preferred_language', 'hindi'),
+            timezone=data.get('timezone', DEFAULT_TIMEZONE)
         )
         
         db.session.add(user)
@@ -99,7 +108,9 @@ def update_user(user_id):
         data = request.get_json()
         
         # Update user fields
-        updatable_fields = ['name', 'phone', 'age', 'state', 'district', 'village_city', 'preferred_language']
+        # push_token is the app's device token; null unregisters it
+        updatable_fields = ['name', 'phone', 'age', 'state', 'district', 'village_city', 'preferred_language',
+                            'push_token']
         for field in updatable_fields:
             if field in data:
                 setattr(user, field, data[field])
@@ -107,7 +118,18 @@ def update_user(user_id):
         if 'conditions' in data:
             user.conditions = json.dumps(data['conditions'])
         
+        # Reminders keep their wall-clock times in the new timezone
+        rescheduled = []
+        if 'timezone' in data and data['timezone'] != user.timezone:
+            if not is_valid_timezone(data['timezone']):
+                db.session.rollback()
+                return jsonify({'error': 'Invalid timezone. Use an IANA name such as Asia/Kolkata'}), 400
+            user.timezone = data['timezone']
+            rescheduled = retime_reminders(user.id, user.timezone)
+        
         db.session.commit()
+        current_app.extensions['reminder_dispatcher'].schedule_many(rescheduled)
+        feed_cache.forget_user(current_app, user.id)
         
         return jsonify({
             'message': 'User updated successfully',
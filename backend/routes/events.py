@@ -0,0 +1,42 @@
+from flask import Blueprint, Response, current_app, request, jsonify
+from models.user import User
+from services import events
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/stream/<int:user_id>', methods=['GET'])
+def stream_events(user_id):
+    """Server-Sent Events stream of a user's due reminders and new vitals insights"""
+    try:
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        hub = current_app.extensions['event_hub']
+        subscription = events.subscribe(current_app, user_id, last_event_id)
+        if subscription is None:
+            return jsonify({'error': 'Too many open event streams, retry later'}), 503
+
+        heartbeat = current_app.config.get('EVENT_STREAM_HEARTBEAT_SECONDS', events.DEFAULT_HEARTBEAT_SECONDS)
+        # Deliberately not stream_with_context: the stream must not hold a database session while idle
+        return Response(
+            events.stream(hub, subscription, heartbeat),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to open event stream', 'details': str(e)}), 500
+
+@events_bp.route('/stats', methods=['GET'])
+def event_stats():
+    stats = current_app.extensions['event_hub'].stats()
+    stats['feed'] = current_app.extensions['event_feed'].stats()
+    return jsonify(stats)
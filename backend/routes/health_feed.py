@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from database import db
 from models.health_content import HealthContent
 from models.user import User
+from services import conditional, content_index, content_search, content_snapshot, feed_cache
+import click
 import json
 
 health_feed_bp = Blueprint('health_feed', __name__)
@@ -28,11 +30,14 @@ def create_health_content():
             priority=data.get('priority', 2),
             author=data.get('author'),
             source=data.get('source'),
-            tags=json.dumps(data.get('tags', []))
+            tags=json.dumps(data.get('tags', []), ensure_ascii=False)
         )
         
         db.session.add(health_content)
         db.session.commit()
+        content_index.index_content(current_app, [health_content])
+        feed_cache.invalidate(current_app, [(health_content.language, health_content.condition)])
+        content_snapshot.rebuild()
         
         return jsonify({
             'message': 'Health content created successfully',
@@ -46,65 +51,112 @@ def create_health_content():
 @health_feed_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_personalized_feed(user_id):
     try:
-        # Validate user exists
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        cache = current_app.extensions['feed_cache']
         
-        # Get user's conditions
-        user_conditions = json.loads(user.conditions) if user.conditions else []
+        # The user's segment (language and conditions) decides their feed
+        segment = cache.segment(user_id)
+        if segment is None:
+            # Validate user exists
+            user = User.query.get(user_id)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            
+            # Get user's conditions
+            user_conditions = json.loads(user.conditions) if user.conditions else []
+            segment = (user.preferred_language, user_conditions)
+            cache.remember_segment(user_id, *segment)
+        language, user_conditions = segment
         
         # Query parameters
         limit = request.args.get('limit', 10, type=int)
         category = request.args.get('category')
         content_type = request.args.get('content_type')
         
-        # Build query for personalized content
-        query = HealthContent.query.filter_by(
-            language=user.preferred_language,
-            is_active=True
-        )
-        
-        # Filter by user's conditions or general health content
-        if user_conditions:
-            conditions_filter = [HealthContent.condition.in_(user_conditions + ['general'])]
-            query = query.filter(db.or_(*conditions_filter))
-        else:
-            query = query.filter_by(condition='general')
+        # Read from the snapshot shared by all workers once it is built
+        response = content_snapshot.feed_response(current_app, language, user_conditions, category, content_type, limit)
+        if response is not None:
+            return response
         
-        if category:
-            query = query.filter_by(category=category)
+        # Users in the same segment share one cached feed, kept with its validator
+        key = feed_cache.feed_key(language, user_conditions, category, content_type, limit)
+        cached = cache.feed(key)
+        if cached is None:
+            generation = cache.generation
+            query = personalized_feed_filter(language, user_conditions, category, content_type)
+            validator = conditional.list_validator(query, HealthContent.updated_at, language, sorted(user_conditions))
+            if conditional.is_fresh(validator):
+                return conditional.not_modified(validator)
+            content = [item.to_dict() for item in personalized_feed_query(
+                language, user_conditions, category, content_type, limit
+            )]
+            cached = (validator, content)
+            cache.store(key, cached, generation)
+        validator, content = cached
         
-        if content_type:
-            query = query.filter_by(content_type=content_type)
-        
-        # Order by priority and creation date
-        health_content = query.order_by(
-            HealthContent.priority.asc(),
-            HealthContent.created_at.desc()
-        ).limit(limit).all()
-        
-        return jsonify({
-            'content': [content.to_dict() for content in health_content],
-            'count': len(health_content),
+        return conditional.respond(validator, lambda: jsonify({
+            'content': content,
+            'count': len(content),
             'user_conditions': user_conditions,
-            'language': user.preferred_language
-        })
+            'language': language
+        }))
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch personalized feed', 'details': str(e)}), 500
 
+def personalized_feed_filter(language, user_conditions, category=None, content_type=None):
+    """Active content for a segment, unordered"""
+    # Build query for personalized content
+    query = HealthContent.query.filter_by(
+        language=language,
+        is_active=True
+    )
+    
+    # Filter by user's conditions or general health content
+    if user_conditions:
+        conditions_filter = [HealthContent.condition.in_(user_conditions + ['general'])]
+        query = query.filter(db.or_(*conditions_filter))
+    else:
+        query = query.filter_by(condition='general')
+    
+    if category:
+        query = query.filter_by(category=category)
+    
+    if content_type:
+        query = query.filter_by(content_type=content_type)
+    
+    return query
+
+def personalized_feed_query(language, user_conditions, category=None, content_type=None, limit=10):
+    """Active content for a segment, by priority then newest first"""
+    query = personalized_feed_filter(language, user_conditions, category, content_type)
+    
+    # Order by priority and creation date
+    return query.order_by(
+        HealthContent.priority.asc(),
+        HealthContent.created_at.desc()
+    ).limit(limit).all()
+
+@health_feed_bp.route('/cache/stats', methods=['GET'])
+def feed_cache_stats():
+    return jsonify(dict(current_app.extensions['feed_cache'].stats(),
+                        snapshot=content_snapshot.stats(current_app)))
+
 @health_feed_bp.route('/categories', methods=['GET'])
 def get_categories():
     try:
-        # Get all unique categories
-        categories = db.session.query(HealthContent.category).distinct().all()
-        category_list = [cat[0] for cat in categories]
+        validator = conditional.list_validator(HealthContent.query, HealthContent.updated_at)
         
-        return jsonify({
-            'categories': category_list,
-            'count': len(category_list)
-        })
+        def render():
+            # Get all unique categories
+            categories = db.session.query(HealthContent.category).distinct().all()
+            category_list = [cat[0] for cat in categories]
+            
+            return jsonify({
+                'categories': category_list,
+                'count': len(category_list)
+            })
+        
+        return conditional.respond(validator, render)
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch categories', 'details': str(e)}), 500
@@ -112,14 +164,19 @@ def get_categories():
 @health_feed_bp.route('/conditions', methods=['GET'])
 def get_conditions():
     try:
-        # Get all unique conditions
-        conditions = db.session.query(HealthContent.condition).distinct().all()
-        condition_list = [cond[0] for cond in conditions]
+        validator = conditional.list_validator(HealthContent.query, HealthContent.updated_at)
         
-        return jsonify({
-            'conditions': condition_list,
-            'count': len(condition_list)
-        })
+        def render():
+            # Get all unique conditions
+            conditions = db.session.query(HealthContent.condition).distinct().all()
+            condition_list = [cond[0] for cond in conditions]
+            
+            return jsonify({
+                'conditions': condition_list,
+                'count': len(condition_list)
+            })
+        
+        return conditional.respond(validator, render)
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch conditions', 'details': str(e)}), 500
@@ -136,32 +193,20 @@ def search_health_content():
         if not query_text:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Build search query
-        query = HealthContent.query.filter_by(
-            language=language,
-            is_active=True
-        ).filter(
-            db.or_(
-                HealthContent.title.contains(query_text),
-                HealthContent.content.contains(query_text)
-            )
-        )
-        
-        if condition:
-            query = query.filter_by(condition=condition)
-        
-        if category:
-            query = query.filter_by(category=category)
+        # Served from the in-memory index once built, else from the database's full-text index
+        matches = content_index.search(query_text, language, condition, category, limit)
+        if matches is not None:
+            ranking = 'memory'
+        else:
+            ranking, matches = content_search.search(query_text, language, condition, category, limit)
         
-        results = query.order_by(
-            HealthContent.priority.asc(),
-            HealthContent.created_at.desc()
-        ).limit(limit).all()
+        results = [dict(content, score=score, snippet=snippet) for content, score, snippet in matches]
         
         return jsonify({
-            'results': [content.to_dict() for content in results],
+            'results': results,
             'count': len(results),
-            'query': query_text
+            'query': query_text,
+            'ranking': ranking
         })
         
     except Exception as e:
@@ -170,8 +215,14 @@ def search_health_content():
 @health_feed_bp.route('/content/<int:content_id>', methods=['GET'])
 def get_health_content(content_id):
     try:
+        # Active content is in the shared snapshot; anything else comes from the database
+        response = content_snapshot.content_response(current_app, content_id)
+        if response is not None:
+            return response
+        
         content = HealthContent.query.get_or_404(content_id)
-        return jsonify({'content': content.to_dict()})
+        return conditional.respond(conditional.row_validator(content.id, content.updated_at),
+                                   lambda: jsonify({'content': content.to_dict()}))
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch health content', 'details': str(e)}), 500
@@ -181,6 +232,8 @@ def update_health_content(content_id):
     try:
         content = HealthContent.query.get_or_404(content_id)
         data = request.get_json()
+        # Feeds that showed it before the update may not show it after
+        previous = (content.language, content.condition)
         
         # Update content fields
         updatable_fields = ['title', 'content', 'content_type', 'condition', 'category', 'priority', 'is_active', 'author', 'source']
@@ -189,9 +242,12 @@ def update_health_content(content_id):
                 setattr(content, field, data[field])
         
         if 'tags' in data:
-            content.tags = json.dumps(data['tags'])
+            content.tags = json.dumps(data['tags'], ensure_ascii=False)
         
         db.session.commit()
+        content_index.index_content(current_app, [content])
+        feed_cache.invalidate(current_app, [previous, (content.language, content.condition)])
+        content_snapshot.rebuild()
         
         return jsonify({
             'message': 'Health content updated successfully',
@@ -200,4 +256,16 @@ def update_health_content(content_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Failed to update health content', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to update health content', 'details': str(e)}), 500
+
+@health_feed_bp.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Rebuild the full-text search index over health content"""
+    indexed = content_search.rebuild()
+    click.echo(f'Rebuilt the search index over {indexed} health content items')
+
+@health_feed_bp.cli.command('build-snapshot')
+def build_snapshot_command():
+    """Write a new generation of the shared health content snapshot"""
+    metadata = content_snapshot.build(current_app)
+    click.echo(f'Wrote snapshot generation {metadata["generation"]} with {metadata["items"]} health content items')
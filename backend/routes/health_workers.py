@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from database import db
 from models.health_worker import HealthWorker, PatientWorkerConnection
 from models.user import User
+from services.adherence import user_adherence
 import json
 
 health_workers_bp = Blueprint('health_workers', __name__)
@@ -170,11 +171,13 @@ def get_health_worker_patients(health_worker_id):
             status='active'
         ).all()
         
-        # Include patient details
+        # Include patient details and reminder adherence from the rollups
+        adherence = user_adherence([connection.user_id for connection in connections])
         result = []
         for connection in connections:
             connection_dict = connection.to_dict()
             connection_dict['patient'] = connection.user.to_dict()
+            connection_dict['adherence'] = adherence.get(connection.user_id)
             result.append(connection_dict)
         
         return jsonify({
@@ -2,20 +2,31 @@ from flask import Blueprint, request, jsonify
 from database import db
 from flask import current_app
 from models.reminder import Reminder
+from models.reminder_event import ReminderAdherence, ReminderEvent
 from models.user import User
+from services import adherence, conditional
+from services.idempotency import idempotent
+from services.recurrence import calculate_next_trigger, next_triggers
+from services import reminder_dispatcher
 from datetime import datetime, time, timedelta
+import click
 import json
 
 reminders_bp = Blueprint('reminders', __name__)
 
+REQUIRED_FIELDS = ['user_id', 'title', 'reminder_type', 'scheduled_time', 'frequency']
+UPDATABLE_FIELDS = ['title', 'description', 'medication_name', 'dosage', 'frequency', 'is_active', 'notification_enabled']
+TIME_FORMAT_ERROR = 'Invalid time format. Use HH:MM (24-hour format)'
+MAX_BATCH_SIZE = 1000
+
 @reminders_bp.route('/create', methods=['POST'])
+@idempotent
 def create_reminder():
     try:
         data = request.get_json()
         
         # Validate required fields
-        required_fields = ['user_id', 'title', 'reminder_type', 'scheduled_time', 'frequency']
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
@@ -28,7 +39,7 @@ def create_reminder():
         try:
             scheduled_time = datetime.strptime(data['scheduled_time'], '%H:%M').time()
         except ValueError:
-            return jsonify({'error': 'Invalid time format. Use HH:MM (24-hour format)'}), 400
+            return jsonify({'error': TIME_FORMAT_ERROR}), 400
         
         # Create reminder
         reminder = Reminder(
@@ -41,6 +52,7 @@ def create_reminder():
             scheduled_time=scheduled_time,
             frequency=data['frequency'],
             days_of_week=json.dumps(data.get('days_of_week', [])),
+            timezone=user.timezone,
             language=data.get('language', user.preferred_language)
         )
         
@@ -62,6 +74,232 @@ def create_reminder():
         db.session.rollback()
         return jsonify({'error': 'Failed to create reminder', 'details': str(e)}), 500
 
+@reminders_bp.route('/create-batch', methods=['POST'])
+@idempotent
+def create_reminders_batch():
+    """Create a whole regimen, or one template for many patients, in one transaction.
+
+    Accepts {"reminders": [...]} where each reminder takes the same fields as
+    /create, optionally with a top-level "user_id" (one patient's regimen) or
+    "user_ids" (every reminder for each patient), and {"template": {...},
+    "user_ids": [...]}. Everything is validated first; if any reminder is
+    invalid nothing is created and every error is returned.
+    """
+    try:
+        items = expand_batch(request.get_json(silent=True))
+        if items is None:
+            return jsonify({'error': 'Expected "reminders" or "template" with "user_ids"'}), 400
+        
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} reminders'}), 413
+        
+        # Validate every referenced user with a single query
+        user_ids = set()
+        for item in items:
+            if isinstance(item, dict):
+                try:
+                    user_ids.add(int(item.get('user_id')))
+                except (TypeError, ValueError):
+                    pass
+        users = {user.id: user for user in db.session.execute(
+            db.select(User.id, User.preferred_language, User.timezone).where(User.id.in_(user_ids))
+        )} if user_ids else {}
+        
+        now = datetime.utcnow()
+        rows = []
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('reminder must be a JSON object')
+                for field in REQUIRED_FIELDS:
+                    if item.get(field) in (None, ''):
+                        raise ValueError(f'{field} is required')
+                user_id = int(item['user_id'])
+                if user_id not in users:
+                    raise LookupError('User not found')
+                rows.append({
+                    'user_id': user_id,
+                    'title': item['title'],
+                    'description': item.get('description', ''),
+                    'reminder_type': item['reminder_type'],
+                    'medication_name': item.get('medication_name'),
+                    'dosage': item.get('dosage'),
+                    'scheduled_time': parse_scheduled_time(item['scheduled_time']),
+                    'frequency': item['frequency'],
+                    'days_of_week': json.dumps(item.get('days_of_week', [])),
+                    'timezone': users[user_id].timezone,
+                    'is_active': True,
+                    'notification_enabled': bool(item.get('notification_enabled', True)),
+                    'language': item.get('language', users[user_id].preferred_language),
+                    'created_at': now,
+                    'updated_at': now
+                })
+            except (ValueError, TypeError, LookupError) as e:
+                errors.append({'index': index, 'user_id': item.get('user_id') if isinstance(item, dict) else None,
+                               'error': str(e)})
+        
+        if errors:
+            return jsonify({
+                'error': f'{len(errors)} of {len(items)} reminders are invalid, none were created',
+                'errors': errors
+            }), 400
+        if not rows:
+            return jsonify({'error': 'No reminders provided'}), 400
+        
+        # Next triggers for the whole batch, each distinct schedule computed once
+        reminders = [Reminder(**row) for row in rows]
+        for reminder, next_trigger in zip(reminders, next_triggers(reminders)):
+            reminder.next_trigger = next_trigger
+        
+        reminder_ids = db.session.scalars(
+            db.insert(Reminder).returning(Reminder.id, sort_by_parameter_order=True),
+            [dict(row, next_trigger=reminder.next_trigger) for row, reminder in zip(rows, reminders)]
+        ).all()
+        db.session.commit()
+        
+        for reminder, reminder_id in zip(reminders, reminder_ids):
+            reminder.id = reminder_id
+        schedule_reminder_jobs(reminders)
+        
+        return jsonify({
+            'message': f'Created {len(reminders)} reminders',
+            'count': len(reminders),
+            'reminders': [reminder.to_dict() for reminder in reminders]
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create reminders', 'details': str(e)}), 500
+
+@reminders_bp.route('/update-batch', methods=['POST'])
+def update_reminders_batch():
+    """Update many reminders in one transaction.
+
+    Accepts {"updates": [{"id": 1, ...}, ...]} with per-reminder changes, or
+    {"reminder_ids": [...], "changes": {...}} applying the same changes to
+    each, using the fields accepted by PUT /<id>. All or nothing, like
+    /create-batch.
+    """
+    try:
+        data = request.get_json(silent=True)
+        updates = None
+        if isinstance(data, dict):
+            updates = data.get('updates')
+            if updates is None and isinstance(data.get('reminder_ids'), list) and isinstance(data.get('changes'), dict):
+                updates = [dict(data['changes'], id=reminder_id) for reminder_id in data['reminder_ids']]
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'error': 'Expected "updates" or "reminder_ids" with "changes"'}), 400
+        
+        if len(updates) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} reminders'}), 413
+        
+        ids = set()
+        for item in updates:
+            if isinstance(item, dict):
+                try:
+                    ids.add(int(item.get('id')))
+                except (TypeError, ValueError):
+                    pass
+        reminders = {reminder.id: reminder for reminder in Reminder.query.filter(Reminder.id.in_(ids))} if ids else {}
+        
+        changed = {}
+        errors = []
+        for index, item in enumerate(updates):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('update must be a JSON object')
+                if item.get('id') is None:
+                    raise ValueError('id is required')
+                reminder = reminders.get(int(item['id']))
+                if reminder is None:
+                    raise LookupError('Reminder not found')
+                
+                for field in UPDATABLE_FIELDS:
+                    if field in item:
+                        setattr(reminder, field, item[field])
+                if 'scheduled_time' in item:
+                    reminder.scheduled_time = parse_scheduled_time(item['scheduled_time'])
+                if 'days_of_week' in item:
+                    reminder.days_of_week = json.dumps(item['days_of_week'])
+                changed[reminder.id] = reminder
+            except (ValueError, TypeError, LookupError) as e:
+                errors.append({'index': index, 'id': item.get('id') if isinstance(item, dict) else None, 'error': str(e)})
+        
+        if errors:
+            db.session.rollback()
+            return jsonify({
+                'error': f'{len(errors)} of {len(updates)} updates are invalid, none were applied',
+                'errors': errors
+            }), 400
+        
+        # Recalculate next triggers for the whole batch
+        updated = list(changed.values())
+        for reminder, next_trigger in zip(updated, next_triggers(updated)):
+            reminder.next_trigger = next_trigger
+        
+        db.session.commit()
+        
+        schedule_reminder_jobs(updated)
+        
+        return jsonify({
+            'message': f'Updated {len(updated)} reminders',
+            'count': len(updated),
+            'reminders': [reminder.to_dict() for reminder in updated]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update reminders', 'details': str(e)}), 500
+
+@reminders_bp.route('/deactivate-batch', methods=['POST'])
+def deactivate_reminders_batch():
+    """Deactivate reminders by id, or all of some patients' reminders, with one UPDATE.
+
+    Accepts {"reminder_ids": [...]} or {"user_ids": [...]}, the latter
+    optionally narrowed by "medication_name" (stopping one medicine) or
+    "reminder_type".
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if isinstance(data.get('reminder_ids'), list) and data['reminder_ids']:
+            column, ids = Reminder.id, data['reminder_ids']
+        elif isinstance(data.get('user_ids'), list) and data['user_ids']:
+            column, ids = Reminder.user_id, data['user_ids']
+        else:
+            return jsonify({'error': 'reminder_ids or user_ids is required'}), 400
+        if len(ids) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} ids'}), 413
+        
+        conditions = [Reminder.is_active == True, column.in_([int(value) for value in ids])]
+        if data.get('medication_name'):
+            conditions.append(Reminder.medication_name == data['medication_name'])
+        if data.get('reminder_type'):
+            conditions.append(Reminder.reminder_type == data['reminder_type'])
+        
+        reminder_ids = db.session.scalars(
+            db.update(Reminder.__table__)
+            .where(*conditions)
+            .values(is_active=False, updated_at=datetime.utcnow())
+            .returning(Reminder.__table__.c.id)
+        ).all()
+        db.session.commit()
+        
+        current_app.extensions['reminder_dispatcher'].unschedule_many(reminder_ids)
+        
+        return jsonify({
+            'message': f'Deactivated {len(reminder_ids)} reminders',
+            'count': len(reminder_ids),
+            'reminder_ids': reminder_ids
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid data format', 'details': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to deactivate reminders', 'details': str(e)}), 500
+
 @reminders_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_user_reminders(user_id):
     try:
@@ -81,12 +319,18 @@ def get_user_reminders(user_id):
         if active_only:
             query = query.filter_by(is_active=True)
         
-        reminders = query.order_by(Reminder.scheduled_time).all()
+        # Firing a reminder updates it too, so a changed next_trigger is a new version
+        validator = conditional.list_validator(query, Reminder.updated_at)
         
-        return jsonify({
-            'reminders': [reminder.to_dict() for reminder in reminders],
-            'count': len(reminders)
-        })
+        def render():
+            reminders = query.order_by(Reminder.scheduled_time).all()
+            
+            return jsonify({
+                'reminders': [reminder.to_dict() for reminder in reminders],
+                'count': len(reminders)
+            })
+        
+        return conditional.respond(validator, render)
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch reminders', 'details': str(e)}), 500
@@ -98,8 +342,7 @@ def update_reminder(reminder_id):
         data = request.get_json()
         
         # Update reminder fields
-        updatable_fields = ['title', 'description', 'medication_name', 'dosage', 'frequency', 'is_active', 'notification_enabled']
-        for field in updatable_fields:
+        for field in UPDATABLE_FIELDS:
             if field in data:
                 setattr(reminder, field, data[field])
         
@@ -107,7 +350,7 @@ def update_reminder(reminder_id):
             try:
                 reminder.scheduled_time = datetime.strptime(data['scheduled_time'], '%H:%M').time()
             except ValueError:
-                return jsonify({'error': 'Invalid time format. Use HH:MM (24-hour format)'}), 400
+                return jsonify({'error': TIME_FORMAT_ERROR}), 400
         
         if 'days_of_week' in data:
             reminder.days_of_week = json.dumps(data['days_of_week'])
@@ -134,15 +377,12 @@ def delete_reminder(reminder_id):
     try:
         reminder = Reminder.query.get_or_404(reminder_id)
         
-        # Remove scheduled job
-        try:
-            current_app.scheduler.remove_job(f'reminder_{reminder_id}')
-        except:
-            pass  # Job might not exist
-        
         db.session.delete(reminder)
         db.session.commit()
         
+        # Drop it from the dispatcher's in-memory window
+        current_app.extensions['reminder_dispatcher'].unschedule(reminder_id)
+        
         return jsonify({'message': 'Reminder deleted successfully'})
         
     except Exception as e:
@@ -166,75 +406,156 @@ def trigger_reminder(reminder_id):
     except Exception as e:
         return jsonify({'error': 'Failed to trigger reminder', 'details': str(e)}), 500
 
-def calculate_next_trigger(reminder):
-    """Calculate the next trigger time for a reminder"""
-    now = datetime.now()
-    today = now.date()
-    
-    # Combine today's date with the scheduled time
-    next_trigger = datetime.combine(today, reminder.scheduled_time)
-    
-    # If the time has already passed today, move to tomorrow
-    if next_trigger <= now:
-        next_trigger += timedelta(days=1)
-    
-    # Handle frequency and days of week
-    if reminder.frequency == 'daily':
-        return next_trigger
-    elif reminder.frequency == 'weekly':
-        return next_trigger + timedelta(days=7)
-    elif reminder.frequency == 'custom' and reminder.days_of_week:
-        days_of_week = json.loads(reminder.days_of_week)
-        # Find next occurrence based on days of week
-        while next_trigger.strftime('%A').lower() not in [day.lower() for day in days_of_week]:
-            next_trigger += timedelta(days=1)
-        return next_trigger
-    
-    return next_trigger
+@reminders_bp.route('/<int:reminder_id>/acknowledge', methods=['POST'])
+def acknowledge_reminder(reminder_id):
+    """Record that the patient took the reminder's last fired dose"""
+    try:
+        reminder = Reminder.query.get_or_404(reminder_id)
+        
+        event = adherence.acknowledge(reminder)
+        if event is None:
+            db.session.rollback()
+            return jsonify({'error': 'No pending dose to acknowledge'}), 409
+        
+        db.session.commit()
+        
+        overall = db.session.get(ReminderAdherence, (reminder.user_id, adherence.ALL_MEDICATIONS))
+        return jsonify({
+            'message': 'Reminder acknowledged',
+            'occurrence_at': event['occurrence_at'].isoformat() if event['occurrence_at'] else None,
+            'adherence': overall.to_dict() if overall else None
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to acknowledge reminder', 'details': str(e)}), 500
 
-def schedule_reminder_job(reminder):
-    """Schedule a reminder job with APScheduler"""
+@reminders_bp.route('/<int:reminder_id>/events', methods=['GET'])
+def get_reminder_events(reminder_id):
     try:
-        job_id = f'reminder_{reminder.id}'
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        
+        events = ReminderEvent.query.filter_by(reminder_id=reminder_id).order_by(
+            ReminderEvent.created_at.desc(), ReminderEvent.id.desc()
+        ).limit(limit).all()
+        
+        return jsonify({
+            'events': [event.to_dict() for event in events],
+            'count': len(events)
+        })
         
-        # Remove existing job if it exists
-        try:
-            current_app.scheduler.remove_job(job_id)
-        except:
-            pass
-        
-        if reminder.is_active and reminder.next_trigger:
-            current_app.scheduler.add_job(
-                id=job_id,
-                func=execute_reminder,
-                args=[reminder.id],
-                trigger='date',
-                run_date=reminder.next_trigger,
-                replace_existing=True
-            )
     except Exception as e:
-        print(f"Error scheduling reminder {reminder.id}: {e}")
+        return jsonify({'error': 'Failed to fetch reminder events', 'details': str(e)}), 500
 
-def execute_reminder(reminder_id):
-    """Execute a reminder when triggered"""
+@reminders_bp.route('/adherence/<int:user_id>', methods=['GET'])
+def get_user_adherence(user_id):
     try:
-        with db.session.begin():
-            reminder = Reminder.query.get(reminder_id)
-            if not reminder or not reminder.is_active:
-                return
-            
-            # Update last triggered time
-            reminder.last_triggered = datetime.now()
-            
-            # Calculate next trigger time
-            reminder.next_trigger = calculate_next_trigger(reminder)
-            
-            # Here you would send notifications (SMS, email, push notifications)
-            # For now, we'll just log the reminder
-            print(f"Reminder triggered: {reminder.title} for user {reminder.user_id}")
-            
-            # Reschedule for next occurrence
-            schedule_reminder_job(reminder)
-            
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        rows = ReminderAdherence.query.filter_by(user_id=user_id).order_by(ReminderAdherence.medication).all()
+        overall = next((row for row in rows if row.medication == adherence.ALL_MEDICATIONS), None)
+        
+        return jsonify({
+            'user_id': user_id,
+            'adherence': overall.to_dict() if overall else None,
+            'medications': [row.to_dict() for row in rows if row.medication != adherence.ALL_MEDICATIONS]
+        })
+        
     except Exception as e:
-        print(f"Error executing reminder {reminder_id}: {e}")
\ No newline at end of file
+        return jsonify({'error': 'Failed to fetch adherence', 'details': str(e)}), 500
+
+@reminders_bp.cli.command('dispatch')
+@click.option('--horizon', type=int, help='Seconds of upcoming reminders kept in memory')
+@click.option('--poll-interval', type=float, help='Seconds between index polls')
+@click.option('--batch-size', type=int, help='Reminders per poll page and per fired batch')
+@click.option('--workers', type=int, help='Worker threads firing reminders')
+@click.option('--catch-up', type=click.Choice(reminder_dispatcher.CATCH_UP_POLICIES),
+              help='Fire or skip reminders that fell due while no dispatcher was running')
+def dispatch_command(horizon, poll_interval, batch_size, workers, catch_up):
+    """Run the reminder dispatcher in the foreground until interrupted"""
+    options = reminder_dispatcher.settings(current_app.config)
+    overrides = {
+        'horizon': horizon, 'poll_interval': poll_interval, 'batch_size': batch_size,
+        'workers': workers, 'catch_up': catch_up
+    }
+    options.update({name: value for name, value in overrides.items() if value is not None})
+    
+    dispatcher = reminder_dispatcher.ReminderDispatcher(current_app._get_current_object(), **options)
+    current_app.extensions['reminder_dispatcher'] = dispatcher
+    dispatcher.start()
+    click.echo('Reminder dispatcher running, press Ctrl+C to stop')
+    try:
+        while dispatcher.running:
+            dispatcher.thread.join(60)
+            click.echo(json.dumps(dispatcher.stats.to_dict()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.stop()
+
+@reminders_bp.cli.command('mark-missed')
+@click.option('--missed-after', type=int, help='Seconds a fired dose may stay unacknowledged')
+def mark_missed_command(missed_after):
+    """Record overdue unacknowledged doses as missed"""
+    if missed_after is None:
+        missed_after = current_app.config.get('REMINDER_MISSED_AFTER_SECONDS', adherence.DEFAULT_MISSED_AFTER_SECONDS)
+    missed = adherence.mark_missed(datetime.utcnow(), missed_after)
+    click.echo(f'Marked {missed} doses as missed')
+
+@reminders_bp.cli.command('rebuild-adherence')
+@click.option('--user-id', type=int, multiple=True, help='Only rebuild these users (repeatable)')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Users per transaction')
+def rebuild_adherence_command(user_id, chunk_size):
+    """Rebuild reminder_adherence from reminder_events (backfill)"""
+    processed = adherence.rebuild(list(user_id) or None, chunk_size=chunk_size)
+    click.echo(f'Rebuilt reminder adherence for {processed} users')
+
+def schedule_reminder_job(reminder):
+    """Hand a created or updated reminder to the reminder dispatcher"""
+    schedule_reminder_jobs([reminder])
+
+def schedule_reminder_jobs(reminders):
+    """Hand created or updated reminders to the reminder dispatcher in one operation"""
+    dispatcher = current_app.extensions['reminder_dispatcher']
+    dispatcher.schedule_many(
+        (reminder.id, reminder.next_trigger) for reminder in reminders if reminder.is_active and reminder.next_trigger
+    )
+    dispatcher.unschedule_many([
+        reminder.id for reminder in reminders if not (reminder.is_active and reminder.next_trigger)
+    ])
+
+def parse_scheduled_time(value):
+    try:
+        return datetime.strptime(value, '%H:%M').time()
+    except (TypeError, ValueError):
+        raise ValueError(TIME_FORMAT_ERROR)
+
+def expand_batch(data):
+    """Reminder specs of a /create-batch body, each with its user_id filled in, or None"""
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return None
+    specs = data.get('reminders')
+    if specs is None and isinstance(data.get('template'), dict):
+        specs = [data['template']]
+    if not isinstance(specs, list):
+        return None
+    
+    if isinstance(data.get('user_ids'), list):
+        targets = data['user_ids']
+    elif data.get('user_id') is not None:
+        targets = [data['user_id']]
+    else:
+        return specs
+    return [
+        dict(spec, user_id=spec.get('user_id', user_id)) if isinstance(spec, dict) else spec
+        for user_id in targets for spec in specs
+    ]
+
+def execute_reminder(reminder_id):
+    """Fire a reminder immediately, whether or not it is due"""
+    reminder_dispatcher.fire_reminders([reminder_id], due_only=False, coalesce_seconds=0)
@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, Response, request, jsonify, render_template, stream_with_context
 from database import db
 from models.vitals import VitalRecord
+from models.vital_rollup import VitalDailyRollup
+from models.latest_vitals import LatestVitals
+from models.vital_baseline import VitalAnomaly
 from models.user import User
-from datetime import datetime, timedelta
+from models.health_worker import PatientWorkerConnection
+from services import anomalies, conditional, downsampling, events, latest_vitals, screening, vital_rollups
+from services.idempotency import idempotent
+from datetime import datetime, time, timedelta, timezone
+import click
+import csv
+import io
+import json
+import numpy as np
 
 vitals_bp = Blueprint('vitals', __name__)
 
 @vitals_bp.route('/log', methods=['POST'])
+@idempotent
 def log_vitals():
     try:
         data = request.get_json()
@@ -22,37 +34,27 @@ def log_vitals():
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Convert string values to appropriate types
-        blood_sugar = float(data.get('blood_sugar')) if data.get('blood_sugar') else None
-        bp_systolic = int(data.get('blood_pressure_systolic')) if data.get('blood_pressure_systolic') else None
-        bp_diastolic = int(data.get('blood_pressure_diastolic')) if data.get('blood_pressure_diastolic') else None
-        weight = float(data.get('weight')) if data.get('weight') else None
-        heart_rate = int(data.get('heart_rate')) if data.get('heart_rate') else None
-        temperature = float(data.get('temperature')) if data.get('temperature') else None
-        oxygen_level = float(data.get('oxygen_level')) if data.get('oxygen_level') else None
-
         vital_record = VitalRecord(
             user_id=user_id,
-            blood_sugar=blood_sugar,
-            blood_pressure_systolic=bp_systolic,
-            blood_pressure_diastolic=bp_diastolic,
-            weight=weight,
-            heart_rate=heart_rate,
-            temperature=temperature,
-            oxygen_level=oxygen_level,
-            measurement_time=data.get('measurement_time'),
-            before_after_meal=data.get('before_after_meal'),
-            notes=data.get('notes'),
-            recorded_at=datetime.utcnow()
+            recorded_at=datetime.utcnow(),
+            **parse_vital_fields(data)
         )
 
         db.session.add(vital_record)
+        db.session.flush()
+        
+        # Keep the daily rollup, latest snapshot and baselines in step within the same transaction
+        vital_rollups.record_vital(vital_record)
+        latest_vitals.record_vitals([vital_record])
+        flagged = anomalies.record_vitals([vital_record])
+        publish_vitals([vital_record], flagged)
         db.session.commit()
 
         return jsonify({
             'message': 'Vitals logged successfully', 
             'vital_id': vital_record.id,
-            'vital': vital_record.to_dict()
+            'vital': vital_record.to_dict(),
+            'anomalies': [anomalies.anomaly_payload(anomaly) for anomaly in flagged]
         }), 201
 
     except ValueError as e:
@@ -61,6 +63,94 @@ def log_vitals():
         db.session.rollback()
         return jsonify({'error': 'Failed to log vitals', 'details': str(e)}), 500
 
+@vitals_bp.route('/log-batch', methods=['POST'])
+@idempotent
+def log_vitals_batch():
+    """Log many readings, for many users, in one transaction.
+
+    Accepts a JSON array (or {"readings": [...]}) or an NDJSON body with one
+    reading per line. Each reading takes the same fields as /log plus an
+    optional ISO-8601 recorded_at for readings captured offline. Invalid
+    readings are rejected individually; the rest are inserted together.
+    """
+    try:
+        readings, results = parse_batch_body()
+        if readings is None:
+            return jsonify({'error': 'Expected a JSON array or NDJSON body of readings'}), 400
+        
+        if len(readings) + len(results) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'A batch may contain at most {MAX_BATCH_SIZE} readings'}), 413
+        
+        # Validate every referenced user with a single query
+        user_ids = set()
+        for _, item in readings:
+            if isinstance(item, dict) and item.get('user_id'):
+                try:
+                    user_ids.add(int(item['user_id']))
+                except (TypeError, ValueError):
+                    pass
+        known_users = set(db.session.scalars(
+            db.select(User.id).where(User.id.in_(user_ids))
+        )) if user_ids else set()
+        
+        now = datetime.utcnow()
+        rows = []
+        row_indexes = []
+        flagged = []
+        for index, item in readings:
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('reading must be a JSON object')
+                if not item.get('user_id'):
+                    raise ValueError('user_id is required')
+                user_id = int(item['user_id'])
+                if user_id not in known_users:
+                    raise LookupError('User not found')
+                
+                row = parse_vital_fields(item)
+                row['user_id'] = user_id
+                row['recorded_at'] = parse_recorded_at(item.get('recorded_at'), now)
+                row['created_at'] = now
+                rows.append(row)
+                row_indexes.append(index)
+            except (ValueError, TypeError, LookupError) as e:
+                results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+        
+        if rows:
+            vital_ids = db.session.scalars(
+                db.insert(VitalRecord).returning(VitalRecord.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+            vital_rollups.record_vitals(rows)
+            vitals = [VitalRecord(id=vital_id, **row) for row, vital_id in zip(rows, vital_ids)]
+            latest_vitals.record_vitals(vitals)
+            flagged = anomalies.record_vitals(vitals)
+            publish_vitals(vitals, flagged)
+            db.session.commit()
+            
+            for index, row, vital_id in zip(row_indexes, rows, vital_ids):
+                results.append({
+                    'index': index,
+                    'status': 'accepted',
+                    'vital_id': vital_id,
+                    'user_id': row['user_id']
+                })
+        
+        results.sort(key=lambda result: result['index'])
+        accepted = len(rows)
+        
+        return jsonify({
+            'message': f'Logged {accepted} of {len(results)} readings',
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results,
+            'anomalies': [anomalies.anomaly_payload(anomaly) for anomaly in flagged]
+        }), 201 if accepted else 400
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to log vitals batch', 'details': str(e)}), 500
+
 @vitals_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_user_vitals(user_id):
     try:
@@ -71,52 +161,290 @@ def get_user_vitals(user_id):
         
         # Get query parameters
         limit = request.args.get('limit', 50, type=int)
-        days = request.args.get('days', 30, type=int)
+        days = request.args.get('days', type=int)
+        before = request.args.get('before')
+        
+        if limit is None or limit < 1 or limit > MAX_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+        
+        cursor = None
+        if before:
+            try:
+                cursor = parse_cursor(before)
+            except ValueError:
+                return jsonify({'error': 'before must be a cursor of the form <recorded_at>,<id>'}), 400
+        elif days is None:
+            # Without a cursor keep the original 30 day window
+            days = 30
         
         # Calculate date range
         end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
+        start_date = end_date - timedelta(days=days) if days is not None else None
         
-        # Query vitals
-        vitals = VitalRecord.query.filter(
+        # Keyset pagination over (recorded_at, id), newest first
+        query = VitalRecord.query.filter(
             VitalRecord.user_id == user_id,
-            VitalRecord.recorded_at >= start_date,
             VitalRecord.recorded_at <= end_date
-        ).order_by(VitalRecord.recorded_at.desc()).limit(limit).all()
+        )
+        if start_date:
+            query = query.filter(VitalRecord.recorded_at >= start_date)
+        if cursor:
+            cursor_time, cursor_id = cursor
+            query = query.filter(db.or_(
+                VitalRecord.recorded_at < cursor_time,
+                db.and_(VitalRecord.recorded_at == cursor_time, VitalRecord.id < cursor_id)
+            ))
         
-        return jsonify({
-            'vitals': [vital.to_dict() for vital in vitals],
-            'count': len(vitals),
-            'date_range': {
-                'start': start_date.isoformat(),
-                'end': end_date.isoformat()
-            }
-        })
+        # Readings are not edited, so the newest created_at and the count identify the window's contents
+        validator = conditional.list_validator(query, VitalRecord.created_at)
+        
+        def render():
+            vitals = query.order_by(
+                VitalRecord.recorded_at.desc(),
+                VitalRecord.id.desc()
+            ).limit(limit).all()
+            
+            next_cursor = None
+            if len(vitals) == limit:
+                next_cursor = f'{vitals[-1].recorded_at.isoformat()},{vitals[-1].id}'
+            
+            return jsonify({
+                'vitals': [vital.to_dict() for vital in vitals],
+                'count': len(vitals),
+                'next_cursor': next_cursor,
+                'date_range': {
+                    'start': start_date.isoformat() if start_date else None,
+                    'end': end_date.isoformat()
+                }
+            })
+        
+        return conditional.respond(validator, render)
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch vitals', 'details': str(e)}), 500
 
+@vitals_bp.route('/user/<int:user_id>/export', methods=['GET'])
+def export_user_vitals(user_id):
+    """Stream a user's full vitals history as NDJSON or CSV, oldest first"""
+    try:
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        export_format = request.args.get('format', 'ndjson')
+        days = request.args.get('days', type=int)
+        
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be one of: ndjson, csv'}), 400
+        
+        columns = [getattr(VitalRecord, name) for name in EXPORT_COLUMNS]
+        query = db.select(*columns).where(VitalRecord.user_id == user_id)
+        if days:
+            query = query.where(VitalRecord.recorded_at >= datetime.utcnow() - timedelta(days=days))
+        # yield_per streams rows through a server-side cursor where the driver supports it
+        query = query.order_by(VitalRecord.recorded_at, VitalRecord.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        
+        if export_format == 'csv':
+            generate, mimetype = generate_csv, 'text/csv'
+        else:
+            generate, mimetype = generate_ndjson, 'application/x-ndjson'
+        
+        return Response(
+            stream_with_context(generate(db.session.execute(query))),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename=vitals_user_{user_id}.{export_format}'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to export vitals', 'details': str(e)}), 500
+
 @vitals_bp.route('/user/<int:user_id>/latest', methods=['GET'])
 def get_latest_vitals(user_id):
     try:
+        # Served from the per-user snapshot maintained by log_vitals
+        snapshot = db.session.get(LatestVitals, user_id)
+        if snapshot:
+            return jsonify(snapshot.to_dict())
+        
         # Validate user exists
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get latest vital record
-        latest_vital = VitalRecord.query.filter_by(user_id=user_id).order_by(VitalRecord.recorded_at.desc()).first()
+        return jsonify({'message': 'No vitals found for this user'}), 404
         
-        if not latest_vital:
-            return jsonify({'message': 'No vitals found for this user'}), 404
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch latest vitals', 'details': str(e)}), 500
+
+@vitals_bp.route('/user/<int:user_id>/series', methods=['GET'])
+def get_vitals_series(user_id):
+    """Downsampled (timestamp, value) series of one metric, sized for charts"""
+    try:
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        metric = request.args.get('metric')
+        points = request.args.get('points', 500, type=int)
+        method = request.args.get('method', 'lttb')
+        days = request.args.get('days', type=int)
+        
+        if metric not in SERIES_METRICS:
+            return jsonify({'error': f'metric must be one of: {", ".join(SERIES_METRICS)}'}), 400
+        if points is None or points < 3 or points > MAX_SERIES_POINTS:
+            return jsonify({'error': f'points must be between 3 and {MAX_SERIES_POINTS}'}), 400
+        if method not in ('lttb', 'minmax'):
+            return jsonify({'error': 'method must be one of: lttb, minmax'}), 400
+        
+        # Columnar fetch of plain (epoch seconds, value) tuples, no ORM objects
+        column = getattr(VitalRecord, metric)
+        query = db.select(epoch_seconds(VitalRecord.recorded_at), column).where(
+            VitalRecord.user_id == user_id,
+            column.isnot(None)
+        )
+        if days:
+            query = query.where(VitalRecord.recorded_at >= datetime.utcnow() - timedelta(days=days))
+        rows = db.session.execute(query.order_by(VitalRecord.recorded_at, VitalRecord.id)).all()
+        
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        timestamps, values = data[:, 0], data[:, 1]
+        
+        downsample = downsampling.lttb if method == 'lttb' else downsampling.minmax
+        selected = downsample(timestamps, values, points)
         
         return jsonify({
-            'vital': latest_vital.to_dict(),
-            'insights': latest_vital.get_health_insights()
+            'metric': metric,
+            'method': method,
+            'source_points': len(rows),
+            'points': len(selected),
+            # Epoch milliseconds, directly usable by chart libraries
+            'timestamps': np.rint(timestamps[selected] * 1000).astype(np.int64).tolist(),
+            'values': values[selected].tolist()
         })
         
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch latest vitals', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to fetch vitals series', 'details': str(e)}), 500
+
+@vitals_bp.route('/user/<int:user_id>/anomalies', methods=['GET'])
+def get_vitals_anomalies(user_id):
+    """Readings flagged against the patient's own baseline, newest first"""
+    try:
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        days = request.args.get('days', 30, type=int)
+        metric = request.args.get('metric')
+        limit = request.args.get('limit', 100, type=int)
+        
+        if metric and metric not in anomalies.METRICS:
+            return jsonify({'error': f'metric must be one of: {", ".join(anomalies.METRICS)}'}), 400
+        if limit is None or limit < 1 or limit > MAX_ANOMALY_RESULTS:
+            return jsonify({'error': f'limit must be between 1 and {MAX_ANOMALY_RESULTS}'}), 400
+        
+        query = VitalAnomaly.query.filter(
+            VitalAnomaly.user_id == user_id,
+            VitalAnomaly.recorded_at >= datetime.utcnow() - timedelta(days=days)
+        )
+        if metric:
+            query = query.filter(VitalAnomaly.metric == metric)
+        
+        flagged = query.order_by(VitalAnomaly.recorded_at.desc()).limit(limit).all()
+        
+        return jsonify({
+            'anomalies': [anomaly.to_dict() for anomaly in flagged],
+            'count': len(flagged)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch vitals anomalies', 'details': str(e)}), 500
+
+@vitals_bp.route('/screening', methods=['GET'])
+def screen_cohort():
+    """Flag patients whose latest vitals cross screening thresholds"""
+    try:
+        state = request.args.get('state')
+        district = request.args.get('district')
+        health_worker_id = request.args.get('health_worker_id', type=int)
+        days = request.args.get('days', type=int)
+        limit = request.args.get('limit', 100, type=int)
+        rules = request.args.get('rules')
+        rules = rules.split(',') if rules else screening.DEFAULT_RULES
+        
+        if limit is None or limit < 1 or limit > MAX_SCREENING_RESULTS:
+            return jsonify({'error': f'limit must be between 1 and {MAX_SCREENING_RESULTS}'}), 400
+        unknown = [rule for rule in rules if rule not in screening.RULES]
+        if unknown:
+            return jsonify({'error': f'Unknown rules: {", ".join(unknown)}',
+                            'available_rules': list(screening.RULES)}), 400
+        try:
+            thresholds = screening.thresholds_from(request.args)
+        except ValueError:
+            return jsonify({'error': 'Thresholds must be numbers'}), 400
+        
+        # One columnar query over the cohort's snapshots, no ORM objects
+        query = db.select(
+            LatestVitals.user_id,
+            LatestVitals.blood_sugar_meal,
+            *[getattr(LatestVitals, name) for name in screening.COLUMNS]
+        )
+        if state or district:
+            query = query.join(User, User.id == LatestVitals.user_id)
+            if state:
+                query = query.where(User.state == state)
+            if district:
+                query = query.where(User.district == district)
+        if health_worker_id:
+            query = query.where(LatestVitals.user_id.in_(
+                db.select(PatientWorkerConnection.user_id).where(
+                    PatientWorkerConnection.health_worker_id == health_worker_id,
+                    PatientWorkerConnection.status == 'active'
+                )
+            ))
+        if days:
+            query = query.where(LatestVitals.recorded_at >= datetime.utcnow() - timedelta(days=days))
+        rows = db.session.execute(query).all()
+        
+        user_ids, columns, masks = screening.screen(rows, rules, thresholds)
+        flag_counts = np.zeros(len(user_ids), dtype=np.int64)
+        for mask in masks.values():
+            flag_counts += mask
+        
+        # Most flags first; only the flagged rows are ever materialized as dicts
+        flagged = np.flatnonzero(flag_counts)
+        flagged = flagged[np.lexsort((user_ids[flagged], -flag_counts[flagged]))][:limit]
+        
+        names = dict(db.session.execute(
+            db.select(User.id, User.name).where(User.id.in_(user_ids[flagged].tolist()))
+        ).all()) if len(flagged) else {}
+        
+        patients = []
+        for i in flagged.tolist():
+            user_id = int(user_ids[i])
+            values = {name: None if np.isnan(columns[name][i]) else float(columns[name][i])
+                      for name in screening.COLUMNS}
+            patients.append({
+                'user_id': user_id,
+                'name': names.get(user_id),
+                'flags': [rule for rule in rules if masks[rule][i]],
+                'latest_values': values
+            })
+        
+        return jsonify({
+            'cohort_size': len(user_ids),
+            'flagged_count': int(np.count_nonzero(flag_counts)),
+            'rule_counts': {rule: int(np.count_nonzero(mask)) for rule, mask in masks.items()},
+            'rules': {rule: screening.RULES[rule].format(**thresholds) for rule in rules},
+            'patients': patients
+        })
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to screen patients', 'details': str(e)}), 500
 
 @vitals_bp.route('/user/<int:user_id>/stats', methods=['GET'])
 def get_vitals_stats(user_id):
@@ -126,96 +454,323 @@ def get_vitals_stats(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Get vitals from last 30 days
+        days = request.args.get('days', 30, type=int)
+        group_by = request.args.get('group_by')
+        
+        if days is None or days < 1:
+            return jsonify({'error': 'days must be a positive integer'}), 400
+        if group_by and group_by not in ('day', 'week'):
+            return jsonify({'error': 'group_by must be one of: day, week'}), 400
+        
+        # Stats are served from daily rollups, so the window covers whole UTC days
         end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
+        start_day = end_date.date() - timedelta(days=days - 1)
+        day_filter = [
+            VitalDailyRollup.user_id == user_id,
+            VitalDailyRollup.day >= start_day
+        ]
         
-        vitals = VitalRecord.query.filter(
-            VitalRecord.user_id == user_id,
-            VitalRecord.recorded_at >= start_date
-        ).all()
+        totals = db.session.execute(
+            db.select(*vital_rollups.aggregate_columns()).where(*day_filter)
+        ).one()
         
-        if not vitals:
+        if not totals.total_records:
             return jsonify({'message': 'No vitals data available for statistics'}), 404
         
-        # Calculate basic statistics
         stats = {
-            'total_records': len(vitals),
+            'total_records': totals.total_records,
             'date_range': {
-                'start': start_date.isoformat(),
+                'start': datetime.combine(start_day, time.min).isoformat(),
                 'end': end_date.isoformat()
             }
         }
+        stats.update(format_vitals_stats(totals))
         
-        # Blood sugar stats
-        blood_sugar_values = [v.blood_sugar for v in vitals if v.blood_sugar]
-        if blood_sugar_values:
-            stats['blood_sugar'] = {
-                'average': sum(blood_sugar_values) / len(blood_sugar_values),
-                'min': min(blood_sugar_values),
-                'max': max(blood_sugar_values),
-                'count': len(blood_sugar_values)
-            }
-        
-        # Blood pressure stats
-        bp_systolic = [v.blood_pressure_systolic for v in vitals if v.blood_pressure_systolic]
-        bp_diastolic = [v.blood_pressure_diastolic for v in vitals if v.blood_pressure_diastolic]
-        if bp_systolic and bp_diastolic:
-            stats['blood_pressure'] = {
-                'systolic': {
-                    'average': sum(bp_systolic) / len(bp_systolic),
-                    'min': min(bp_systolic),
-                    'max': max(bp_systolic)
-                },
-                'diastolic': {
-                    'average': sum(bp_diastolic) / len(bp_diastolic),
-                    'min': min(bp_diastolic),
-                    'max': max(bp_diastolic)
-                },
-                'count': len(bp_systolic)
-            }
+        if group_by:
+            bucket = vital_rollups.bucket_expression(group_by).label('bucket')
+            rows = db.session.execute(
+                db.select(bucket, *vital_rollups.aggregate_columns())
+                .where(*day_filter)
+                .group_by(bucket)
+                .order_by(bucket)
+            ).all()
+            
+            stats['group_by'] = group_by
+            stats['buckets'] = [
+                dict(
+                    start=format_bucket_start(row.bucket),
+                    total_records=row.total_records,
+                    **format_vitals_stats(row)
+                )
+                for row in rows
+            ]
         
-        # Weight stats
-        weight_values = [v.weight for v in vitals if v.weight]
-        if weight_values:
-            stats['weight'] = {
-                'average': sum(weight_values) / len(weight_values),
-                'min': min(weight_values),
-                'max': max(weight_values),
-                'count': len(weight_values)
-            }
+        return jsonify({'stats': stats})
         
-        # Heart rate stats
-        heart_rate_values = [v.heart_rate for v in vitals if v.heart_rate]
-        if heart_rate_values:
-            stats['heart_rate'] = {
-                'average': sum(heart_rate_values) / len(heart_rate_values),
-                'min': min(heart_rate_values),
-                'max': max(heart_rate_values),
-                'count': len(heart_rate_values)
-            }
-
-        # Temperature stats
-        temperature_values = [v.temperature for v in vitals if v.temperature]
-        if temperature_values:
-            stats['temperature'] = {
-                'average': sum(temperature_values) / len(temperature_values),
-                'min': min(temperature_values),
-                'max': max(temperature_values),
-                'count': len(temperature_values)
-            }
+    except Exception as e:
+        return jsonify({'error': 'Failed to calculate vitals statistics', 'details': str(e)}), 500
 
-        # Oxygen level stats
-        oxygen_values = [v.oxygen_level for v in vitals if v.oxygen_level]
-        if oxygen_values:
-            stats['oxygen_level'] = {
-                'average': sum(oxygen_values) / len(oxygen_values),
-                'min': min(oxygen_values),
-                'max': max(oxygen_values),
-                'count': len(oxygen_values)
+@vitals_bp.route('/user/<int:user_id>/trend', methods=['GET'])
+def get_vitals_trend(user_id):
+    """Chart-ready per-day (or per-week) series read from the daily rollups"""
+    try:
+        # Validate user exists
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        days = request.args.get('days', 90, type=int)
+        group_by = request.args.get('group_by', 'day')
+        measurement_time = request.args.get('measurement_time')
+        metrics = request.args.get('metrics')
+        
+        if days is None or days < 1:
+            return jsonify({'error': 'days must be a positive integer'}), 400
+        if group_by not in ('day', 'week'):
+            return jsonify({'error': 'group_by must be one of: day, week'}), 400
+        
+        known_metrics = [prefix for prefix, _ in vital_rollups.METRICS]
+        if metrics:
+            metrics = [m.strip() for m in metrics.split(',') if m.strip()]
+            unknown = [m for m in metrics if m not in known_metrics]
+            if unknown:
+                return jsonify({'error': f'Unknown metrics: {", ".join(unknown)}'}), 400
+        else:
+            metrics = known_metrics
+        
+        end_date = datetime.utcnow()
+        start_day = end_date.date() - timedelta(days=days - 1)
+        
+        bucket = vital_rollups.bucket_expression(group_by).label('bucket')
+        query = db.select(bucket, *vital_rollups.aggregate_columns(metrics)).where(
+            VitalDailyRollup.user_id == user_id,
+            VitalDailyRollup.day >= start_day
+        )
+        if measurement_time:
+            query = query.where(VitalDailyRollup.measurement_time == measurement_time)
+        
+        rows = db.session.execute(query.group_by(bucket).order_by(bucket)).all()
+        
+        series = {}
+        for metric in metrics:
+            summaries = [metric_summary(row, metric) for row in rows]
+            series[metric] = {
+                key: [summary[key] for summary in summaries]
+                for key in ('average', 'min', 'max', 'count')
             }
         
-        return jsonify({'stats': stats})
+        return jsonify({
+            'trend': {
+                'group_by': group_by,
+                'measurement_time': measurement_time,
+                'buckets': [format_bucket_start(row.bucket) for row in rows],
+                'total_records': [row.total_records for row in rows],
+                'series': series
+            },
+            'date_range': {
+                'start': start_day.isoformat(),
+                'end': end_date.date().isoformat()
+            }
+        })
         
     except Exception as e:
-        return jsonify({'error': 'Failed to calculate vitals statistics', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to fetch vitals trend', 'details': str(e)}), 500
+
+@vitals_bp.cli.command('rebuild-rollups')
+@click.option('--user-id', type=int, multiple=True, help='Only rebuild these users (repeatable)')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Users per transaction')
+def rebuild_rollups_command(user_id, chunk_size):
+    """Rebuild vital_daily_rollups from vital_records (backfill)"""
+    processed = vital_rollups.rebuild(list(user_id) or None, chunk_size=chunk_size)
+    click.echo(f'Rebuilt daily vitals rollups for {processed} users')
+
+MAX_SERIES_POINTS = 5000
+MAX_SCREENING_RESULTS = 1000
+MAX_ANOMALY_RESULTS = 1000
+SERIES_METRICS = [
+    'blood_sugar', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+    'weight', 'heart_rate', 'temperature', 'oxygen_level'
+]
+
+def epoch_seconds(column):
+    """SQL expression converting a DateTime column to float seconds since the Unix epoch"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.func.extract('epoch', column)
+    return (db.func.julianday(column) - 2440587.5) * 86400.0
+
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_COLUMNS = [
+    'id', 'user_id', 'blood_sugar', 'blood_pressure_systolic', 'blood_pressure_diastolic',
+    'weight', 'heart_rate', 'temperature', 'oxygen_level', 'measurement_time',
+    'before_after_meal', 'notes', 'recorded_at', 'created_at'
+]
+
+def parse_cursor(value):
+    """Split a '<recorded_at>,<id>' pagination cursor"""
+    recorded_at, vital_id = value.rsplit(',', 1)
+    return datetime.fromisoformat(recorded_at), int(vital_id)
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def generate_ndjson(result):
+    for rows in result.partitions():
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(export_value, row)))) + '\n'
+            for row in rows
+        )
+
+def generate_csv(result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in result.partitions():
+        writer.writerows([export_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+MAX_BATCH_SIZE = 5000
+
+def parse_vital_fields(data):
+    """Convert the measurement fields of a request payload to column values"""
+    # Convert string values to appropriate types
+    blood_sugar = float(data.get('blood_sugar')) if data.get('blood_sugar') else None
+    bp_systolic = int(data.get('blood_pressure_systolic')) if data.get('blood_pressure_systolic') else None
+    bp_diastolic = int(data.get('blood_pressure_diastolic')) if data.get('blood_pressure_diastolic') else None
+    weight = float(data.get('weight')) if data.get('weight') else None
+    heart_rate = int(data.get('heart_rate')) if data.get('heart_rate') else None
+    temperature = float(data.get('temperature')) if data.get('temperature') else None
+    oxygen_level = float(data.get('oxygen_level')) if data.get('oxygen_level') else None
+    
+    return {
+        'blood_sugar': blood_sugar,
+        'blood_pressure_systolic': bp_systolic,
+        'blood_pressure_diastolic': bp_diastolic,
+        'weight': weight,
+        'heart_rate': heart_rate,
+        'temperature': temperature,
+        'oxygen_level': oxygen_level,
+        'measurement_time': data.get('measurement_time'),
+        'before_after_meal': data.get('before_after_meal'),
+        'notes': data.get('notes')
+    }
+
+def parse_recorded_at(value, now):
+    """Parse an optional ISO-8601 timestamp into naive UTC, defaulting to now"""
+    if not value:
+        return now
+    if not isinstance(value, str):
+        raise ValueError('recorded_at must be an ISO-8601 string')
+    recorded_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if recorded_at > now + timedelta(minutes=5):
+        raise ValueError('recorded_at is in the future')
+    return recorded_at
+
+def publish_vitals(vitals, flagged):
+    """Record each user's newest reading, its insights and any anomalies for their event streams; the caller commits"""
+    newest = {}
+    for vital in sorted(vitals, key=lambda v: (v.recorded_at, v.id)):
+        newest[vital.user_id] = vital
+    flagged_by_user = {}
+    for anomaly in flagged:
+        flagged_by_user.setdefault(anomaly['user_id'], []).append(anomalies.anomaly_payload(anomaly))
+    events.record([
+        (user_id, 'vitals', {
+            'vital': vital.to_dict(),
+            'insights': vital.get_health_insights(),
+            'anomalies': flagged_by_user.get(user_id, [])
+        })
+        for user_id, vital in newest.items()
+    ])
+
+def parse_batch_body():
+    """Return ([(index, reading), ...], [early rejections]) or (None, None) if the body is unusable"""
+    if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+        readings, rejected = [], []
+        lines = [line for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        for index, line in enumerate(lines):
+            try:
+                readings.append((index, json.loads(line)))
+            except ValueError as e:
+                rejected.append({'index': index, 'status': 'rejected', 'error': f'Invalid JSON: {e}'})
+        return readings, rejected
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        return None, None
+    return list(enumerate(data)), []
+
+@vitals_bp.cli.command('rebuild-latest')
+@click.option('--user-id', type=int, multiple=True, help='Only rebuild these users (repeatable)')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Users per transaction')
+def rebuild_latest_command(user_id, chunk_size):
+    """Rebuild latest_vitals snapshots from vital_records (backfill)"""
+    processed = latest_vitals.rebuild(list(user_id) or None, chunk_size=chunk_size)
+    click.echo(f'Rebuilt latest vitals snapshots for {processed} users')
+
+@vitals_bp.cli.command('check-latest')
+@click.option('--user-id', type=int, multiple=True, help='Only check these users (repeatable)')
+@click.option('--fix', is_flag=True, help='Rebuild snapshots that do not match')
+def check_latest_command(user_id, fix):
+    """Verify latest_vitals snapshots against vital_records"""
+    problems = latest_vitals.check_consistency(list(user_id) or None)
+    for problem_user_id, problem in problems:
+        click.echo(f'user {problem_user_id}: {problem}')
+    if not problems:
+        click.echo('All latest vitals snapshots are consistent')
+        return
+    if fix:
+        latest_vitals.rebuild(sorted({problem_user_id for problem_user_id, _ in problems}))
+        click.echo(f'Rebuilt {len(problems)} inconsistent snapshots')
+    else:
+        raise SystemExit(1)
+
+@vitals_bp.cli.command('replay-baselines')
+@click.option('--user-id', type=int, multiple=True, help='Only replay these users (repeatable)')
+@click.option('--chunk-size', type=int, default=200, show_default=True, help='Users per transaction')
+@click.option('--no-flag', is_flag=True, help='Rebuild baselines without re-flagging historical anomalies')
+def replay_baselines_command(user_id, chunk_size, no_flag):
+    """Recompute anomaly baselines by replaying vitals history"""
+    start = datetime.utcnow()
+    users, readings = anomalies.replay(list(user_id) or None, chunk_size=chunk_size, flag=not no_flag)
+    seconds = max((datetime.utcnow() - start).total_seconds(), 1e-9)
+    click.echo(f'Replayed {readings} readings for {users} users ({readings / seconds:.0f} readings/s)')
+
+def format_bucket_start(value):
+    if hasattr(value, 'date'):
+        value = value.date()
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+def metric_summary(row, name):
+    average = getattr(row, f'{name}_average')
+    return {
+        'average': float(average) if average is not None else None,
+        'min': getattr(row, f'{name}_min'),
+        'max': getattr(row, f'{name}_max'),
+        'count': getattr(row, f'{name}_count')
+    }
+
+def format_vitals_stats(row):
+    """Shape an aggregate row into the per-metric blocks returned by /stats"""
+    stats = {}
+    for name in ('blood_sugar', 'weight', 'heart_rate', 'temperature', 'oxygen_level'):
+        if getattr(row, f'{name}_count'):
+            stats[name] = metric_summary(row, name)
+    
+    if row.systolic_count and row.diastolic_count:
+        stats['blood_pressure'] = {
+            'systolic': metric_summary(row, 'systolic'),
+            'diastolic': metric_summary(row, 'diastolic'),
+            'count': row.systolic_count
+        }
+    
+    return stats
@@ -0,0 +1,212 @@
+"""Reminder adherence: an append-only event log plus incrementally kept rollups.
+
+Every fired, delivered, acknowledged or missed reminder appends a row to
+reminder_events and, in the same transaction, bumps its user's
+reminder_adherence counters (one row per medication and a '*' row for all
+of the user's reminders), so adherence on patient lists is a primary key
+read rather than a scan over events.
+
+A fired dose stays pending (Reminder.pending_occurrence) until the patient
+acknowledges it. It counts as missed once it has been pending for
+REMINDER_MISSED_AFTER_SECONDS, or when the reminder fires again first.
+"""
+from database import claim_rows, db, upsert_insert
+from datetime import datetime, timedelta
+from models.reminder import Reminder
+from models.reminder_event import ReminderAdherence, ReminderEvent
+import json
+
+EVENT_TYPES = ['fired', 'delivered', 'acknowledged', 'missed']
+ALL_MEDICATIONS = '*'
+DEFAULT_MISSED_AFTER_SECONDS = 4 * 3600
+
+def event(reminder, event_type, occurrence_at, now=None, notification_id=None):
+    """reminder_events row for a Reminder (or a row with id, user_id and medication_name)"""
+    return {
+        'reminder_id': reminder.id,
+        'user_id': reminder.user_id,
+        'event_type': event_type,
+        'occurrence_at': occurrence_at,
+        'medication_name': reminder.medication_name,
+        'notification_id': notification_id,
+        'created_at': now or datetime.utcnow()
+    }
+
+def upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE adding its counts to the existing rollup row"""
+    stmt = upsert_insert(ReminderAdherence)
+    table = ReminderAdherence.__table__
+    new = stmt.excluded
+
+    changes = {f'{event_type}_count': table.c[f'{event_type}_count'] + new[f'{event_type}_count']
+               for event_type in EVENT_TYPES}
+    changes['last_acknowledged_at'] = db.case(
+        (new.last_acknowledged_at.is_(None), table.c.last_acknowledged_at),
+        (table.c.last_acknowledged_at.is_(None), new.last_acknowledged_at),
+        (new.last_acknowledged_at > table.c.last_acknowledged_at, new.last_acknowledged_at),
+        else_=table.c.last_acknowledged_at
+    )
+    changes['updated_at'] = new.updated_at
+
+    return stmt.on_conflict_do_update(index_elements=['user_id', 'medication'], set_=changes)
+
+def record_events(events):
+    """Append events and fold them into the adherence rollups; runs in the caller's transaction.
+
+    Events are counted per (user, medication) first, so the rollups take
+    one multi-row upsert however many events there are.
+    """
+    if not events:
+        return
+    db.session.execute(db.insert(ReminderEvent), events)
+
+    now = datetime.utcnow()
+    grouped = {}
+    for item in events:
+        for medication in (ALL_MEDICATIONS, item['medication_name']):
+            if not medication:
+                continue
+            key = (item['user_id'], medication)
+            values = grouped.get(key)
+            if values is None:
+                values = grouped[key] = {
+                    'user_id': item['user_id'],
+                    'medication': medication,
+                    'last_acknowledged_at': None,
+                    'updated_at': now
+                }
+                values.update({f'{event_type}_count': 0 for event_type in EVENT_TYPES})
+            values[f'{item["event_type"]}_count'] += 1
+            if item['event_type'] == 'acknowledged':
+                values['last_acknowledged_at'] = max(filter(None, (values['last_acknowledged_at'], item['created_at'])))
+    db.session.execute(upsert_statement(), list(grouped.values()))
+
+def fired_events(reminders):
+    """Events for reminders about to fire: the fired dose, and a missed one if the last is still pending"""
+    now = datetime.utcnow()
+    events = []
+    for reminder in reminders:
+        if reminder.pending_occurrence is not None:
+            events.append(event(reminder, 'missed', reminder.pending_occurrence, now))
+        events.append(event(reminder, 'fired', reminder.next_trigger, now))
+    return events
+
+def delivered_events(messages):
+    """Events for sent outbox rows, one per reminder each message covered"""
+    reminder_ids = {}
+    for message in messages:
+        ids = json.loads(message.reminder_ids) if message.reminder_ids else [message.reminder_id]
+        reminder_ids.update({reminder_id: message.id for reminder_id in ids if reminder_id is not None})
+    if not reminder_ids:
+        return []
+    reminders = db.session.execute(
+        db.select(Reminder.id, Reminder.user_id, Reminder.medication_name, Reminder.pending_occurrence)
+        .where(Reminder.id.in_(reminder_ids))
+    ).all()
+    now = datetime.utcnow()
+    return [
+        event(reminder, 'delivered', reminder.pending_occurrence, now, notification_id=reminder_ids[reminder.id])
+        for reminder in reminders
+    ]
+
+def acknowledge(reminder):
+    """Acknowledge the reminder's pending dose in the caller's transaction.
+
+    Returns the acknowledged event, or None when no dose is pending (already
+    acknowledged, missed, or never fired). The UPDATE is guarded by the
+    pending occurrence, so a double tap records one acknowledgement.
+    """
+    occurrence = reminder.pending_occurrence
+    if occurrence is None:
+        return None
+    table = Reminder.__table__
+    result = db.session.execute(
+        db.update(table)
+        .where(table.c.id == reminder.id, table.c.pending_occurrence == occurrence)
+        .values(pending_occurrence=None)
+    )
+    if not result.rowcount:
+        return None
+    acknowledged = event(reminder, 'acknowledged', occurrence)
+    record_events([acknowledged])
+    return acknowledged
+
+def mark_missed(now, missed_after, batch_size=500):
+    """Record doses pending for longer than missed_after seconds as missed; returns how many.
+
+    Works in batches, each in its own transaction. Reminders leased by a
+    dispatcher are left alone: firing them records their missed dose.
+    """
+    cutoff = now - timedelta(seconds=missed_after)
+    table = Reminder.__table__
+    total = 0
+    while True:
+        pending = db.session.execute(
+            db.select(table.c.id, table.c.user_id, table.c.medication_name, table.c.pending_occurrence)
+            .where(table.c.pending_occurrence <= cutoff)
+            .order_by(table.c.pending_occurrence)
+            .limit(batch_size)
+        ).all()
+        if not pending:
+            db.session.rollback()
+            return total
+        cleared = set(claim_rows(table, [
+            table.c.id.in_([row.id for row in pending]),
+            table.c.pending_occurrence <= cutoff,
+            db.or_(table.c.claim_expires_at.is_(None), table.c.claim_expires_at <= now)
+        ], {'pending_occurrence': None}))
+        record_events([event(row, 'missed', row.pending_occurrence) for row in pending if row.id in cleared])
+        db.session.commit()
+        total += len(cleared)
+        if len(pending) < batch_size or not cleared:
+            return total
+
+def user_adherence(user_ids):
+    """user_id -> overall ReminderAdherence.to_dict() for users with any events"""
+    rows = db.session.scalars(
+        db.select(ReminderAdherence)
+        .where(ReminderAdherence.user_id.in_(user_ids), ReminderAdherence.medication == ALL_MEDICATIONS)
+    ).all()
+    return {row.user_id: row.to_dict() for row in rows}
+
+def rebuild(user_ids=None, chunk_size=500):
+    """Recompute reminder_adherence from reminder_events with set-based INSERT ... SELECT.
+
+    Users are processed in chunks, each in its own transaction. Returns the
+    number of users processed.
+    """
+    if user_ids is None:
+        user_ids = list(db.session.scalars(
+            db.select(ReminderEvent.user_id).distinct().order_by(ReminderEvent.user_id)
+        ))
+
+    counts = [
+        db.func.coalesce(db.func.sum(db.case((ReminderEvent.event_type == event_type, 1), else_=0)), 0)
+        for event_type in EVENT_TYPES
+    ]
+    last_acknowledged = db.func.max(
+        db.case((ReminderEvent.event_type == 'acknowledged', ReminderEvent.created_at), else_=None)
+    )
+    insert_columns = ['user_id', 'medication'] + [f'{event_type}_count' for event_type in EVENT_TYPES]
+    insert_columns += ['last_acknowledged_at', 'updated_at']
+
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        db.session.execute(db.delete(ReminderAdherence).where(ReminderAdherence.user_id.in_(chunk)))
+        overall = (
+            db.select(ReminderEvent.user_id, db.literal(ALL_MEDICATIONS), *counts, last_acknowledged,
+                      db.func.current_timestamp())
+            .where(ReminderEvent.user_id.in_(chunk))
+            .group_by(ReminderEvent.user_id)
+        )
+        per_medication = (
+            db.select(ReminderEvent.user_id, ReminderEvent.medication_name, *counts, last_acknowledged,
+                      db.func.current_timestamp())
+            .where(ReminderEvent.user_id.in_(chunk), ReminderEvent.medication_name.isnot(None))
+            .group_by(ReminderEvent.user_id, ReminderEvent.medication_name)
+        )
+        for query in (overall, per_medication):
+            db.session.execute(db.insert(ReminderAdherence).from_select(insert_columns, query))
+        db.session.commit()
+
+    return len(user_ids)
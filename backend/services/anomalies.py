@@ -0,0 +1,212 @@
+"""Per-patient streaming anomaly detection for vitals.
+
+Each (user, metric) keeps a compact running baseline: Welford mean/variance
+and an EWMA. A new reading is scored against the patient's own baseline
+before being folded in, so a sudden BP spike or SpO2 drop is flagged even
+when it is still inside the fixed thresholds of get_health_insights().
+"""
+from database import db, upsert_insert
+from datetime import datetime
+from flask import current_app
+from models.vital_baseline import VitalAnomaly, VitalBaseline
+from models.vitals import VitalRecord
+import math
+
+# metric -> (direction worth flagging, std floor so very stable patients aren't flagged for noise)
+METRICS = {
+    'blood_sugar': ('both', 8.0),
+    'blood_pressure_systolic': ('high', 5.0),
+    'blood_pressure_diastolic': ('high', 4.0),
+    'weight': ('both', 0.5),
+    'heart_rate': ('both', 4.0),
+    'temperature': ('high', 0.3),
+    'oxygen_level': ('low', 1.0),
+}
+
+DEFAULT_Z_THRESHOLD = 3.0
+DEFAULT_MIN_SAMPLES = 5
+DEFAULT_EWMA_ALPHA = 0.2
+
+class BaselineState:
+    """Mutable running statistics for one (user, metric)"""
+    __slots__ = ('count', 'mean', 'm2', 'ewma', 'last_value', 'last_recorded_at')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, ewma=None, last_value=None, last_recorded_at=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.last_value = last_value
+        self.last_recorded_at = last_recorded_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.count, row.mean, row.m2, row.ewma, row.last_value, row.last_recorded_at)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def update(self, value, recorded_at, alpha):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+        self.last_value = value
+        self.last_recorded_at = recorded_at
+
+    def as_row(self, user_id, metric, now):
+        return {
+            'user_id': user_id,
+            'metric': metric,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'ewma': self.ewma,
+            'last_value': self.last_value,
+            'last_recorded_at': self.last_recorded_at,
+            'updated_at': now
+        }
+
+def settings():
+    config = current_app.config
+    return (
+        config.get('ANOMALY_Z_THRESHOLD', DEFAULT_Z_THRESHOLD),
+        config.get('ANOMALY_MIN_SAMPLES', DEFAULT_MIN_SAMPLES),
+        config.get('ANOMALY_EWMA_ALPHA', DEFAULT_EWMA_ALPHA)
+    )
+
+def score(state, metric, value, z_threshold, min_samples):
+    """Anomaly fields if value deviates from the baseline in a flagged direction, else None"""
+    if state.count < min_samples:
+        return None
+    direction, std_floor = METRICS[metric]
+    std = max(state.std(), std_floor)
+    z = (value - state.mean) / std
+    if abs(z) < z_threshold:
+        return None
+    if (direction == 'high' and z < 0) or (direction == 'low' and z > 0):
+        return None
+    return {
+        'metric': metric,
+        'value': value,
+        'direction': 'high' if z > 0 else 'low',
+        'z_score': round(z, 3),
+        'baseline_mean': state.mean,
+        'baseline_std': std,
+        'ewma': state.ewma
+    }
+
+def fold(readings, states, config):
+    """Score then absorb each reading; returns (anomaly rows, readings processed).
+
+    readings yield (vital_id, user_id, recorded_at, {metric: value}) in
+    chronological order; states maps (user_id, metric) to BaselineState and
+    is updated in place.
+    """
+    z_threshold, min_samples, alpha = config
+    anomalies = []
+    processed = 0
+    for vital_id, user_id, recorded_at, values in readings:
+        processed += 1
+        for metric, value in values.items():
+            if value is None:
+                continue
+            key = (user_id, metric)
+            state = states.get(key)
+            if state is None:
+                state = states[key] = BaselineState()
+            anomaly = score(state, metric, value, z_threshold, min_samples)
+            if anomaly:
+                anomaly.update(user_id=user_id, vital_id=vital_id, recorded_at=recorded_at)
+                anomalies.append(anomaly)
+            state.update(value, recorded_at, alpha)
+    return anomalies, processed
+
+def vital_readings(vitals):
+    for vital in sorted(vitals, key=lambda v: (v.recorded_at, v.id)):
+        yield vital.id, vital.user_id, vital.recorded_at, {metric: getattr(vital, metric) for metric in METRICS}
+
+def record_vitals(vitals):
+    """Score and absorb newly persisted VitalRecords in the caller's transaction.
+
+    Loads every affected baseline with one (row-locking on Postgres) query,
+    writes them back with one upsert and returns the anomalies flagged.
+    """
+    if not vitals:
+        return []
+    user_ids = {vital.user_id for vital in vitals}
+    # Plain rows rather than ORM objects, the write back below is a Core upsert
+    rows = db.session.execute(
+        db.select(*VitalBaseline.__table__.c).where(VitalBaseline.user_id.in_(user_ids)).with_for_update()
+    )
+    states = {(row.user_id, row.metric): BaselineState.from_row(row) for row in rows}
+
+    anomalies, _ = fold(vital_readings(vitals), states, settings())
+
+    now = datetime.utcnow()
+    touched = {(vital.user_id, metric) for vital in vitals for metric in METRICS if getattr(vital, metric) is not None}
+    if touched:
+        stmt = upsert_insert(VitalBaseline)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'metric'],
+            set_={name: stmt.excluded[name] for name in ('count', 'mean', 'm2', 'ewma', 'last_value', 'last_recorded_at', 'updated_at')}
+        )
+        db.session.execute(stmt, [states[key].as_row(key[0], key[1], now) for key in touched])
+    if anomalies:
+        db.session.execute(db.insert(VitalAnomaly), [dict(anomaly, created_at=now) for anomaly in anomalies])
+    return anomalies
+
+def replay(user_ids=None, chunk_size=200, flag=True, yield_per=5000):
+    """Recompute baselines (and optionally anomalies) by replaying history.
+
+    Streams plain column tuples per chunk of users, oldest first, through the
+    same fold used on writes. Returns (users processed, readings replayed).
+    """
+    if user_ids is None:
+        user_ids = list(db.session.scalars(
+            db.select(VitalRecord.user_id).distinct().order_by(VitalRecord.user_id)
+        ))
+
+    config = settings()
+    metric_columns = [getattr(VitalRecord, metric) for metric in METRICS]
+    metric_names = list(METRICS)
+    replayed = 0
+
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        result = db.session.execute(
+            db.select(VitalRecord.id, VitalRecord.user_id, VitalRecord.recorded_at, *metric_columns)
+            .where(VitalRecord.user_id.in_(chunk))
+            .order_by(VitalRecord.user_id, VitalRecord.recorded_at, VitalRecord.id)
+            .execution_options(yield_per=yield_per)
+        )
+        readings = (
+            (row[0], row[1], row[2], dict(zip(metric_names, row[3:])))
+            for row in result
+        )
+
+        states = {}
+        anomalies, processed = fold(readings, states, config)
+        replayed += processed
+
+        now = datetime.utcnow()
+        db.session.execute(db.delete(VitalBaseline).where(VitalBaseline.user_id.in_(chunk)))
+        if states:
+            db.session.execute(db.insert(VitalBaseline), [
+                state.as_row(user_id, metric, now) for (user_id, metric), state in states.items()
+            ])
+        if flag:
+            db.session.execute(db.delete(VitalAnomaly).where(VitalAnomaly.user_id.in_(chunk)))
+            if anomalies:
+                db.session.execute(db.insert(VitalAnomaly), [dict(anomaly, created_at=now) for anomaly in anomalies])
+        db.session.commit()
+
+    return len(user_ids), replayed
+
+def anomaly_payload(anomaly):
+    """JSON-ready copy of an anomaly row dict"""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in anomaly.items()
+    }
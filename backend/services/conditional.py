@@ -0,0 +1,72 @@
+"""Conditional GET: ETag and Last-Modified validators for read endpoints.
+
+A route computes a Validator from something cheap, the row version of a
+single item or max(updated_at) plus count(*) of a list, and hands respond()
+a function that renders the full response. When the request's
+If-None-Match (or, without one, If-Modified-Since) still matches, respond()
+returns an empty 304 and the render function is never called, so nothing
+is loaded or serialized beyond the validator itself.
+
+ETags are weak: they cover the request path and query string plus the
+validator, and mark responses that are equivalent rather than byte for
+byte identical (some carry the time of the request). Last-Modified is the
+newest updated_at; a list that only lost rows keeps it, so a row deleted
+outright is noticed through the ETag's count, not through If-Modified-Since.
+Responses are marked private, no-cache: clients keep them and revalidate.
+"""
+from collections import namedtuple
+from database import db
+from datetime import timezone
+from flask import current_app, request
+import hashlib
+
+CACHE_CONTROL = 'private, no-cache'
+
+Validator = namedtuple('Validator', ['etag', 'last_modified'])
+
+def validator(*parts, last_modified=None):
+    """Validator over the request's path and query string plus parts, which must have a stable repr()"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(request.path.encode())
+    digest.update(repr(sorted(request.args.items(multi=True))).encode())
+    digest.update(repr(parts).encode())
+    if last_modified is not None:
+        # HTTP dates have whole seconds; stored times are naive UTC
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    return Validator(digest.hexdigest(), last_modified)
+
+def row_validator(row_id, updated_at, *parts):
+    """Validator for a single row: its id and version"""
+    return validator(row_id, updated_at, *parts, last_modified=updated_at)
+
+def list_validator(query, updated_at, *parts):
+    """Validator for the rows a query selects: one aggregate query for max(updated_at) and count(*)"""
+    last_modified, count = query.with_entities(db.func.max(updated_at), db.func.count()).order_by(None).one()
+    return validator(count, last_modified, *parts, last_modified=last_modified)
+
+def is_fresh(validator):
+    """Whether the client's cached copy still matches"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(validator.etag)
+    if request.if_modified_since and validator.last_modified is not None:
+        return validator.last_modified <= request.if_modified_since
+    return False
+
+def tag(response, validator):
+    response.set_etag(validator.etag, weak=True)
+    if validator.last_modified is not None:
+        response.last_modified = validator.last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def not_modified(validator):
+    return tag(current_app.response_class(status=304), validator)
+
+def respond(validator, render):
+    """304 Not Modified when the client's copy is fresh, else render()'s response with the validators"""
+    if request.method in ('GET', 'HEAD') and is_fresh(validator):
+        return not_modified(validator)
+    response = current_app.make_response(render())
+    if response.status_code == 200:
+        tag(response, validator)
+    return response
@@ -0,0 +1,517 @@
+"""In-process inverted index over active health content, for /search.
+
+Each worker keeps, per language, a posting list for every normalized word:
+the ids of the articles containing it as a sorted array('i'), with a
+parallel array('H') of field-weighted term frequencies. It also keeps each
+article's to_dict() and its feed ordering fields, so a search never touches
+the database and is ranked with BM25 in memory. That is about 2 KB per
+article, mostly the to_dict(). Lookups take well under a millisecond once a
+term's postings have been ranked; the first query for a term after it
+changes sorts them (tens of milliseconds for the most common words).
+
+Indic text is tokenized on Unicode word characters plus combining marks, so
+words are not split at matras. Nuktas are dropped and common spelling
+variants are folded (long and short i/u, chandrabindu and anusvara). The
+Indic blocks share the ISCII layout, so one table covers Devanagari,
+Bengali, Gurmukhi, Gujarati, Oriya, Tamil, Telugu, Kannada and Malayalam.
+Every word also gets a transliteration key, its consonant skeleton with
+voicing and aspiration collapsed. Latin and Indic spellings of a word share
+the key, so "madhumeh" finds मधुमेह and "neerizhivu" finds நீரிழிவு.
+
+The index is built in a background thread on a worker's first request.
+Until it is ready, search falls back to the database (content_search).
+Writes in this worker are applied as soon as they commit. Every
+CONTENT_INDEX_REFRESH_SECONDS a search first picks up rows other workers
+changed (updated_at at or after the last refresh), so deactivated content
+drops out. Rows deleted outside the API are not noticed until a rebuild.
+"""
+from array import array
+from bisect import bisect_left
+from database import db
+from datetime import datetime, timedelta
+from flask import current_app
+from functools import lru_cache
+from models.health_content import HealthContent
+from operator import itemgetter
+from services.content_search import HIGHLIGHT, SNIPPET_WORDS, TERM_PATTERN
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+
+DEFAULT_REFRESH_SECONDS = 5
+# Rows committed up to this long before a refresh started are read again, so
+# transactions that were still open (or clocks slightly behind) are not missed
+REFRESH_OVERLAP_SECONDS = 5
+BUILD_BATCH_SIZE = 5000
+# Query words match longer words as prefixes, up to this many per word
+MAX_PREFIX_EXPANSIONS = 50
+MIN_KEY_LENGTH = 2
+FIELD_WEIGHTS = {'title': 3, 'tags': 2, 'content': 1}
+# Score multipliers for words matched other than exactly
+PREFIX_MATCH = 0.6
+TRANSLITERATION_MATCH = 0.8
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Indic blocks from Devanagari to Malayalam, 128 code points each with the same layout
+INDIC_BLOCKS = range(0x0900, 0x0D80, 0x80)
+NUKTA = 0x3C
+# Spelling variants folded together: long i/u to short, chandrabindu to anusvara
+VOWEL_FOLDS = {0x08: 0x07, 0x0A: 0x09, 0x40: 0x3F, 0x42: 0x41, 0x01: 0x02}
+ANUSVARA = 0x02
+# Consonants by block offset, voiced and aspirated stops merged into one letter
+CONSONANT_KEYS = {
+    0x15: 'k', 0x16: 'k', 0x17: 'k', 0x18: 'k', 0x19: 'n',
+    0x1A: 'c', 0x1B: 'c', 0x1C: 'c', 0x1D: 'c', 0x1E: 'n',
+    0x1F: 't', 0x20: 't', 0x21: 't', 0x22: 't', 0x23: 'n',
+    0x24: 't', 0x25: 't', 0x26: 't', 0x27: 't', 0x28: 'n', 0x29: 'n',
+    0x2A: 'p', 0x2B: 'p', 0x2C: 'p', 0x2D: 'p', 0x2E: 'm',
+    0x2F: 'y', 0x30: 'r', 0x31: 'r', 0x32: 'l', 0x33: 'l', 0x34: 'l', 0x35: 'v',
+    0x36: 's', 0x37: 's', 0x38: 's', 0x39: 'h',
+}
+# Romanized spellings, reduced the same way: digraphs first, then single letters
+LATIN_DIGRAPHS = [('chh', 'c'), ('ch', 'c'), ('sh', 's'), ('kh', 'k'), ('gh', 'k'), ('jh', 'c'),
+                  ('th', 't'), ('dh', 't'), ('ph', 'p'), ('bh', 'p'), ('zh', 'l')]
+LATIN_KEYS = {'b': 'p', 'd': 't', 'g': 'k', 'j': 'c', 'f': 'p', 'q': 'k', 'w': 'v', 'z': 'c', 'x': 'ks'}
+
+def _assigned(code):
+    return unicodedata.category(chr(code)) != 'Cn'
+
+def _tables():
+    folds = {}
+    keys = {ord(vowel): None for vowel in 'aeiou'}
+    keys.update({ord(letter): key for letter, key in LATIN_KEYS.items()})
+    for base in INDIC_BLOCKS:
+        if _assigned(base + NUKTA):
+            folds[base + NUKTA] = None
+        for source, target in VOWEL_FOLDS.items():
+            if _assigned(base + source) and _assigned(base + target):
+                folds[base + source] = base + target
+        for offset in range(0x80):
+            if _assigned(base + offset):
+                keys[base + offset] = CONSONANT_KEYS.get(offset)
+        keys[base + ANUSVARA] = 'N'
+    return folds, keys
+
+FOLDS, KEYS = _tables()
+REPEATS = re.compile(r'(.)\1+')
+
+@lru_cache(maxsize=200000)
+def normalize(word):
+    """Case-folded word with nuktas removed and Indic vowel variants folded.
+
+    Cached: the vocabulary is small next to the number of words indexed, and
+    every document then shares one string object per term.
+    """
+    return unicodedata.normalize('NFC', unicodedata.normalize('NFD', word).translate(FOLDS)).lower()
+
+def terms(text):
+    return [normalize(word) for word in TERM_PATTERN.findall(text or '')]
+
+def transliteration_key(term):
+    """Consonant skeleton shared by Latin and Indic spellings of a word, e.g. madhumeh/मधुमेह -> mtmh"""
+    for digraph, letter in LATIN_DIGRAPHS:
+        term = term.replace(digraph, letter)
+    key = term.translate(KEYS)
+    # Anusvara is m before a labial and n elsewhere, as it is usually romanized
+    key = ''.join('m' if letter == 'N' and key[i + 1:i + 2] in ('p', 'm') else 'n' if letter == 'N' else letter
+                  for i, letter in enumerate(key))
+    return REPEATS.sub(r'\1', key)
+
+def field_weights(data):
+    """term -> field-weighted frequency for a HealthContent.to_dict()"""
+    weights = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in terms(data.get(field)):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+def bm25(weight, length, average_length):
+    """BM25 term frequency component, before idf"""
+    return weight * (BM25_K1 + 1) / (weight + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+
+def idf(frequency, documents):
+    return math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
+
+def scaled(ranking, scale):
+    ids, scores = ranking
+    return ((scale * score, doc_id) for doc_id, score in zip(ids, scores))
+
+class Postings:
+    """Ids of the documents containing a term, sorted, with their weighted frequencies.
+
+    The first query for a term also caches its documents in score order
+    (ranked), so single-word searches read the best matches off the front;
+    any change to the list drops the cache.
+    """
+    __slots__ = ('ids', 'weights', 'ranked')
+
+    def __init__(self):
+        self.ids = array('i')
+        self.weights = array('H')
+        self.ranked = None  # (ids, scores) in descending score order
+
+    def add(self, doc_id, weight):
+        i = bisect_left(self.ids, doc_id)
+        if i < len(self.ids) and self.ids[i] == doc_id:
+            self.weights[i] = weight
+        else:
+            self.ids.insert(i, doc_id)
+            self.weights.insert(i, weight)
+        self.ranked = None
+
+    def remove(self, doc_id):
+        i = bisect_left(self.ids, doc_id)
+        if i < len(self.ids) and self.ids[i] == doc_id:
+            del self.ids[i]
+            del self.weights[i]
+            self.ranked = None
+
+    def ranking(self, documents, average_length):
+        """(ids, scores) arrays by descending BM25 score, then feed order"""
+        if self.ranked is None:
+            scored = sorted(
+                ((bm25(weight, documents[doc_id].length, average_length), documents[doc_id])
+                 for doc_id, weight in zip(self.ids, self.weights)),
+                key=lambda item: (item[0], -item[1].priority, item[1].created_at),
+                reverse=True
+            )
+            self.ranked = (array('i', [document.id for _, document in scored]),
+                           array('f', [score for score, _ in scored]))
+        return self.ranked
+
+class IndexedContent:
+    __slots__ = ('id', 'language', 'condition', 'category', 'priority', 'created_at', 'length', 'data')
+
+    def __init__(self, data, length):
+        self.id = data['id']
+        self.language = data['language']
+        self.condition = data['condition']
+        self.category = data['category']
+        self.priority = data['priority'] or 0
+        self.created_at = data['created_at'] or ''
+        self.length = length
+        self.data = data
+
+    def matches(self, condition, category):
+        return (not condition or self.condition == condition) and (not category or self.category == category)
+
+class LanguageIndex:
+    __slots__ = ('postings', 'keys', 'vocabulary', 'documents', 'total_length')
+
+    def __init__(self):
+        self.postings = {}  # term -> Postings
+        self.keys = {}  # transliteration key -> set of terms
+        self.vocabulary = None  # sorted terms for prefix lookups, rebuilt after new terms appear
+        self.documents = 0
+        self.total_length = 0
+
+    def add(self, document, weights):
+        for term, weight in weights.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = Postings()
+                key = transliteration_key(term)
+                if len(key) >= MIN_KEY_LENGTH:
+                    self.keys.setdefault(key, set()).add(term)
+                self.vocabulary = None
+            postings.add(document.id, min(weight, 0xFFFF))
+        self.documents += 1
+        self.total_length += document.length
+
+    def remove(self, document, weights):
+        for term in weights:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.remove(document.id)
+            if not postings.ids:
+                del self.postings[term]
+                key = transliteration_key(term)
+                if key in self.keys:
+                    self.keys[key].discard(term)
+                    if not self.keys[key]:
+                        del self.keys[key]
+                self.vocabulary = None
+        self.documents -= 1
+        self.total_length -= document.length
+
+    def expansions(self, word):
+        """term -> score multiplier for the terms a query word matches: itself, words it prefixes, same-key words"""
+        matches = {}
+        for term in self.keys.get(transliteration_key(word), ()) if len(word) >= MIN_KEY_LENGTH else ():
+            matches[term] = TRANSLITERATION_MATCH
+        if self.vocabulary is None:
+            self.vocabulary = sorted(self.postings)
+        i = bisect_left(self.vocabulary, word)
+        for term in self.vocabulary[i:i + MAX_PREFIX_EXPANSIONS + 1]:
+            if not term.startswith(word):
+                break
+            matches[term] = max(matches.get(term, 0), PREFIX_MATCH)
+        if word in self.postings:
+            matches[word] = 1.0
+        return matches
+
+class ContentIndex:
+    def __init__(self, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.RLock()
+        self.documents = {}  # id -> IndexedContent
+        self.languages = {}  # language -> LanguageIndex
+        self.ready = False
+        self.building = False
+        self.watermark = None  # refreshes read rows updated at or after this time
+        self.refreshed_at = 0.0
+        self.counts = {'searches': 0, 'refreshes': 0}
+
+    def add(self, content):
+        """Index a HealthContent row, replacing any earlier version; inactive rows are removed"""
+        data = content.to_dict()
+        with self.lock:
+            current = self.documents.get(content.id)
+            # Refreshes re-read recent rows; leave unchanged ones (and their terms' rankings) alone
+            if content.is_active and current is not None and current.data == data:
+                return
+            self.remove(content.id)
+            if not content.is_active:
+                return
+            weights = field_weights(data)
+            document = IndexedContent(data, sum(weights.values()))
+            self.documents[document.id] = document
+            self.languages.setdefault(document.language, LanguageIndex()).add(document, weights)
+
+    def remove(self, content_id):
+        with self.lock:
+            document = self.documents.pop(content_id, None)
+            if document is not None:
+                # Terms are not kept per document; the stored fields give them back
+                self.languages[document.language].remove(document, field_weights(document.data))
+
+    def load(self, since=None):
+        """Index rows updated at or after since (all active rows when None), in id order batches"""
+        started = datetime.utcnow()
+        query = db.select(HealthContent).order_by(HealthContent.id).limit(BUILD_BATCH_SIZE)
+        if since is None:
+            query = query.where(HealthContent.is_active == True)
+        else:
+            query = query.where(HealthContent.updated_at >= since - timedelta(seconds=REFRESH_OVERLAP_SECONDS))
+        last_id = 0
+        loaded = 0
+        while True:
+            rows = db.session.scalars(query.where(HealthContent.id > last_id)).all()
+            for content in rows:
+                self.add(content)
+            db.session.rollback()
+            loaded += len(rows)
+            if len(rows) < BUILD_BATCH_SIZE:
+                break
+            last_id = rows[-1].id
+        with self.lock:
+            self.watermark = started
+            self.refreshed_at = time.monotonic()
+        return loaded
+
+    def build(self):
+        """Load every active row; returns how many were indexed"""
+        with self.lock:
+            self.documents = {}
+            self.languages = {}
+        loaded = self.load()
+        self.ready = True
+        return loaded
+
+    def build_in_background(self, app):
+        """Start building in a daemon thread, once; searches use the database until it is ready"""
+        with self.lock:
+            if self.ready or self.building:
+                return
+            self.building = True
+
+        def run():
+            with app.app_context():
+                try:
+                    started = time.perf_counter()
+                    loaded = self.build()
+                    app.logger.info('Content index built: %d items in %.1fs', loaded, time.perf_counter() - started)
+                except Exception:
+                    app.logger.exception('Content index build failed')
+                finally:
+                    db.session.remove()
+                    self.building = False
+
+        threading.Thread(target=run, name='content-index-build', daemon=True).start()
+
+    def refresh_if_stale(self):
+        """Pick up rows changed by other workers once refresh_seconds have passed"""
+        with self.lock:
+            # Claim the refresh so concurrent requests do not all run it
+            if time.monotonic() - self.refreshed_at < self.refresh_seconds:
+                return 0
+            self.refreshed_at = time.monotonic()
+            self.counts['refreshes'] += 1
+            since = self.watermark
+        return self.load(since)
+
+    def search(self, query_text, language, condition=None, category=None, limit=20):
+        """[(to_dict(), score, snippet)] for active content matching every query word, best first"""
+        words = list(dict.fromkeys(terms(query_text)))
+        with self.lock:
+            self.counts['searches'] += 1
+            index = self.languages.get(language)
+            if not words or index is None or not index.documents:
+                return []
+            average_length = index.total_length / index.documents
+            expansions = [index.expansions(word) for word in words]
+            if not all(expansions):
+                return []
+            matched_terms = {term for matches in expansions for term in matches}
+            if len(words) == 1:
+                best = self.top_for_word(index, expansions[0], average_length, condition, category, limit)
+            else:
+                best = self.top_for_words(index, expansions, average_length, condition, category, limit)
+            return [(document.data, round(score, 4), snippet(document.data['content'], matched_terms))
+                    for score, document in best]
+
+    def ranked(self, index, matches, average_length):
+        """(score, doc_id) for the documents matching a query word, best first; a document may repeat"""
+        streams = []
+        for term, multiplier in matches.items():
+            postings = index.postings[term]
+            scale = multiplier * idf(len(postings.ids), index.documents)
+            streams.append(scaled(postings.ranking(self.documents, average_length), scale))
+        return heapq.merge(*streams, key=itemgetter(0), reverse=True)
+
+    def word_score(self, index, matches, document, average_length):
+        """A document's score for one query word, by binary search of its postings; 0 when it has none of its terms"""
+        best = 0.0
+        for term, multiplier in matches.items():
+            postings = index.postings[term]
+            i = bisect_left(postings.ids, document.id)
+            if i < len(postings.ids) and postings.ids[i] == document.id:
+                score = multiplier * idf(len(postings.ids), index.documents) * bm25(
+                    postings.weights[i], document.length, average_length)
+                best = max(best, score)
+        return best
+
+    def top_for_word(self, index, matches, average_length, condition, category, limit):
+        """Read the best matches off the word's ranked postings, stopping after limit hits"""
+        best = []
+        seen = set()
+        for score, doc_id in self.ranked(index, matches, average_length):
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            document = self.documents[doc_id]
+            if document.matches(condition, category):
+                best.append((score, document))
+                if len(best) == limit:
+                    break
+        return best
+
+    def top_for_words(self, index, expansions, average_length, condition, category, limit):
+        """Documents matching every word, by the threshold algorithm.
+
+        Walks the rarest word's ranked postings best first and looks up the
+        other words' scores, until no document further down could still make
+        the top `limit`: its own score plus every other word's best possible
+        score no longer beats the current last place.
+        """
+        expansions = sorted(expansions, key=lambda matches: sum(len(index.postings[term].ids) for term in matches))
+        driver, others = expansions[0], expansions[1:]
+        ceiling = sum(
+            max(multiplier * idf(len(index.postings[term].ids), index.documents)
+                * index.postings[term].ranking(self.documents, average_length)[1][0]
+                for term, multiplier in matches.items())
+            for matches in others
+        )
+        top = []  # min-heap of (score, -priority, created_at, doc_id)
+        seen = set()
+        for score, doc_id in self.ranked(index, driver, average_length):
+            if len(top) == limit and score + ceiling <= top[0][0]:
+                break
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            document = self.documents[doc_id]
+            if not document.matches(condition, category):
+                continue
+            total = score
+            for matches in others:
+                word_score = self.word_score(index, matches, document, average_length)
+                if not word_score:
+                    break
+                total += word_score
+            else:
+                entry = (total, -document.priority, document.created_at, doc_id)
+                if len(top) < limit:
+                    heapq.heappush(top, entry)
+                elif entry > top[0]:
+                    heapq.heapreplace(top, entry)
+        return [(entry[0], self.documents[entry[3]]) for entry in sorted(top, reverse=True)]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'ready': self.ready,
+                'documents': len(self.documents),
+                'terms': sum(len(index.postings) for index in self.languages.values()),
+                'postings': sum(len(postings.ids) for index in self.languages.values()
+                                for postings in index.postings.values()),
+                'languages': sorted(self.languages),
+                'searches': self.counts['searches'],
+                'refreshes': self.counts['refreshes']
+            }
+
+@lru_cache(maxsize=200000)
+def token_terms(token):
+    """Normalized terms of a whitespace-separated token, e.g. a word and its punctuation"""
+    return frozenset(terms(token))
+
+def snippet(text, matched_terms, words=SNIPPET_WORDS):
+    """About `words` words of text around its first matched term, with matches highlighted"""
+    tokens = text.split()
+    first = next((i for i, token in enumerate(tokens) if not token_terms(token).isdisjoint(matched_terms)), None)
+    if first is None:
+        return ' '.join(tokens[:words]) + (' …' if len(tokens) > words else '')
+    start = max(0, min(first - words // 4, len(tokens) - words))
+    window = [f'{HIGHLIGHT[0]}{token}{HIGHLIGHT[1]}' if not token_terms(token).isdisjoint(matched_terms) else token
+              for token in tokens[start:start + words]]
+    return ('… ' if start else '') + ' '.join(window) + (' …' if start + words < len(tokens) else '')
+
+def index_content(app, contents):
+    """Apply committed creates and updates to app's index, if it is enabled"""
+    index = app.extensions.get('content_index')
+    if index is not None:
+        for content in contents:
+            index.add(content)
+
+def search(query_text, language, condition=None, category=None, limit=20):
+    """Results from the current app's index; None while it is disabled or still building,
+    and for queries without words, which are left to the database's LIKE search"""
+    index = current_app.extensions.get('content_index')
+    if index is None or not index.ready or not terms(query_text):
+        return None
+    index.refresh_if_stale()
+    return index.search(query_text, language, condition, category, limit)
+
+def settings(config):
+    return {
+        'refresh_seconds': config.get('CONTENT_INDEX_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    }
+
+def init_app(app):
+    """Attach an index to app, built on the first request when CONTENT_INDEX_ENABLED (default) is set"""
+    if not app.config.get('CONTENT_INDEX_ENABLED', True):
+        return None
+    index = ContentIndex(**settings(app.config))
+    app.extensions['content_index'] = index
+
+    @app.before_request
+    def build_content_index():
+        if not index.ready:
+            index.build_in_background(app)
+
+    return index
@@ -0,0 +1,145 @@
+"""Ranked full-text search over health content.
+
+SQLite keeps an external-content FTS5 table, health_content_fts, over the
+title, content and tags of health_content. Triggers on health_content keep
+it in step with every INSERT, UPDATE and DELETE, so create_health_content
+and update_health_content need no extra work. Results are ranked by BM25,
+with titles weighted above tags and body text.
+
+Postgres needs no extra table: a GIN expression index over a weighted
+'simple' tsvector (title A, tags B, content C) answers the same prefix
+queries, and results are ranked with ts_rank_cd. Both backends return a highlighted
+snippet of the body.
+
+The unicode61 tokenizer treats combining marks as separators, which would
+split Devanagari and other Indic words at every matra, nukta and virama.
+They are declared token characters instead, and diacritics are left alone
+so marks are never stripped.
+"""
+from database import db, dialect_name
+from models.health_content import HealthContent
+import re
+import unicodedata
+
+FTS_TABLE = 'health_content_fts'
+# Combining marks of the Indic scripts (Devanagari through Sinhala)
+INDIC_MARKS = ''.join(chr(c) for c in range(0x0900, 0x0E00) if unicodedata.category(chr(c)) in ('Mn', 'Mc'))
+TOKENIZE = f"unicode61 remove_diacritics 0 tokenchars '{INDIC_MARKS}'"
+COLUMN_WEIGHTS = (10.0, 1.0, 5.0)  # title, content, tags
+SNIPPET_WORDS = 16
+HIGHLIGHT = ('<mark>', '</mark>')
+TERM_PATTERN = re.compile(f'[\\w{INDIC_MARKS}]+')
+
+# Must match ix_health_content_search for Postgres to use the index
+SEARCH_VECTOR = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce(tags, '')), 'B') || "
+                 "setweight(to_tsvector('simple', coalesce(content, '')), 'C')")
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"title, content, tags, content='health_content', content_rowid='id', tokenize=\"{TOKENIZE}\")",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON health_content BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, content, tags) VALUES (new.id, new.title, new.content, new.tags); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON health_content BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, tags) "
+    f"VALUES ('delete', old.id, old.title, old.content, old.tags); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content, tags ON health_content BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content, tags) "
+    f"VALUES ('delete', old.id, old.title, old.content, old.tags); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, content, tags) VALUES (new.id, new.title, new.content, new.tags); END",
+]
+
+# db.create_all()/drop_all() (benchmarks, fresh installs) manage the index with the table
+for statement in SQLITE_DDL:
+    db.event.listen(HealthContent.__table__, 'after_create', db.DDL(statement).execute_if(dialect='sqlite'))
+db.event.listen(HealthContent.__table__, 'before_drop',
+                db.DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+def terms(query_text):
+    """Lowercased word tokens of a search query"""
+    return [term.lower() for term in TERM_PATTERN.findall(query_text)]
+
+def apply_filters(query, language, condition=None, category=None):
+    query = query.where(HealthContent.language == language, HealthContent.is_active == True)
+    if condition:
+        query = query.where(HealthContent.condition == condition)
+    if category:
+        query = query.where(HealthContent.category == category)
+    return query
+
+def like_search(query_text, language, condition=None, category=None, limit=20):
+    """Unranked substring search over title and content, the original behaviour"""
+    query = apply_filters(db.select(HealthContent), language, condition, category).where(
+        db.or_(
+            HealthContent.title.contains(query_text),
+            HealthContent.content.contains(query_text)
+        )
+    )
+    results = db.session.scalars(
+        query.order_by(HealthContent.priority.asc(), HealthContent.created_at.desc()).limit(limit)
+    ).all()
+    return [(content.to_dict(), None, None) for content in results]
+
+def sqlite_search(words, language, condition=None, category=None, limit=20):
+    fts = db.table(FTS_TABLE, db.column('rowid'), db.column(FTS_TABLE))
+    # Every word must match, each as a prefix: "madhu"* also finds madhumeh
+    match = ' '.join(f'"{word}"*' for word in words)
+    rank = db.func.bm25(db.literal_column(FTS_TABLE), *COLUMN_WEIGHTS)
+    snippet = db.func.snippet(db.literal_column(FTS_TABLE), 1, *HIGHLIGHT, '…', SNIPPET_WORDS)
+
+    query = apply_filters(
+        db.select(HealthContent, rank, snippet)
+        .join(fts, fts.c.rowid == HealthContent.id)
+        .where(fts.c[FTS_TABLE].op('MATCH')(match)),
+        language, condition, category
+    )
+    rows = db.session.execute(
+        query.order_by(rank, HealthContent.priority.asc(), HealthContent.created_at.desc()).limit(limit)
+    ).all()
+    # bm25() is lower-is-better; report a higher-is-better score
+    return [(content.to_dict(), round(-rank, 4), snippet) for content, rank, snippet in rows]
+
+def postgres_search(words, language, condition=None, category=None, limit=20):
+    tsquery = db.func.to_tsquery(db.literal_column("'simple'"), ' & '.join(f'{word}:*' for word in words))
+    vector = db.literal_column(f'({SEARCH_VECTOR})')
+    rank = db.func.ts_rank_cd(vector, tsquery)
+    snippet = db.func.ts_headline(
+        db.literal_column("'simple'"), HealthContent.content, tsquery,
+        f'StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}, MaxWords={SNIPPET_WORDS}, MinWords=8'
+    )
+
+    query = apply_filters(
+        db.select(HealthContent, rank, snippet).where(vector.op('@@')(tsquery)),
+        language, condition, category
+    )
+    rows = db.session.execute(
+        query.order_by(rank.desc(), HealthContent.priority.asc(), HealthContent.created_at.desc()).limit(limit)
+    ).all()
+    return [(content.to_dict(), round(rank, 4), snippet) for content, rank, snippet in rows]
+
+def search(query_text, language, condition=None, category=None, limit=20):
+    """Search active content in a language; returns (ranking, [(to_dict(), score, snippet)]).
+
+    ranking is 'bm25' or 'ts_rank'. Queries without any word characters, and
+    databases other than SQLite and Postgres, fall back to the LIKE search
+    ('like'), whose score and snippet are None.
+    """
+    words = terms(query_text)
+    dialect = dialect_name()
+    if words and dialect == 'sqlite':
+        return 'bm25', sqlite_search(words, language, condition, category, limit)
+    if words and dialect == 'postgresql':
+        return 'ts_rank', postgres_search(words, language, condition, category, limit)
+    return 'like', like_search(query_text, language, condition, category, limit)
+
+def rebuild():
+    """Rebuild the full-text index from health_content, e.g. after a table rebuild dropped its triggers"""
+    dialect = dialect_name()
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            db.session.execute(db.text(statement))
+        db.session.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    elif dialect == 'postgresql':
+        db.session.execute(db.text('REINDEX INDEX ix_health_content_search'))
+    db.session.commit()
+    return db.session.scalar(db.select(db.func.count()).select_from(HealthContent))
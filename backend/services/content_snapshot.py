@@ -0,0 +1,455 @@
+"""Shared, memory-mapped snapshot of active health content for feed and by-id reads.
+
+A builder writes every active HealthContent row to one binary file in the
+instance folder. Workers mmap it read-only, so however many gunicorn
+workers run, the content is held once, in the page cache. The file is
+laid out for reading in place:
+
+    header    magic, format version, metadata length
+    metadata  JSON: generation, counts, category and content_type names,
+              byte order, and the offset and length of every section
+    sections  columns in feed order (priority, then newest first): id,
+              created_at, updated_at, priority, category and content_type
+              codes, and the offset and length of each item's JSON; ids
+              sorted with the feed position of each; and per (language,
+              condition) segment, the ascending feed positions of its items
+              (the metadata has each segment's count and newest updated_at,
+              its validators for conditional requests)
+    json      every item's to_dict() as compact JSON
+
+Columns are read through memoryview casts, without copying. A feed is a
+merge of its segments' position lists (conditions plus 'general'),
+filtered on the category and content_type codes; the response is spliced
+from the stored JSON bytes, so nothing is decoded.
+
+Builds are written to a temporary file and moved into place with
+os.replace(), so a reader only ever maps a complete file; a file lock
+serializes builders across processes. Creating or updating content starts
+a rebuild in the background. Every CONTENT_SNAPSHOT_CHECK_SECONDS a worker
+stats the file and maps the new generation when it has been replaced;
+requests still holding the previous mapping finish with it. Content
+changed outside the API is picked up by `flask health_feed build-snapshot`.
+Until a snapshot exists, reads fall back to the database.
+"""
+from array import array
+from bisect import bisect_left
+from database import db
+from datetime import datetime, timedelta
+from flask import current_app
+from models.health_content import HealthContent
+from services import conditional
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+MAGIC = b'AHCS'
+VERSION = 2
+HEADER = struct.Struct('<4sHI')  # magic, version, metadata length
+ALIGNMENT = 8
+DEFAULT_FILENAME = 'health_content.snapshot'
+DEFAULT_CHECK_SECONDS = 1
+BUILD_BATCH_SIZE = 5000
+# (section, array typecode) in file order
+COLUMNS = [
+    ('ids', 'i'),
+    ('created_at', 'q'),
+    ('updated_at', 'q'),
+    ('priority', 'h'),
+    ('category', 'B'),
+    ('content_type', 'B'),
+    ('json_offsets', 'Q'),
+    ('json_lengths', 'I'),
+    ('sorted_ids', 'i'),
+    ('id_positions', 'i'),
+    ('segments', 'i'),
+]
+EPOCH = datetime(1970, 1, 1)
+
+def feed_order(row):
+    """Sort key matching the feed query: priority, then newest first (undated last), then newest id"""
+    priority, created_at, content_id = row[0], row[1], row[2]
+    return (priority, -created_at if created_at >= 0 else 1, -content_id)
+
+def microseconds(value):
+    """A naive UTC datetime as microseconds since the epoch, -1 for None"""
+    return (value - EPOCH) // timedelta(microseconds=1) if value is not None else -1
+
+def from_microseconds(value):
+    return EPOCH + timedelta(microseconds=value) if value >= 0 else None
+
+def _padding(length):
+    return -length % ALIGNMENT
+
+def read_generation(path):
+    """Generation of the snapshot at path, 0 when there is none or it cannot be read"""
+    try:
+        with open(path, 'rb') as f:
+            magic, version, length = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return 0
+            return json.loads(f.read(length))['generation']
+    except (OSError, ValueError, KeyError, struct.error):
+        return 0
+
+def write_snapshot(path, json_dumps):
+    """Write a snapshot of the active rows to path atomically; returns its metadata.
+
+    json_dumps serializes one to_dict(); rows are read in id order batches
+    and their JSON spooled to a temporary file, so only the small per-row
+    columns are held in memory.
+    """
+    # (priority, created_at, id, language, condition, category, content_type, json_offset, json_length, updated_at)
+    rows = []
+    categories, content_types = {}, {}
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as spool:
+        offset = 0
+        last_id = 0
+        query = (db.select(HealthContent).where(HealthContent.is_active == True)
+                 .order_by(HealthContent.id).limit(BUILD_BATCH_SIZE))
+        while True:
+            batch = db.session.scalars(query.where(HealthContent.id > last_id)).all()
+            for content in batch:
+                data = json_dumps(content.to_dict()).encode()
+                spool.write(data)
+                rows.append((
+                    content.priority if content.priority is not None else 0,
+                    microseconds(content.created_at),
+                    content.id,
+                    content.language,
+                    content.condition,
+                    categories.setdefault(content.category, len(categories)),
+                    content_types.setdefault(content.content_type, len(content_types)),
+                    offset,
+                    len(data),
+                    microseconds(content.updated_at)
+                ))
+                offset += len(data)
+            db.session.rollback()
+            if len(batch) < BUILD_BATCH_SIZE:
+                break
+            last_id = batch[-1].id
+        if len(categories) > 255 or len(content_types) > 255:
+            raise ValueError('Too many distinct categories or content types for a snapshot')
+
+        rows.sort(key=feed_order)
+        columns = {name: array(typecode) for name, typecode in COLUMNS}
+        segments = {}
+        for position, row in enumerate(rows):
+            columns['ids'].append(row[2])
+            columns['created_at'].append(row[1])
+            columns['updated_at'].append(row[9])
+            columns['priority'].append(row[0])
+            columns['category'].append(row[5])
+            columns['content_type'].append(row[6])
+            columns['json_offsets'].append(row[7])
+            columns['json_lengths'].append(row[8])
+            segments.setdefault((row[3], row[4]), array('i')).append(position)
+        by_id = sorted(range(len(rows)), key=lambda position: rows[position][2])
+        columns['sorted_ids'].extend(rows[position][2] for position in by_id)
+        columns['id_positions'].extend(by_id)
+        segment_table = []
+        for (language, condition), positions in sorted(segments.items()):
+            newest = max(rows[position][9] for position in positions)
+            segment_table.append([language, condition, len(columns['segments']), len(positions), newest])
+            columns['segments'].extend(positions)
+
+        sections = {}
+        start = 0
+        for name, _ in COLUMNS:
+            length = len(columns[name]) * columns[name].itemsize
+            sections[name] = [start, length]
+            start += length + _padding(length)
+        sections['json'] = [start, offset]
+        metadata = {
+            'generation': read_generation(path) + 1,
+            'built_at': time.time(),
+            'items': len(rows),
+            'byteorder': sys.byteorder,
+            'categories': sorted(categories, key=categories.get),
+            'content_types': sorted(content_types, key=content_types.get),
+            'segments': segment_table,
+            'sections': sections
+        }
+
+        encoded = json.dumps(metadata, ensure_ascii=False).encode()
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(encoded)))
+                f.write(encoded)
+                f.write(b'\0' * _padding(HEADER.size + len(encoded)))
+                for name, _ in COLUMNS:
+                    data = columns[name].tobytes()
+                    f.write(data)
+                    f.write(b'\0' * _padding(len(data)))
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+    return metadata
+
+class Snapshot:
+    """One generation of the snapshot file, mapped read-only"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} health content snapshot')
+        self.metadata = json.loads(self.map[HEADER.size:HEADER.size + length])
+        if self.metadata['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was written with {self.metadata["byteorder"]} byte order')
+        view = memoryview(self.map)
+        data_start = HEADER.size + length + _padding(HEADER.size + length)
+        sections = {name: view[data_start + start:data_start + start + length]
+                    for name, (start, length) in self.metadata['sections'].items()}
+        for name, typecode in COLUMNS:
+            setattr(self, name, sections[name].cast(typecode))
+        self.json = sections['json']
+        self.generation = self.metadata['generation']
+        self.categories = {name: code for code, name in enumerate(self.metadata['categories'])}
+        self.content_types = {name: code for code, name in enumerate(self.metadata['content_types'])}
+        self.segment_positions = {(language, condition): self.segments[start:start + count]
+                                  for language, condition, start, count, _ in self.metadata['segments']}
+        self.segment_versions = {(language, condition): (count, newest)
+                                 for language, condition, _, count, newest in self.metadata['segments']}
+
+    def item(self, position):
+        """The stored JSON of the item at a feed position, as a view into the mapping"""
+        start = self.json_offsets[position]
+        return self.json[start:start + self.json_lengths[position]]
+
+    def position(self, content_id):
+        """Feed position of an active item by id, None when it is not in this snapshot"""
+        i = bisect_left(self.sorted_ids, content_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == content_id:
+            return self.id_positions[i]
+        return None
+
+    def content(self, content_id):
+        """Stored JSON of an active item by id, None when it is not in this snapshot"""
+        position = self.position(content_id)
+        return self.item(position) if position is not None else None
+
+    def feed_segments(self, conditions):
+        return set(conditions) | {'general'} if conditions else {'general'}
+
+    def feed_version(self, language, conditions):
+        """(count, newest updated_at) of each segment a feed reads, and the newest updated_at of all"""
+        versions = tuple(self.segment_versions.get((language, condition), (0, -1))
+                         for condition in sorted(self.feed_segments(conditions)))
+        return versions, from_microseconds(max(newest for _, newest in versions))
+
+    def feed(self, language, conditions, category=None, content_type=None, limit=10):
+        """Stored JSON of a segment's feed, the same items personalized_feed_query() returns"""
+        category_code = self.categories.get(category)
+        content_type_code = self.content_types.get(content_type)
+        if (category and category_code is None) or (content_type and content_type_code is None):
+            return []
+        lists = [self.segment_positions[(language, condition)] for condition in self.feed_segments(conditions)
+                 if (language, condition) in self.segment_positions]
+        items = []
+        if limit <= 0:
+            return items
+        for position in heapq.merge(*lists):
+            if category and self.category[position] != category_code:
+                continue
+            if content_type and self.content_type[position] != content_type_code:
+                continue
+            items.append(self.item(position))
+            if len(items) == limit:
+                break
+        return items
+
+    def stats(self):
+        return {
+            'generation': self.generation,
+            'built_at': self.metadata['built_at'],
+            'items': self.metadata['items'],
+            'segments': len(self.segment_positions),
+            'bytes': self.size
+        }
+
+class ContentSnapshots:
+    """A worker's view of the snapshot file: maps the current generation and rebuilds it on demand"""
+
+    def __init__(self, path, check_seconds=DEFAULT_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.file_id = None
+        self.checked_at = None
+        self.building = False
+        self.pending = False
+        self.counts = {'feeds': 0, 'items': 0, 'swaps': 0, 'builds': 0, 'errors': 0}
+
+    def current(self):
+        """The newest mapped snapshot, None until one has been built"""
+        now = time.monotonic()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < self.check_seconds:
+                return self.snapshot
+            self.checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return self.snapshot
+            file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if file_id != self.file_id:
+                self.file_id = file_id
+                try:
+                    # Earlier generations stay mapped while requests still hold them
+                    self.snapshot = Snapshot(self.path)
+                    self.counts['swaps'] += 1
+                except (OSError, ValueError, struct.error):
+                    # Keep serving the previous generation (or the database) until the next build
+                    self.counts['errors'] += 1
+            return self.snapshot
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def build(self, json_dumps):
+        """Write a new generation, waiting for any other process's build to finish first"""
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            metadata = write_snapshot(self.path, json_dumps)
+        with self.lock:
+            self.checked_at = None
+            self.counts['builds'] += 1
+        return metadata
+
+    def build_in_background(self, app):
+        """Rebuild in a daemon thread; requests made while it runs are coalesced into one more build"""
+        with self.lock:
+            self.pending = True
+            if self.building:
+                return
+            self.building = True
+
+        def run():
+            while True:
+                with self.lock:
+                    if not self.pending:
+                        self.building = False
+                        return
+                    self.pending = False
+                with app.app_context():
+                    try:
+                        started = time.perf_counter()
+                        metadata = self.build(compact_dumps(app))
+                        app.logger.info('Content snapshot generation %d written: %d items in %.1fs',
+                                        metadata['generation'], metadata['items'], time.perf_counter() - started)
+                    except Exception:
+                        app.logger.exception('Content snapshot build failed')
+                    finally:
+                        db.session.remove()
+
+        threading.Thread(target=run, name='content-snapshot-build', daemon=True).start()
+
+    def stats(self):
+        snapshot = self.current()
+        with self.lock:
+            return dict(self.counts, path=self.path, building=self.building,
+                        snapshot=snapshot.stats() if snapshot is not None else None)
+
+def compact_dumps(app):
+    """Serialize like the app's JSON responses, without whitespace"""
+    return lambda data: app.json.dumps(data, separators=(',', ':'))
+
+def json_response(app, key, fragment, **fields):
+    """A JSON object response whose first key holds a pre-serialized fragment.
+
+    key must sort before the other fields, as the app's JSON provider sorts keys.
+    """
+    body = b'{"' + key.encode() + b'":' + bytes(fragment)
+    if fields:
+        body += b',' + compact_dumps(app)(fields)[1:].encode()
+    else:
+        body += b'}'
+    return app.response_class(body + b'\n', mimetype=app.json.mimetype)
+
+def feed_response(app, language, conditions, category=None, content_type=None, limit=10):
+    """The personalized feed response from the current snapshot; None until one has been built"""
+    snapshots = app.extensions.get('content_snapshot')
+    snapshot = snapshots.current() if snapshots is not None else None
+    if snapshot is None:
+        return None
+    snapshots.count('feeds')
+    versions, last_modified = snapshot.feed_version(language, conditions)
+
+    def render():
+        items = snapshot.feed(language, conditions, category, content_type, limit)
+        return json_response(app, 'content', b'[' + b','.join(items) + b']',
+                             count=len(items), language=language, user_conditions=conditions)
+
+    return conditional.respond(
+        conditional.validator(language, sorted(conditions), versions, last_modified=last_modified), render)
+
+def content_response(app, content_id):
+    """An active item's response from the current snapshot; None when there is none or it is not in it"""
+    snapshots = app.extensions.get('content_snapshot')
+    snapshot = snapshots.current() if snapshots is not None else None
+    position = snapshot.position(content_id) if snapshot is not None else None
+    if position is None:
+        return None
+    snapshots.count('items')
+    return conditional.respond(
+        conditional.row_validator(content_id, from_microseconds(snapshot.updated_at[position])),
+        lambda: json_response(app, 'content', snapshot.item(position)))
+
+def build(app):
+    """Write a new generation now; works whether or not snapshots are enabled in app"""
+    snapshots = app.extensions.get('content_snapshot') or ContentSnapshots(**settings(app.config, app.instance_path))
+    return snapshots.build(compact_dumps(app))
+
+def rebuild():
+    """Write a new generation in the background after content changed, if snapshots are enabled"""
+    snapshots = current_app.extensions.get('content_snapshot')
+    if snapshots is not None:
+        # The build outlives the request, so its thread gets the app itself rather than the proxy
+        snapshots.build_in_background(current_app._get_current_object())
+
+def stats(app):
+    snapshots = app.extensions.get('content_snapshot')
+    return snapshots.stats() if snapshots is not None else None
+
+def settings(config, instance_path):
+    return {
+        # Per database: apps on different databases must not share a snapshot file
+        'path': config.get('CONTENT_SNAPSHOT_PATH') or os.path.join(instance_path, DEFAULT_FILENAME),
+        'check_seconds': config.get('CONTENT_SNAPSHOT_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    }
+
+def init_app(app):
+    """Attach the snapshot reader when CONTENT_SNAPSHOT_ENABLED is set; requests build a missing file"""
+    if not app.config.get('CONTENT_SNAPSHOT_ENABLED', False):
+        return None
+    snapshots = ContentSnapshots(**settings(app.config, app.instance_path))
+    app.extensions['content_snapshot'] = snapshots
+
+    @app.before_request
+    def build_content_snapshot():
+        # Also replaces a file this version cannot read
+        if snapshots.current() is None and not snapshots.building:
+            snapshots.build_in_background(app)
+
+    return snapshots
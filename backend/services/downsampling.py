@@ -0,0 +1,61 @@
+"""Downsampling of (timestamp, value) series for charts.
+
+Both functions take NumPy arrays sorted by x and return index arrays into
+them, so callers can pick any parallel columns with the result.
+"""
+import numpy as np
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: keep the points that preserve the visual shape.
+
+    Always keeps the first and last point. Returns at most threshold indices.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.intp)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+def minmax(x, y, threshold):
+    """Keep the minimum and maximum of each of threshold // 2 equal-count buckets.
+
+    Vectorized with one lexsort instead of a per-bucket loop. Returns the
+    selected indices in x order.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    buckets = max(threshold // 2, 1)
+
+    bucket_ids = (np.arange(n) * buckets) // n
+    # Within each bucket, order by value: first entry is the min, last the max
+    order = np.lexsort((y, bucket_ids))
+    sorted_ids = bucket_ids[order]
+    firsts = np.searchsorted(sorted_ids, np.arange(buckets), side='left')
+    lasts = np.searchsorted(sorted_ids, np.arange(buckets), side='right') - 1
+
+    return np.unique(np.concatenate([order[firsts], order[lasts]]))
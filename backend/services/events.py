@@ -0,0 +1,324 @@
+"""Server-Sent Events: persisted events fanned out to the streams of every worker.
+
+The reminder dispatcher and the vitals endpoints record small JSON events
+keyed by user id with record(), in the same transaction as the change they
+report, so an event exists exactly when that change committed, whichever
+process or node made it. Each web process runs one EventFeed thread, started
+with its first stream, that polls stream_events for ids past its watermark
+and hands new rows to the process's EventHub, which queues them for that
+user's open streams. Event ids are the table's ids: a client reconnecting to
+any worker, or after a restart, resumes from its Last-Event-ID by reading
+the rows after it. Rows are pruned after EVENT_STREAM_RETENTION_SECONDS.
+
+Ids are allocated before commit, so a slow transaction can commit an id
+below one already delivered. The feed keeps looking for a missing id for
+gap_seconds before moving its watermark past it; an id whose transaction
+rolled back is skipped then.
+
+Each open /api/events/stream/<user_id> connection holds a Subscription, a
+bounded deque plus a threading.Event, and nothing else, and a waiting stream
+only blocks on its Event. Under gevent workers (gunicorn.conf.py), which
+patch threading, thousands of idle streams cost a greenlet and about 2 KB of
+hub state each instead of a thread, and the feed is one more greenlet.
+"""
+from collections import deque
+from database import db
+from datetime import datetime, timedelta
+from models.stream_event import StreamEvent
+import json
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_MAX_CONNECTIONS = 10000
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_GAP_SECONDS = 10
+DEFAULT_RETENTION_SECONDS = 86400
+DEFAULT_BATCH_SIZE = 500
+PRUNE_INTERVAL_SECONDS = 60
+RETRY_MILLISECONDS = 5000
+
+class Subscription:
+    """One open stream: events queued for it and a flag its stream waits on"""
+    __slots__ = ('user_id', 'queue', 'ready', 'dropped', 'replayed')
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        # A stalled client loses its oldest events rather than growing without bound
+        self.queue = deque(maxlen=queue_size)
+        self.ready = threading.Event()
+        self.dropped = 0
+        self.replayed = None  # ids sent from the backlog, which the feed may deliver again
+
+    def push(self, event):
+        if self.replayed and event[0] in self.replayed:
+            return
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(event)
+        self.ready.set()
+
+    def prime(self, backlog):
+        """Queue backlog events ahead of any delivered since subscribing"""
+        queued = {event[0] for event in self.queue}
+        backlog = [event for event in backlog if event[0] not in queued]
+        if not backlog:
+            return
+        self.replayed = {event[0] for event in backlog}
+        events = backlog + list(self.queue)
+        self.dropped += max(0, len(events) - self.queue.maxlen)
+        self.queue.clear()
+        self.queue.extend(events)
+        self.ready.set()
+
+    def drain(self):
+        self.ready.clear()
+        events = []
+        while self.queue:
+            events.append(self.queue.popleft())
+        return events
+
+class EventHub:
+    """This process's open streams, by user id"""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+        self.subscribers = {}  # user_id -> set of Subscription
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id):
+        """Open a subscription; None when full"""
+        subscription = Subscription(user_id, self.queue_size)
+        with self.lock:
+            if self.connections >= self.max_connections:
+                return None
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+            self.connections += 1
+        return subscription
+
+    def prime(self, subscription, backlog):
+        with self.lock:
+            subscription.prime(backlog)
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self.connections -= 1
+                if not subscribers:
+                    del self.subscribers[subscription.user_id]
+
+    def publish_many(self, events):
+        """Queue (event_id, user_id, event_type, data) events under one lock acquisition; returns deliveries"""
+        delivered = 0
+        with self.lock:
+            for event in events:
+                self.published += 1
+                for subscription in self.subscribers.get(event[1], ()):
+                    subscription.push(event)
+                    delivered += 1
+            self.delivered += delivered
+        return delivered
+
+    def stats(self):
+        with self.lock:
+            return {
+                'connections': self.connections,
+                'users': len(self.subscribers),
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped': sum(s.dropped for subscribers in self.subscribers.values() for s in subscribers)
+            }
+
+class EventFeed:
+    """Thread handing events committed by any process to this process's hub"""
+
+    def __init__(self, app, hub, poll_interval=DEFAULT_POLL_INTERVAL, gap_seconds=DEFAULT_GAP_SECONDS,
+                 retention_seconds=DEFAULT_RETENTION_SECONDS, batch_size=DEFAULT_BATCH_SIZE):
+        self.app = app
+        self.hub = hub
+        self.poll_interval = poll_interval
+        self.gap_seconds = gap_seconds
+        self.retention = timedelta(seconds=retention_seconds)
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        # Every id up to the watermark was delivered or given up on
+        self.watermark = None
+        self.highest = None
+        self.seen = set()  # delivered ids above the watermark
+        self.gaps = {}  # missing id above the watermark -> time.monotonic() it was first missed
+        self.pruned_at = None
+        self.counts = {'polls': 0, 'events': 0, 'late': 0, 'skipped': 0, 'pruned': 0, 'errors': 0}
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start polling from the newest committed event, once; call within an app context"""
+        with self.lock:
+            if self.running:
+                return
+            if self.watermark is None:
+                self.skip_history()
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='event-feed', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stopping.is_set():
+            polled = 0
+            try:
+                with self.app.app_context():
+                    polled = self.poll()
+                    if self.pruned_at is None or time.monotonic() - self.pruned_at >= PRUNE_INTERVAL_SECONDS:
+                        self.prune()
+            except Exception:
+                self.counts['errors'] += 1
+                self.app.logger.exception('Event feed poll failed')
+            if polled < self.batch_size:
+                self.stopping.wait(self.poll_interval)
+
+    def skip_history(self):
+        """Move the watermark to the newest committed event; older ones are only replayed by id"""
+        self.watermark = self.highest = db.session.scalar(db.select(db.func.max(StreamEvent.id))) or 0
+        self.seen.clear()
+        self.gaps.clear()
+
+    def poll(self):
+        """Publish events committed past the watermark; returns how many"""
+        if self.watermark is None:
+            self.skip_history()
+        self.counts['polls'] += 1
+        rows = db.session.execute(
+            db.select(StreamEvent.id, StreamEvent.user_id, StreamEvent.event_type, StreamEvent.data)
+            .where(StreamEvent.id > self.watermark)
+            .order_by(StreamEvent.id)
+            .limit(self.batch_size + len(self.seen))
+        ).all()
+        fresh = [tuple(row) for row in rows if row[0] not in self.seen]
+        noticed = time.monotonic()
+        for event_id, _, _, _ in fresh:
+            if event_id in self.gaps:
+                # Committed after a higher id was already delivered
+                del self.gaps[event_id]
+                self.counts['late'] += 1
+            elif event_id > self.highest:
+                for missing in range(self.highest + 1, event_id):
+                    self.gaps[missing] = noticed
+                self.highest = event_id
+            self.seen.add(event_id)
+        if fresh:
+            self.hub.publish_many(fresh)
+            self.counts['events'] += len(fresh)
+
+        while self.watermark < self.highest:
+            next_id = self.watermark + 1
+            if next_id in self.seen:
+                self.seen.discard(next_id)
+            elif noticed - self.gaps[next_id] >= self.gap_seconds:
+                del self.gaps[next_id]
+                self.counts['skipped'] += 1
+            else:
+                break
+            self.watermark = next_id
+        return len(fresh)
+
+    def prune(self, now=None):
+        """Delete events older than the retention window; returns how many"""
+        cutoff = (now or datetime.utcnow()) - self.retention
+        pruned = db.session.execute(db.delete(StreamEvent).where(StreamEvent.created_at < cutoff)).rowcount
+        db.session.commit()
+        self.pruned_at = time.monotonic()
+        self.counts['pruned'] += pruned
+        return pruned
+
+    def stats(self):
+        return dict(self.counts, running=self.running, watermark=self.watermark, gaps=len(self.gaps))
+
+def format_event(event):
+    event_id, _, event_type, data = event
+    return f'id: {event_id}\nevent: {event_type}\ndata: {data}\n\n'
+
+def stream(hub, subscription, heartbeat=DEFAULT_HEARTBEAT_SECONDS):
+    """SSE body for a subscription; unsubscribes when the client goes away.
+
+    Comment lines are sent while idle so proxies keep the connection open
+    and a dead client is noticed on the next write.
+    """
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            if not subscription.ready.wait(heartbeat):
+                yield ': keep-alive\n\n'
+                continue
+            events = subscription.drain()
+            if events:
+                yield ''.join(format_event(event) for event in events)
+    finally:
+        hub.unsubscribe(subscription)
+
+def record(items):
+    """Add (user_id, event_type, data) events to the caller's transaction; its commit publishes them"""
+    if not items:
+        return
+    now = datetime.utcnow()
+    db.session.execute(db.insert(StreamEvent), [
+        {'user_id': user_id, 'event_type': event_type, 'data': json.dumps(data, default=str), 'created_at': now}
+        for user_id, event_type, data in items
+    ])
+
+def backlog(user_id, last_event_id, limit):
+    """A user's newest events after last_event_id, at most limit, oldest first"""
+    rows = db.session.execute(
+        db.select(StreamEvent.id, StreamEvent.user_id, StreamEvent.event_type, StreamEvent.data)
+        .where(StreamEvent.user_id == user_id, StreamEvent.id > last_event_id)
+        .order_by(StreamEvent.id.desc())
+        .limit(limit)
+    ).all()
+    return [tuple(row) for row in reversed(rows)]
+
+def subscribe(app, user_id, last_event_id=None):
+    """Open a stream subscription, primed with the events after last_event_id; None when the hub is full"""
+    hub = app.extensions['event_hub']
+    app.extensions['event_feed'].start()
+    subscription = hub.subscribe(user_id)
+    # Read after subscribing: an event committed in between is delivered by the feed, and at most once
+    if subscription is not None and last_event_id is not None:
+        hub.prime(subscription, backlog(user_id, last_event_id, hub.queue_size))
+    return subscription
+
+def settings(config):
+    return {
+        'queue_size': config.get('EVENT_STREAM_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+        'max_connections': config.get('EVENT_STREAM_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+    }
+
+def feed_settings(config):
+    return {
+        'poll_interval': config.get('EVENT_STREAM_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+        'gap_seconds': config.get('EVENT_STREAM_GAP_SECONDS', DEFAULT_GAP_SECONDS),
+        'retention_seconds': config.get('EVENT_STREAM_RETENTION_SECONDS', DEFAULT_RETENTION_SECONDS),
+        'batch_size': config.get('EVENT_STREAM_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    }
+
+def init_app(app):
+    """Register the hub and its feed; the feed starts with the first stream opened in this process"""
+    hub = EventHub(**settings(app.config))
+    app.extensions['event_hub'] = hub
+    app.extensions['event_feed'] = EventFeed(app, hub, **feed_settings(app.config))
+    return hub
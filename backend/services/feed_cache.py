@@ -0,0 +1,170 @@
+"""Segment-keyed cache for the personalized health feed.
+
+A feed depends only on the user's segment, their preferred_language and
+conditions, plus the category, content_type and limit asked for. Thousands
+of patients share a segment, so feeds are cached per segment and each
+user's segment is cached as well: a warm feed request reads neither users
+nor health_content.
+
+Both caches evict their least recently used entries beyond their size and
+expire entries after FEED_CACHE_TTL_SECONDS. Creating or updating content
+drops the cached feeds of the language and condition it touches, and a
+profile update drops the user's segment. The caches are per process: other
+workers pick a change up when their entries expire, so the TTL bounds how
+stale a feed can be. FEED_CACHE_SIZE=0 turns caching off.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+DEFAULT_SIZE = 1024
+DEFAULT_USERS = 100000
+DEFAULT_TTL_SECONDS = 300
+
+class LRUCache:
+    """Mapping that evicts its least recently used entries and expires entries after ttl seconds.
+
+    Not thread-safe on its own; FeedCache serializes access.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        return self.entries.pop(key, (None, None))[1]
+
+    def discard_where(self, predicate):
+        """Drop every entry whose key matches; returns how many"""
+        keys = [key for key in self.entries if predicate(key)]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+def feed_key(language, conditions, category=None, content_type=None, limit=10):
+    """Cache key of a feed; users with the same conditions in any order share it"""
+    return (language, tuple(sorted(set(conditions))), category, content_type, limit)
+
+def shows(key, language, condition):
+    """Whether the feed cached under key can include content in language for condition"""
+    feed_language, conditions = key[0], key[1]
+    # Every feed includes 'general' content; a user without conditions sees only that
+    return feed_language == language and (condition == 'general' or condition in conditions)
+
+class FeedCache:
+    def __init__(self, size=DEFAULT_SIZE, users=DEFAULT_USERS, ttl=DEFAULT_TTL_SECONDS):
+        self.lock = threading.Lock()
+        self.feeds = LRUCache(size, ttl)  # feed_key -> (conditional.Validator, [HealthContent.to_dict()])
+        self.segments = LRUCache(users if size > 0 else 0, ttl)  # user_id -> (language, conditions)
+        # Bumped by every invalidation, so a feed read from the database while
+        # content changed underneath it is not cached
+        self.generation = 0
+        self.invalidations = 0
+
+    def segment(self, user_id):
+        with self.lock:
+            return self.segments.get(user_id)
+
+    def remember_segment(self, user_id, language, conditions):
+        with self.lock:
+            self.segments.put(user_id, (language, conditions))
+
+    def forget_user(self, user_id):
+        with self.lock:
+            self.segments.pop(user_id)
+
+    def feed(self, key):
+        with self.lock:
+            return self.feeds.get(key)
+
+    def store(self, key, content, generation):
+        """Cache a feed read from the database, unless content was invalidated since generation"""
+        with self.lock:
+            if generation == self.generation:
+                self.feeds.put(key, content)
+
+    def invalidate(self, changes):
+        """Drop cached feeds that can show content of any (language, condition) in changes"""
+        changes = set(changes)
+        with self.lock:
+            self.generation += 1
+            dropped = self.feeds.discard_where(
+                lambda key: any(shows(key, language, condition) for language, condition in changes)
+            )
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self):
+        with self.lock:
+            return {
+                'feeds': self.feeds.stats(),
+                'segments': self.segments.stats(),
+                'invalidated': self.invalidations,
+                'ttl_seconds': self.feeds.ttl
+            }
+
+def invalidate(app, changes):
+    """Drop app's cached feeds affected by changed (language, condition) pairs"""
+    cache = app.extensions.get('feed_cache')
+    if cache is not None:
+        return cache.invalidate(changes)
+    return 0
+
+def forget_user(app, user_id):
+    """Forget a user's cached segment after their language or conditions may have changed"""
+    cache = app.extensions.get('feed_cache')
+    if cache is not None:
+        cache.forget_user(user_id)
+
+def settings(config):
+    return {
+        'size': config.get('FEED_CACHE_SIZE', DEFAULT_SIZE),
+        'users': config.get('FEED_CACHE_USERS', DEFAULT_USERS),
+        'ttl': config.get('FEED_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+    }
+
+def init_app(app):
+    cache = FeedCache(**settings(app.config))
+    app.extensions['feed_cache'] = cache
+    return cache
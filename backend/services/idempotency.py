@@ -0,0 +1,153 @@
+"""Idempotency-Key support for write endpoints.
+
+Clients on flaky connections retry POSTs. When a request carries an
+Idempotency-Key header, the first response is stored and every retry with
+the same key (and the same body) replays it from a single indexed lookup
+instead of repeating the write.
+"""
+from database import db
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, request
+from flask.cli import AppGroup
+from functools import wraps
+from models.idempotency_key import IdempotencyKey
+from sqlalchemy.exc import IntegrityError
+import click
+import hashlib
+
+HEADER = 'Idempotency-Key'
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# An unfinished key older than this is treated as abandoned by a crashed request
+DEFAULT_LOCK_SECONDS = 60
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def replay(record):
+    response = current_app.response_class(
+        record.response_body,
+        status=record.status_code,
+        mimetype=record.content_type or 'application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def claim(scope, key, fingerprint):
+    """Insert an in-flight marker for key, or return the response to send instead"""
+    now = datetime.utcnow()
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', DEFAULT_TTL_SECONDS)
+    lock_seconds = current_app.config.get('IDEMPOTENCY_LOCK_SECONDS', DEFAULT_LOCK_SECONDS)
+
+    record = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+    if record and record.expires_at <= now:
+        # Guarded, so a concurrent retry that already replaced the key keeps its row
+        db.session.execute(db.delete(IdempotencyKey).where(
+            IdempotencyKey.id == record.id, IdempotencyKey.expires_at <= now
+        ))
+        db.session.commit()
+        record = None
+
+    if record:
+        if record.request_hash != fingerprint:
+            return jsonify({'error': f'{HEADER} was already used with a different request'}), 422
+        if record.status_code is not None:
+            return replay(record)
+        stale = now - timedelta(seconds=lock_seconds)
+        if record.created_at and record.created_at > stale:
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+        # The original request never finished, let this one take over. One
+        # conditional UPDATE, so of several retries racing for it only one wins
+        taken = db.session.execute(
+            db.update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+                db.or_(IdempotencyKey.created_at.is_(None), IdempotencyKey.created_at <= stale)
+            )
+            .values(created_at=now)
+        ).rowcount
+        db.session.commit()
+        if taken:
+            return None
+        # Another retry took over, finished or released it first: answer from its current state
+        return claim(scope, key, fingerprint)
+
+    try:
+        db.session.add(IdempotencyKey(
+            scope=scope,
+            key=key,
+            request_hash=fingerprint,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ))
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry claimed the key first
+        db.session.rollback()
+        return claim(scope, key, fingerprint)
+    return None
+
+def store(scope, key, response):
+    """Save the final response for key; server errors release it so the client can retry"""
+    try:
+        record = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+        if not record:
+            return
+        if response.status_code >= 500:
+            db.session.delete(record)
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.get_data(as_text=True)
+            record.content_type = response.mimetype
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Failed to store the idempotent response for %s/%s', scope, key)
+
+def idempotent(view):
+    """Honor the Idempotency-Key header on a write endpoint"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': f'{HEADER} must be at most 255 characters'}), 400
+
+        scope = request.endpoint
+        early = claim(scope, key, request_fingerprint())
+        if early is not None:
+            return early
+
+        response = current_app.make_response(view(*args, **kwargs))
+        store(scope, key, response)
+        return response
+    return wrapper
+
+def purge_expired(batch_size=10000):
+    """Delete expired keys in batches; returns the number removed"""
+    removed = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return removed
+        db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
+
+idempotency_cli = AppGroup('idempotency', help='Manage stored Idempotency-Key responses.')
+
+@idempotency_cli.command('purge')
+@click.option('--batch-size', type=int, default=10000, show_default=True)
+def purge_command(batch_size):
+    """Delete expired idempotency keys"""
+    click.echo(f'Purged {purge_expired(batch_size)} expired idempotency keys')
@@ -0,0 +1,169 @@
+"""Per-user snapshot of the newest vitals, upserted on every write.
+
+/latest becomes a primary-key lookup on latest_vitals instead of an
+ORDER BY over the user's readings plus a fresh get_health_insights() call.
+"""
+from database import db, upsert_insert
+from datetime import datetime
+from models.latest_vitals import LatestVitals
+from models.vitals import VitalRecord
+import json
+
+METRICS = [
+    'blood_sugar',
+    'blood_pressure_systolic',
+    'blood_pressure_diastolic',
+    'weight',
+    'heart_rate',
+    'temperature',
+    'oxygen_level',
+]
+
+def fold(snapshot, vital):
+    """Apply one reading to a snapshot dict, keeping the newest value of everything"""
+    if snapshot is None:
+        snapshot = {'user_id': vital.user_id, 'record': None, 'recorded_at': None}
+        for metric in METRICS:
+            snapshot[metric] = None
+            snapshot[f'{metric}_at'] = None
+        snapshot['blood_sugar_meal'] = None
+
+    if snapshot['recorded_at'] is None or vital.recorded_at >= snapshot['recorded_at']:
+        snapshot['record'] = vital
+        snapshot['recorded_at'] = vital.recorded_at
+
+    for metric in METRICS:
+        value = getattr(vital, metric)
+        metric_at = snapshot[f'{metric}_at']
+        if value is not None and (metric_at is None or vital.recorded_at >= metric_at):
+            snapshot[metric] = value
+            snapshot[f'{metric}_at'] = vital.recorded_at
+            if metric == 'blood_sugar':
+                snapshot['blood_sugar_meal'] = vital.before_after_meal
+    return snapshot
+
+def snapshot_row(snapshot):
+    """Column values for a folded snapshot, serializing the newest reading once"""
+    record = snapshot['record']
+    row = {
+        'user_id': snapshot['user_id'],
+        'vital_id': record.id,
+        'recorded_at': record.recorded_at,
+        'vital': json.dumps(record.to_dict()),
+        'insights': json.dumps(record.get_health_insights()),
+        'updated_at': datetime.utcnow()
+    }
+    for metric in METRICS:
+        row[metric] = snapshot[metric]
+        row[f'{metric}_at'] = snapshot[f'{metric}_at']
+    row['blood_sugar_meal'] = snapshot['blood_sugar_meal']
+    return row
+
+def upsert_statement():
+    """Upsert that only lets newer readings replace what the snapshot already holds"""
+    stmt = upsert_insert(LatestVitals)
+    table = LatestVitals.__table__
+    new = stmt.excluded
+
+    newer = new.recorded_at >= table.c.recorded_at
+    changes = {
+        name: db.case((newer, new[name]), else_=table.c[name])
+        for name in ('vital_id', 'recorded_at', 'vital', 'insights')
+    }
+    changes['updated_at'] = new.updated_at
+    for metric in METRICS:
+        old_at, new_at = table.c[f'{metric}_at'], new[f'{metric}_at']
+        take_new = db.and_(new_at.isnot(None), db.or_(old_at.is_(None), new_at >= old_at))
+        changes[metric] = db.case((take_new, new[metric]), else_=table.c[metric])
+        changes[f'{metric}_at'] = db.case((take_new, new_at), else_=old_at)
+        if metric == 'blood_sugar':
+            changes['blood_sugar_meal'] = db.case((take_new, new.blood_sugar_meal), else_=table.c.blood_sugar_meal)
+
+    return stmt.on_conflict_do_update(index_elements=['user_id'], set_=changes)
+
+def record_vitals(vitals):
+    """Fold persisted VitalRecords (ids assigned) into their users' snapshots.
+
+    Readings are folded per user in Python first so each user gets a single
+    upsert; runs in the caller's transaction.
+    """
+    snapshots = {}
+    for vital in sorted(vitals, key=lambda v: (v.recorded_at, v.id)):
+        snapshots[vital.user_id] = fold(snapshots.get(vital.user_id), vital)
+    if snapshots:
+        db.session.execute(upsert_statement(), [snapshot_row(s) for s in snapshots.values()])
+
+def expected_snapshots(user_ids, yield_per=1000):
+    """Recompute snapshots for user_ids from vital_records"""
+    snapshots = {}
+    vitals = db.session.scalars(
+        db.select(VitalRecord)
+        .where(VitalRecord.user_id.in_(user_ids))
+        .order_by(VitalRecord.user_id, VitalRecord.recorded_at, VitalRecord.id)
+        .execution_options(yield_per=yield_per)
+    )
+    for vital in vitals:
+        snapshots[vital.user_id] = fold(snapshots.get(vital.user_id), vital)
+    return snapshots
+
+def all_user_ids():
+    """Users with vitals or a snapshot, so snapshots left without readings are covered too"""
+    return list(db.session.scalars(
+        db.union(db.select(VitalRecord.user_id), db.select(LatestVitals.user_id)).order_by('user_id')
+    ))
+
+def rebuild(user_ids=None, chunk_size=500):
+    """Backfill snapshots from vital_records, one transaction per chunk of users.
+
+    Users without vitals lose their snapshot.
+    """
+    if user_ids is None:
+        user_ids = all_user_ids()
+
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        rows = [snapshot_row(s) for s in expected_snapshots(chunk).values()]
+        db.session.execute(db.delete(LatestVitals).where(LatestVitals.user_id.in_(chunk)))
+        if rows:
+            db.session.execute(db.insert(LatestVitals), rows)
+        db.session.commit()
+        db.session.expunge_all()
+
+    return len(user_ids)
+
+def check_consistency(user_ids=None, chunk_size=500):
+    """Compare stored snapshots with ones recomputed from vital_records.
+
+    Returns a list of (user_id, problem) tuples; an empty list means every
+    snapshot matches.
+    """
+    if user_ids is None:
+        user_ids = all_user_ids()
+
+    problems = []
+    compared = ['recorded_at', 'blood_sugar_meal'] + METRICS + [f'{metric}_at' for metric in METRICS]
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        expected = expected_snapshots(chunk)
+        stored = {
+            row.user_id: row
+            for row in db.session.scalars(db.select(LatestVitals).where(LatestVitals.user_id.in_(chunk)))
+        }
+        for user_id in chunk:
+            want, have = expected.get(user_id), stored.get(user_id)
+            if want is None and have is None:
+                continue
+            if want is None:
+                problems.append((user_id, 'snapshot exists but user has no vitals'))
+            elif have is None:
+                problems.append((user_id, 'snapshot missing'))
+            elif have.vital_id != want['record'].id:
+                problems.append((user_id, f'vital_id {have.vital_id} != {want["record"].id}'))
+            else:
+                for name in compared:
+                    if getattr(have, name) != want[name]:
+                        problems.append((user_id, f'{name} {getattr(have, name)!r} != {want[name]!r}'))
+                        break
+        db.session.expunge_all()
+
+    return problems
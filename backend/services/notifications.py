@@ -0,0 +1,440 @@
+"""Notification outbox and delivery workers.
+
+Firing a reminder only inserts a row into notification_outbox, in the same
+transaction that advances the reminder, so a slow SMS gateway never holds up
+the dispatcher or a database connection. Delivery workers drain the outbox in
+batches through pluggable transports, each with its own rate limit; failures
+are retried with exponential backoff and dead-lettered after max_attempts.
+"""
+from database import claim_rows, db
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from models.notification import NotificationOutbox
+from models.user import User
+from services.adherence import delivered_events, record_events
+import click
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urllib.request
+import uuid
+
+DEFAULT_CHANNEL = 'file'
+# Users with no device token registered are sent an SMS instead of a push
+PUSH_FALLBACK_CHANNEL = 'sms'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WORKERS = 4
+DEFAULT_POLL_INTERVAL = 2
+# Claimed rows stay invisible to other workers this long; must outlast a batch
+DEFAULT_LEASE_SECONDS = 300
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 6 * 60 * 60
+
+class RateLimiter:
+    """Token bucket shared by every thread sending through one transport"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve a token even when none is left; the deficit is the wait
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+class Transport:
+    """Base class for delivery channels; subclasses implement deliver()"""
+    name = None
+
+    def __init__(self, rate_per_second=10, max_attempts=5):
+        self.limiter = RateLimiter(rate_per_second) if rate_per_second else None
+        self.max_attempts = max_attempts
+
+    def send(self, messages):
+        """Deliver outbox rows; returns {outbox id: error message or None}"""
+        results = {}
+        for message in messages:
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                self.deliver(message)
+                results[message.id] = None
+            except Exception as e:
+                results[message.id] = str(e) or type(e).__name__
+        return results
+
+    def deliver(self, message):
+        raise NotImplementedError
+
+class FileTransport(Transport):
+    """Appends messages as JSON lines to a local file, for development and tests"""
+    name = 'file'
+
+    def __init__(self, path, **kwargs):
+        kwargs.setdefault('rate_per_second', None)
+        super().__init__(**kwargs)
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send(self, messages):
+        lines = ''.join(json.dumps({
+            'id': message.id,
+            'user_id': message.user_id,
+            'recipient': message.recipient,
+            'language': message.language,
+            'message': message.message
+        }, ensure_ascii=False) + '\n' for message in messages)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+        return {message.id: None for message in messages}
+
+class HttpTransport(Transport):
+    """POSTs one JSON payload per message to a gateway URL"""
+
+    def __init__(self, url, token=None, timeout=10, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def payload(self, message):
+        raise NotImplementedError
+
+    def deliver(self, message):
+        if not self.url:
+            raise RuntimeError(f'{self.name} gateway URL is not configured')
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(self.payload(message)).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f'{self.name} gateway returned {response.status}')
+
+class SmsTransport(HttpTransport):
+    name = 'sms'
+
+    def payload(self, message):
+        return {'to': message.recipient, 'text': message.message, 'language': message.language}
+
+class PushTransport(HttpTransport):
+    name = 'push'
+
+    def payload(self, message):
+        return {'token': message.recipient, 'title': 'Aarogya Sahayak', 'body': message.message}
+
+class IvrTransport(HttpTransport):
+    """Voice call reading the message aloud, for patients who cannot read SMS"""
+    name = 'ivr'
+
+    def payload(self, message):
+        return {'to': message.recipient, 'speech': message.message, 'language': message.language}
+
+def build_transports(app):
+    config = app.config
+    transports = [
+        FileTransport(config.get('NOTIFICATION_FILE') or os.path.join(app.instance_path, 'notifications.ndjson')),
+    ]
+    for cls in (SmsTransport, PushTransport, IvrTransport):
+        prefix = cls.name.upper()
+        transports.append(cls(
+            config.get(f'{prefix}_GATEWAY_URL'),
+            token=config.get(f'{prefix}_GATEWAY_TOKEN'),
+            rate_per_second=config.get(f'{prefix}_RATE_PER_SECOND', 10),
+            max_attempts=config.get(f'{prefix}_MAX_ATTEMPTS', 5)
+        ))
+    return {transport.name: transport for transport in transports}
+
+def register_transport(app, transport):
+    """Add or replace the transport for transport.name"""
+    app.extensions['notification_transports'][transport.name] = transport
+
+# Reminder message templates by language; {items} is the medicine list
+MESSAGES = {
+    'english': ('Reminder: {items}', 'Reminder: time for {count} medicines - {items}'),
+    'hindi': ('अनुस्मारक: {items}', 'अनुस्मारक: {count} दवाइयों का समय - {items}'),
+    'marathi': ('स्मरणपत्र: {items}', 'स्मरणपत्र: {count} औषधांची वेळ - {items}'),
+    'tamil': ('நினைவூட்டல்: {items}', 'நினைவூட்டல்: {count} மருந்துகளுக்கான நேரம் - {items}'),
+}
+LANGUAGE_CODES = {'en': 'english', 'hi': 'hindi', 'mr': 'marathi', 'ta': 'tamil'}
+
+def medication_label(reminder):
+    if not reminder.medication_name:
+        return None
+    if reminder.dosage:
+        return f'{reminder.medication_name} ({reminder.dosage})'
+    return reminder.medication_name
+
+def reminder_message(reminders, language):
+    """One message covering every reminder, in language (English if unsupported)"""
+    language = (language or '').lower()
+    single, multiple = MESSAGES.get(LANGUAGE_CODES.get(language, language), MESSAGES['english'])
+    if len(reminders) == 1:
+        reminder = reminders[0]
+        label = medication_label(reminder)
+        return single.format(items=f'{reminder.title} - {label}' if label else reminder.title)
+    items = ', '.join(medication_label(reminder) or reminder.title for reminder in reminders)
+    return multiple.format(count=len(reminders), items=items)
+
+def delivery_address(channel, phone, push_token):
+    """(channel, recipient) for a user: push goes to their device token, and without one falls back to SMS"""
+    if channel != 'push':
+        return channel, phone
+    if push_token:
+        return channel, push_token
+    return PUSH_FALLBACK_CHANNEL, phone
+
+def enqueue_reminders(reminders, now=None):
+    """Queue notifications for fired reminders in the caller's transaction.
+
+    Reminders of the same user and language become a single message, so a
+    patient taking four medicines at 08:00 gets one SMS rather than four.
+    Returns the number of notifications queued.
+    """
+    groups = {}
+    for reminder in sorted(reminders, key=lambda r: (r.next_trigger or datetime.min, r.id)):
+        if reminder.notification_enabled:
+            groups.setdefault((reminder.user_id, reminder.language), []).append(reminder)
+    if not groups:
+        return 0
+    channel = current_app.config.get('REMINDER_CHANNEL', DEFAULT_CHANNEL)
+    addresses = {
+        user_id: delivery_address(channel, phone, push_token)
+        for user_id, phone, push_token in db.session.execute(
+            db.select(User.id, User.phone, User.push_token).where(User.id.in_({user_id for user_id, _ in groups}))
+        )
+    }
+    now = now or datetime.utcnow()
+    db.session.execute(db.insert(NotificationOutbox), [{
+        'user_id': user_id,
+        'reminder_id': group[0].id,
+        'reminder_ids': json.dumps([reminder.id for reminder in group]),
+        'reminder_count': len(group),
+        'channel': addresses[user_id][0],
+        'recipient': addresses[user_id][1],
+        'message': reminder_message(group, language),
+        'language': language,
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for (user_id, language), group in groups.items()])
+    return len(groups)
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.5)
+
+def claim_batch(owner, batch_size, lease_seconds):
+    """Lease up to batch_size due outbox rows to owner; returns them"""
+    now = datetime.utcnow()
+    table = NotificationOutbox.__table__
+    ids = claim_rows(
+        table,
+        [table.c.status == 'pending', table.c.next_attempt_at <= now],
+        {'claimed_by': owner, 'next_attempt_at': now + timedelta(seconds=lease_seconds)},
+        order_by=[table.c.next_attempt_at],
+        limit=batch_size
+    )
+    messages = db.session.execute(db.select(table).where(table.c.id.in_(ids))).all() if ids else []
+    # End the transaction before talking to any gateway
+    db.session.commit()
+    return messages
+
+def deliver_batch(messages, owner, transports):
+    """Send claimed rows through their transports and record the outcome.
+
+    Returns {'sent': n, 'retried': n, 'dead': n}.
+    """
+    results = {}
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+    for channel, batch in by_channel.items():
+        transport = transports.get(channel)
+        if transport is None:
+            results.update({message.id: f'No transport for channel {channel}' for message in batch})
+        else:
+            results.update(transport.send(batch))
+
+    now = datetime.utcnow()
+    sent, failed = [], []
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    for message in messages:
+        error = results.get(message.id)
+        if error is None:
+            sent.append({'outbox_id': message.id})
+            counts['sent'] += 1
+            continue
+        attempts = message.attempts + 1
+        transport = transports.get(message.channel)
+        dead = transport is None or attempts >= transport.max_attempts
+        failed.append({
+            'outbox_id': message.id,
+            'new_status': 'dead' if dead else 'pending',
+            'new_attempts': attempts,
+            'retry_at': now if dead else now + timedelta(seconds=retry_delay(attempts)),
+            'error': error[:1000]
+        })
+        counts['dead' if dead else 'retried'] += 1
+
+    record_events(delivered_events([message for message in messages if results.get(message.id) is None]))
+
+    table = NotificationOutbox.__table__
+    # Guarded by the lease owner: a worker whose lease lapsed must not overwrite the new owner
+    owned = db.and_(table.c.id == db.bindparam('outbox_id'), table.c.claimed_by == owner)
+    if sent:
+        db.session.execute(
+            db.update(table).where(owned).values(
+                status='sent', sent_at=now, attempts=table.c.attempts + 1, last_error=None, claimed_by=None
+            ),
+            sent
+        )
+    if failed:
+        db.session.execute(
+            db.update(table).where(owned).values(
+                status=db.bindparam('new_status'),
+                attempts=db.bindparam('new_attempts'),
+                next_attempt_at=db.bindparam('retry_at'),
+                last_error=db.bindparam('error'),
+                claimed_by=None
+            ),
+            failed
+        )
+    db.session.commit()
+    return counts
+
+class DeliveryWorker:
+    """Pool of threads, each claiming and delivering outbox batches until stopped"""
+
+    def __init__(self, app, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.app = app
+        self.batch_size = batch_size
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.stopping = threading.Event()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.counts = {'sent': 0, 'retried': 0, 'dead': 0, 'errors': 0}
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def start(self):
+        if self.running:
+            return
+        self.stopping.clear()
+        self.threads = [
+            threading.Thread(target=self.run, name=f'notification-worker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def run(self):
+        owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'[-64:]
+        while not self.stopping.is_set():
+            delivered = 0
+            try:
+                with self.app.app_context():
+                    messages = claim_batch(owner, self.batch_size, self.lease_seconds)
+                    if messages:
+                        counts = deliver_batch(messages, owner, self.app.extensions['notification_transports'])
+                        delivered = len(messages)
+                        with self.lock:
+                            for key, value in counts.items():
+                                self.counts[key] += value
+            except Exception:
+                with self.lock:
+                    self.counts['errors'] += 1
+                self.app.logger.exception('Notification delivery batch failed')
+            if not delivered:
+                self.stopping.wait(self.poll_interval)
+
+def settings(config):
+    return {
+        'batch_size': config.get('NOTIFICATION_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        'workers': config.get('NOTIFICATION_WORKERS', DEFAULT_WORKERS),
+        'poll_interval': config.get('NOTIFICATION_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+        'lease_seconds': config.get('NOTIFICATION_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    }
+
+def init_app(app):
+    """Register transports and a delivery worker; it runs in-process only when NOTIFICATION_WORKER_ENABLED is set"""
+    app.extensions['notification_transports'] = build_transports(app)
+    worker = DeliveryWorker(app, **settings(app.config))
+    app.extensions['notification_worker'] = worker
+    if app.config.get('NOTIFICATION_WORKER_ENABLED'):
+        worker.start()
+    return worker
+
+notifications_cli = AppGroup('notifications', help='Deliver and inspect queued notifications.')
+
+@notifications_cli.command('deliver')
+@click.option('--workers', type=int, help='Delivery threads')
+@click.option('--batch-size', type=int, help='Outbox rows claimed per batch')
+def deliver_command(workers, batch_size):
+    """Run delivery workers in the foreground until interrupted"""
+    options = settings(current_app.config)
+    options.update({name: value for name, value in (('workers', workers), ('batch_size', batch_size)) if value})
+    worker = DeliveryWorker(current_app._get_current_object(), **options)
+    worker.start()
+    click.echo('Notification workers running, press Ctrl+C to stop')
+    try:
+        while worker.running:
+            time.sleep(60)
+            click.echo(json.dumps(worker.counts))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+@notifications_cli.command('status')
+def status_command():
+    """Outbox row counts by channel and status"""
+    rows = db.session.execute(
+        db.select(NotificationOutbox.channel, NotificationOutbox.status, db.func.count(),
+                  db.func.sum(NotificationOutbox.reminder_count))
+        .group_by(NotificationOutbox.channel, NotificationOutbox.status)
+        .order_by(NotificationOutbox.channel, NotificationOutbox.status)
+    ).all()
+    for channel, status, count, reminders in rows:
+        click.echo(f'{channel:8s} {status:8s} {count:10d} notifications for {reminders} reminders')
+
+@notifications_cli.command('requeue-dead')
+@click.option('--channel', help='Only requeue this channel')
+def requeue_dead_command(channel):
+    """Give dead-lettered notifications a fresh set of attempts"""
+    query = db.update(NotificationOutbox).where(NotificationOutbox.status == 'dead')
+    if channel:
+        query = query.where(NotificationOutbox.channel == channel)
+    result = db.session.execute(query.values(status='pending', attempts=0, next_attempt_at=datetime.utcnow()))
+    db.session.commit()
+    click.echo(f'Requeued {result.rowcount} notifications')
@@ -0,0 +1,148 @@
+"""Next-occurrence computation for reminder schedules.
+
+A reminder's (frequency, scheduled_time, days_of_week) is compiled once into
+a Schedule holding a weekday bitmask (or a day of month), so computing the
+next occurrence is a table lookup and some date arithmetic instead of
+json.loads plus a day-by-day strftime loop. Compiled schedules are cached,
+and the batch API computes each distinct schedule only once, which is what
+makes advancing thousands of fired reminders cheap: most patients share a
+handful of schedules.
+
+Schedules are wall-clock times in the reminder's timezone (copied from its
+user). Occurrences are computed in local time and converted to naive UTC
+once, when the reminder is written or fired, so next_trigger is stored in
+UTC and the dispatcher compares it against utcnow() without any per-reminder
+conversion. Local times skipped by a DST change fire at the shifted time;
+repeated ones fire once.
+"""
+from calendar import monthrange
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import json
+
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+EVERY_DAY = 0b1111111
+
+# NEXT_DAY[mask][weekday]: days from weekday (inclusive) to the next weekday set in mask
+NEXT_DAY = [
+    [next((offset for offset in range(7) if mask & (1 << (weekday + offset) % 7)), None) for weekday in range(7)]
+    for mask in range(EVERY_DAY + 1)
+]
+
+# kind is 'weekly' (days from weekday_mask) or 'monthly' (day_of_month, clamped to short months)
+Schedule = namedtuple('Schedule', ['kind', 'scheduled_time', 'weekday_mask', 'day_of_month'])
+
+def weekday_mask(days_of_week):
+    """Bitmask (bit 0 = Monday) from a JSON list of day names such as ["monday", "Thu"]"""
+    if not days_of_week:
+        return 0
+    days = json.loads(days_of_week) if isinstance(days_of_week, str) else days_of_week
+    prefixes = {str(day).strip().lower()[:3] for day in days}
+    mask = 0
+    for index, name in enumerate(WEEKDAYS):
+        if name[:3] in prefixes:
+            mask |= 1 << index
+    return mask
+
+@lru_cache(maxsize=4096)
+def compile_schedule(frequency, scheduled_time, days_of_week, anchor_weekday, anchor_day):
+    """Compile schedule fields into a Schedule.
+
+    anchor_weekday and anchor_day come from the reminder's creation date and
+    pick the day for 'weekly' reminders without days_of_week and for
+    'monthly' reminders.
+    """
+    mask = weekday_mask(days_of_week)
+    if frequency == 'monthly':
+        return Schedule('monthly', scheduled_time, EVERY_DAY, anchor_day)
+    if frequency == 'weekly':
+        return Schedule('weekly', scheduled_time, mask or 1 << anchor_weekday, None)
+    if frequency == 'custom' and mask:
+        return Schedule('weekly', scheduled_time, mask, None)
+    # daily, and custom schedules without any valid day
+    return Schedule('weekly', scheduled_time, EVERY_DAY, None)
+
+@lru_cache(maxsize=None)
+def zone(name):
+    """ZoneInfo for an IANA timezone name, falling back to DEFAULT_TIMEZONE"""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+def is_valid_timezone(name):
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+
+def to_local(moment, tz):
+    """Naive UTC datetime -> naive wall-clock time in tz"""
+    return moment.replace(tzinfo=timezone.utc).astimezone(zone(tz)).replace(tzinfo=None)
+
+def to_utc(moment, tz):
+    """Naive wall-clock time in tz -> naive UTC datetime"""
+    return moment.replace(tzinfo=zone(tz)).astimezone(timezone.utc).replace(tzinfo=None)
+
+def schedule_for(reminder, now=None):
+    # Only weekly and monthly schedules depend on the anchor; keep it out of the cache key otherwise
+    anchor_weekday = anchor_day = 0
+    if reminder.frequency in ('weekly', 'monthly'):
+        anchor = to_local(reminder.created_at or now or datetime.utcnow(), reminder.timezone)
+        anchor_weekday, anchor_day = anchor.weekday(), anchor.day
+    return compile_schedule(
+        reminder.frequency, reminder.scheduled_time, reminder.days_of_week,
+        anchor_weekday, anchor_day
+    )
+
+def monthly_occurrence(year, month, schedule):
+    day = min(schedule.day_of_month, monthrange(year, month)[1])
+    return datetime.combine(date(year, month, day), schedule.scheduled_time)
+
+def next_occurrence(schedule, now):
+    """First occurrence of schedule strictly after now, both in local time"""
+    if schedule.kind == 'monthly':
+        candidate = monthly_occurrence(now.year, now.month, schedule)
+        if candidate <= now:
+            year, month = (now.year + 1, 1) if now.month == 12 else (now.year, now.month + 1)
+            candidate = monthly_occurrence(year, month, schedule)
+        return candidate
+
+    candidate = datetime.combine(now.date(), schedule.scheduled_time)
+    days = 1 if candidate <= now else 0
+    days += NEXT_DAY[schedule.weekday_mask][(now.weekday() + days) % 7]
+    return candidate + timedelta(days=days) if days else candidate
+
+def next_utc_occurrence(schedule, tz, now):
+    """First occurrence of schedule in timezone tz strictly after now, both naive UTC"""
+    local = to_local(now, tz)
+    while True:
+        candidate = next_occurrence(schedule, local)
+        trigger = to_utc(candidate, tz)
+        # Only false for the repeated hour when clocks go back
+        if trigger > now:
+            return trigger
+        local = candidate
+
+def calculate_next_trigger(reminder, now=None):
+    """Calculate the next trigger time (naive UTC) for a reminder"""
+    now = now or datetime.utcnow()
+    return next_utc_occurrence(schedule_for(reminder, now), reminder.timezone, now)
+
+def next_triggers(reminders, now=None):
+    """Next trigger (naive UTC) for each reminder, computing every distinct schedule once"""
+    now = now or datetime.utcnow()
+    computed = {}
+    triggers = []
+    for reminder in reminders:
+        key = (schedule_for(reminder, now), reminder.timezone)
+        trigger = computed.get(key)
+        if trigger is None:
+            trigger = computed[key] = next_utc_occurrence(key[0], key[1], now)
+        triggers.append(trigger)
+    return triggers
@@ -0,0 +1,528 @@
+"""Reminder dispatcher: one poller and a worker pool instead of one job per reminder.
+
+The poller reads the (is_active, next_trigger) index for reminders due within
+a short horizon, in keyset-ordered batches, and keeps only that window in a
+heap. Due reminders are handed to a thread pool in batches; each batch is
+fired and has its next_trigger advanced with a single bulk UPDATE. The
+reminders table stays the source of truth, so nothing is lost on restart and
+memory only grows with the number of reminders due within the horizon.
+
+On start the dispatcher rehydrates from the table: reminders that fell due
+while nothing was running are streamed in keyset pages and fired or skipped
+according to the catch-up policy, then only the near-term horizon is loaded,
+so startup time and memory depend on what is due, not on the table size.
+
+Any number of dispatchers (gunicorn workers, nodes) can run against the same
+database: every batch first leases its reminders, so each occurrence is fired
+by exactly one of them. A lease that lapses because its worker died makes the
+reminder claimable again.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from database import claim_rows, db
+from datetime import datetime, timedelta
+from flask import current_app
+from models.reminder import Reminder
+from services import events
+from services.adherence import DEFAULT_MISSED_AFTER_SECONDS, fired_events, mark_missed, record_events
+from services.notifications import enqueue_reminders
+from services.recurrence import calculate_next_trigger, next_triggers
+import heapq
+import os
+import socket
+import threading
+import uuid
+
+DEFAULT_HORIZON_SECONDS = 60
+DEFAULT_POLL_INTERVAL = 5
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WORKERS = 4
+DEFAULT_TICK_SECONDS = 0.1
+# A lease must outlast the slowest batch, or a second worker may fire it again
+DEFAULT_LEASE_SECONDS = 60
+# A user's reminders due within this many seconds of each other share one notification
+DEFAULT_COALESCE_SECONDS = 300
+# Reminders overdue by more than the grace period at startup are fired ('fire')
+# or advanced to their next occurrence without a notification ('skip')
+CATCH_UP_POLICIES = ('fire', 'skip')
+DEFAULT_CATCH_UP = 'fire'
+DEFAULT_CATCH_UP_GRACE_SECONDS = 900
+
+def worker_id():
+    """Lease owner token: identifies the host and process, unique per batch"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'[-64:]
+
+def claim_reminders(reminder_ids, owner, now, lease_seconds, due_only=True):
+    """Lease reminders to owner in a short transaction of its own; returns the ids claimed.
+
+    A reminder can be claimed when it is active and not leased, or its lease
+    has lapsed (the worker holding it crashed).
+    """
+    table = Reminder.__table__
+    conditions = [
+        table.c.id.in_(reminder_ids),
+        table.c.is_active == True,
+        db.or_(table.c.claim_expires_at.is_(None), table.c.claim_expires_at <= now)
+    ]
+    if due_only:
+        conditions.append(table.c.next_trigger <= now)
+
+    claimed = claim_rows(table, conditions, {
+        'claimed_by': owner,
+        'claim_expires_at': now + timedelta(seconds=lease_seconds)
+    })
+    db.session.commit()
+    return claimed
+
+def claim_companions(claimed, owner, now, lease_seconds, window_seconds):
+    """Also lease the same users' reminders due within the coalescing window.
+
+    One grouped UPDATE over the users of the claimed batch, so their
+    medicines due a few minutes apart go out together in a single message.
+    """
+    table = Reminder.__table__
+    users = db.select(table.c.user_id).where(table.c.id.in_(claimed)).distinct()
+    companions = claim_rows(table, [
+        table.c.user_id.in_(users.scalar_subquery()),
+        table.c.is_active == True,
+        table.c.next_trigger <= now + timedelta(seconds=window_seconds),
+        db.or_(table.c.claim_expires_at.is_(None), table.c.claim_expires_at <= now)
+    ], {
+        'claimed_by': owner,
+        'claim_expires_at': now + timedelta(seconds=lease_seconds)
+    })
+    db.session.commit()
+    return companions
+
+def fire_reminders(reminder_ids, now=None, due_only=True, notify=enqueue_reminders,
+                   lease_seconds=None, coalesce_seconds=None):
+    """Claim, fire and advance reminders; safe to run from any number of processes.
+
+    With due_only, reminders that are no longer due (updated, deactivated or
+    already fired elsewhere) are skipped. Reminders of the same users falling
+    due within coalesce_seconds are fired early alongside them. Without
+    due_only (a manual trigger), requested reminders that are not due yet
+    only send their notification: next_trigger and the pending dose are left
+    alone, so the next scheduled dose still fires and is the one tracked.
+
+    notify(reminders, now) runs in the same transaction and returns the number
+    of notifications sent; by default it queues them in the outbox, so a fired
+    reminder, its notification and its adherence events commit together.
+    Claimed reminders get their next_trigger advanced and lease released in
+    one bulk UPDATE, guarded by the lease owner so a worker whose lease lapsed
+    cannot overwrite the one that took over. Each user's fired reminders are
+    recorded as one 'reminder' stream event in the same transaction.
+
+    Returns (fired, notifications) where fired lists (reminder_id, due_at,
+    next_trigger) for every reminder fired.
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    if lease_seconds is None:
+        lease_seconds = config.get('REMINDER_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    if coalesce_seconds is None:
+        coalesce_seconds = config.get('REMINDER_COALESCE_SECONDS', DEFAULT_COALESCE_SECONDS)
+
+    owner = worker_id()
+    claimed = claim_reminders(reminder_ids, owner, now, lease_seconds, due_only)
+    if not claimed:
+        return [], 0
+    if coalesce_seconds:
+        claimed += claim_companions(claimed, owner, now, lease_seconds, coalesce_seconds)
+
+    reminders = db.session.scalars(db.select(Reminder).where(Reminder.id.in_(claimed))).all()
+    requested = set(reminder_ids)
+    manual = [] if due_only else [
+        reminder for reminder in reminders
+        if reminder.id in requested and reminder.next_trigger and reminder.next_trigger > now
+    ]
+    scheduled = [reminder for reminder in reminders if reminder not in manual]
+    notifications = notify(reminders, now)
+    record_events(fired_events(scheduled))
+
+    # Reminders fired early advance past their own occurrence, not past now
+    early = [reminder for reminder in scheduled if reminder.next_trigger and reminder.next_trigger > now]
+    on_time = [reminder for reminder in scheduled if not (reminder.next_trigger and reminder.next_trigger > now)]
+    upcoming = dict(zip((reminder.id for reminder in on_time), next_triggers(on_time, now)))
+    upcoming.update({reminder.id: calculate_next_trigger(reminder, reminder.next_trigger) for reminder in early})
+    # Manual fires keep their schedule
+    upcoming.update({reminder.id: reminder.next_trigger for reminder in manual})
+    manual_ids = {reminder.id for reminder in manual}
+
+    fired = [(reminder.id, reminder.next_trigger, upcoming[reminder.id]) for reminder in reminders]
+    events.record(fired_event_items(reminders, upcoming))
+    table = Reminder.__table__
+    if scheduled:
+        db.session.execute(
+            db.update(table)
+            .where(table.c.id == db.bindparam('reminder_id'), table.c.claimed_by == owner)
+            .values(
+                last_triggered=now,
+                next_trigger=db.bindparam('new_next_trigger'),
+                pending_occurrence=db.bindparam('occurrence'),
+                claimed_by=None,
+                claim_expires_at=None
+            ),
+            [{'reminder_id': reminder.id, 'occurrence': reminder.next_trigger,
+              'new_next_trigger': upcoming[reminder.id]} for reminder in scheduled]
+        )
+    if manual:
+        db.session.execute(
+            db.update(table)
+            .where(table.c.id.in_(manual_ids), table.c.claimed_by == owner)
+            .values(last_triggered=now, claimed_by=None, claim_expires_at=None)
+        )
+    db.session.commit()
+    for reminder_id, _, next_trigger in fired:
+        if reminder_id in manual_ids:
+            current_app.logger.info('Reminder %d fired manually, next dose still due at %s', reminder_id, next_trigger)
+    return fired, notifications
+
+def fired_event_items(reminders, upcoming):
+    """One 'reminder' event per user listing every reminder fired for them"""
+    by_user = {}
+    for reminder in reminders:
+        by_user.setdefault(reminder.user_id, []).append({
+            'id': reminder.id,
+            'title': reminder.title,
+            'reminder_type': reminder.reminder_type,
+            'medication_name': reminder.medication_name,
+            'dosage': reminder.dosage,
+            'due_at': reminder.next_trigger.isoformat() if reminder.next_trigger else None,
+            'next_trigger': upcoming[reminder.id].isoformat()
+        })
+    return [(user_id, 'reminder', {'reminders': items}) for user_id, items in by_user.items()]
+
+def skip_reminders(reminder_ids, now=None, lease_seconds=None):
+    """Advance overdue reminders to their next occurrence without firing them.
+
+    Claimed like fire_reminders, so a reminder another dispatcher is firing
+    is left alone. Returns the number of reminders skipped.
+    """
+    now = now or datetime.utcnow()
+    if lease_seconds is None:
+        lease_seconds = current_app.config.get('REMINDER_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+    owner = worker_id()
+    claimed = claim_reminders(reminder_ids, owner, now, lease_seconds)
+    if not claimed:
+        return 0
+
+    reminders = db.session.scalars(db.select(Reminder).where(Reminder.id.in_(claimed))).all()
+    table = Reminder.__table__
+    db.session.execute(
+        db.update(table)
+        .where(table.c.id == db.bindparam('reminder_id'), table.c.claimed_by == owner)
+        .values(next_trigger=db.bindparam('new_next_trigger'), claimed_by=None, claim_expires_at=None),
+        [{'reminder_id': reminder.id, 'new_next_trigger': next_trigger}
+         for reminder, next_trigger in zip(reminders, next_triggers(reminders, now))]
+    )
+    db.session.commit()
+    return len(reminders)
+
+def retime_reminders(user_id, tz):
+    """Move a user's reminders to a new timezone in the caller's transaction.
+
+    Active reminders get their next_trigger recomputed for the same wall-clock
+    times in tz. Returns (reminder_id, next_trigger) pairs for the dispatcher.
+    """
+    reminders = db.session.scalars(db.select(Reminder).where(Reminder.user_id == user_id)).all()
+    for reminder in reminders:
+        reminder.timezone = tz
+    active = [reminder for reminder in reminders if reminder.is_active]
+    for reminder, next_trigger in zip(active, next_triggers(active)):
+        reminder.next_trigger = next_trigger
+    return [(reminder.id, reminder.next_trigger) for reminder in active]
+
+class DispatchStats:
+    """Counters and recent firing lateness, shared by the worker threads"""
+
+    def __init__(self, samples=10000):
+        self.lock = threading.Lock()
+        self.fired = 0
+        self.skipped = 0
+        self.notifications = 0
+        self.batches = 0
+        self.errors = 0
+        self.lateness = deque(maxlen=samples)
+
+    def record(self, fired, notifications, fired_at):
+        with self.lock:
+            self.batches += 1
+            self.fired += len(fired)
+            self.notifications += notifications
+            self.lateness.extend(
+                (fired_at - due_at).total_seconds() for _, due_at, _ in fired if due_at is not None
+            )
+
+    def to_dict(self):
+        with self.lock:
+            ordered = sorted(self.lateness)
+            percentiles = {
+                f'p{p}': ordered[min(len(ordered) - 1, len(ordered) * p // 100)] if ordered else None
+                for p in (50, 95, 99)
+            }
+            return {
+                'fired': self.fired,
+                'skipped': self.skipped,
+                'notifications': self.notifications,
+                # Share of per-reminder messages saved by coalescing
+                'fan_out_reduction': round(1 - self.notifications / self.fired, 4) if self.fired else None,
+                'batches': self.batches,
+                'errors': self.errors,
+                'lateness_seconds': percentiles
+            }
+
+class ReminderDispatcher:
+    def __init__(self, app, horizon=DEFAULT_HORIZON_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL,
+                 batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, tick=DEFAULT_TICK_SECONDS,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, coalesce_seconds=DEFAULT_COALESCE_SECONDS,
+                 missed_after=DEFAULT_MISSED_AFTER_SECONDS, catch_up=DEFAULT_CATCH_UP,
+                 catch_up_grace=DEFAULT_CATCH_UP_GRACE_SECONDS, notify=enqueue_reminders):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f'catch_up must be one of {", ".join(CATCH_UP_POLICIES)}')
+        self.app = app
+        self.horizon = timedelta(seconds=horizon)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.workers = workers
+        # Reminders falling due within one tick are fired together, trading a
+        # little lateness for far fewer, larger transactions
+        self.tick = timedelta(seconds=tick)
+        self.lease_seconds = lease_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self.missed_after = missed_after
+        self.catch_up = catch_up
+        self.catch_up_grace = timedelta(seconds=catch_up_grace)
+        self.notify = notify
+        self.stats = DispatchStats()
+
+        self.condition = threading.Condition()
+        self.heap = []  # (next_trigger, reminder_id)
+        self.scheduled = {}  # reminder_id -> next_trigger currently in the heap
+        self.in_flight = set()
+        self.loaded_until = None
+        self.executor = None
+        self.thread = None
+        self.stopping = False
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='reminder-worker')
+        self.thread = threading.Thread(target=self.run, name='reminder-dispatcher', daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=True):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    def schedule(self, reminder_id, next_trigger):
+        """Pick up a created or rescheduled reminder without waiting for the next poll"""
+        self.schedule_many([(reminder_id, next_trigger)])
+
+    def schedule_many(self, entries):
+        """Schedule (reminder_id, next_trigger) pairs under one lock acquisition and wake-up"""
+        with self.condition:
+            for reminder_id, next_trigger in entries:
+                if self.loaded_until is None or next_trigger is None or next_trigger > self.loaded_until:
+                    # Outside the loaded window, a later poll will find it
+                    self.scheduled.pop(reminder_id, None)
+                else:
+                    self.push(reminder_id, next_trigger)
+            self.condition.notify()
+
+    def unschedule(self, reminder_id):
+        self.unschedule_many([reminder_id])
+
+    def unschedule_many(self, reminder_ids):
+        with self.condition:
+            # The heap entries become stale and are dropped when popped
+            for reminder_id in reminder_ids:
+                self.scheduled.pop(reminder_id, None)
+
+    def push(self, reminder_id, next_trigger):
+        if reminder_id in self.in_flight or self.scheduled.get(reminder_id) == next_trigger:
+            return
+        self.scheduled[reminder_id] = next_trigger
+        heapq.heappush(self.heap, (next_trigger, reminder_id))
+
+    def pages(self, until):
+        """Yield (next_trigger, reminder_id) rows due up to until, one keyset page at a time"""
+        after = None
+        while True:
+            query = db.select(Reminder.next_trigger, Reminder.id).where(
+                Reminder.is_active == True,
+                Reminder.next_trigger <= until
+            )
+            if after:
+                query = query.where(db.or_(
+                    Reminder.next_trigger > after[0],
+                    db.and_(Reminder.next_trigger == after[0], Reminder.id > after[1])
+                ))
+            rows = db.session.execute(
+                query.order_by(Reminder.next_trigger, Reminder.id).limit(self.batch_size)
+            ).all()
+            # Release the read transaction between pages
+            db.session.rollback()
+            if rows:
+                yield rows
+            if len(rows) < self.batch_size:
+                return
+            after = rows[-1]
+
+    def poll(self, now):
+        """Load reminders due up to now + horizon into the heap"""
+        until = now + self.horizon
+        loaded = 0
+        with self.app.app_context():
+            for rows in self.pages(until):
+                with self.condition:
+                    for next_trigger, reminder_id in rows:
+                        self.push(reminder_id, next_trigger)
+                loaded += len(rows)
+        with self.condition:
+            self.loaded_until = until
+        return loaded
+
+    def rehydrate(self, now):
+        """Catch up on reminders missed while no dispatcher ran, then load the horizon.
+
+        Reminders overdue by more than catch_up_grace are streamed page by
+        page and fired or skipped per the catch-up policy; at most a few
+        pages are in flight at once, so a long outage does not fill memory.
+        Reminders overdue by less than the grace period are fired as usual.
+        Returns {'caught_up', 'skipped', 'loaded'} counts.
+        """
+        caught_up = skipped = 0
+        pending = deque()
+        with self.app.app_context():
+            for rows in self.pages(now - self.catch_up_grace):
+                if self.stopping:
+                    break
+                reminder_ids = [reminder_id for _, reminder_id in rows]
+                if self.catch_up == 'skip':
+                    count = skip_reminders(reminder_ids, now, self.lease_seconds)
+                    skipped += count
+                    with self.stats.lock:
+                        self.stats.skipped += count
+                    continue
+                with self.condition:
+                    self.in_flight.update(reminder_ids)
+                pending.append(self.executor.submit(self.fire_batch, reminder_ids))
+                caught_up += len(reminder_ids)
+                while len(pending) > self.workers:
+                    pending.popleft().result()
+        for future in pending:
+            future.result()
+        loaded = self.poll(now)
+        return {'caught_up': caught_up, 'skipped': skipped, 'loaded': loaded}
+
+    def take_due(self, now):
+        """Pop every due, non-stale heap entry and mark it in flight"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            next_trigger, reminder_id = heapq.heappop(self.heap)
+            if self.scheduled.get(reminder_id) != next_trigger:
+                continue
+            del self.scheduled[reminder_id]
+            self.in_flight.add(reminder_id)
+            due.append(reminder_id)
+        return due
+
+    def run(self):
+        try:
+            started = datetime.utcnow()
+            counts = self.rehydrate(started)
+            self.app.logger.info(
+                'Reminder dispatcher rehydrated in %.2fs: %d caught up (%s), %d skipped, %d loaded',
+                (datetime.utcnow() - started).total_seconds(), counts['caught_up'], self.catch_up,
+                counts['skipped'], counts['loaded']
+            )
+            next_poll = started + timedelta(seconds=self.poll_interval)
+        except Exception:
+            self.app.logger.exception('Reminder rehydration failed')
+            next_poll = datetime.utcnow()
+        while True:
+            now = datetime.utcnow()
+            if now >= next_poll:
+                try:
+                    self.poll(now)
+                except Exception:
+                    self.app.logger.exception('Reminder poll failed')
+                try:
+                    with self.app.app_context():
+                        mark_missed(now, self.missed_after, self.batch_size)
+                except Exception:
+                    self.app.logger.exception('Marking missed reminders failed')
+                next_poll = now + timedelta(seconds=self.poll_interval)
+
+            with self.condition:
+                if self.stopping:
+                    return
+                now = datetime.utcnow()
+                due = self.take_due(now)
+                for i in range(0, len(due), self.batch_size):
+                    self.executor.submit(self.fire_batch, due[i:i + self.batch_size])
+
+                # Sleep until the earliest reminder is due (at most once per tick) or the next poll
+                wake_at = next_poll
+                if self.heap:
+                    wake_at = min(wake_at, max(self.heap[0][0], now + self.tick))
+                timeout = (wake_at - datetime.utcnow()).total_seconds()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+
+    def fire_batch(self, reminder_ids):
+        fired = []
+        try:
+            with self.app.app_context():
+                now = datetime.utcnow()
+                fired, notifications = fire_reminders(
+                    reminder_ids, now, notify=self.notify,
+                    lease_seconds=self.lease_seconds, coalesce_seconds=self.coalesce_seconds
+                )
+                self.stats.record(fired, notifications, now)
+        except Exception:
+            with self.stats.lock:
+                self.stats.errors += 1
+            self.app.logger.exception('Failed to fire %d reminders', len(reminder_ids))
+        finally:
+            with self.condition:
+                self.in_flight.difference_update(reminder_ids)
+        # Short-interval schedules may land inside the window that is already loaded
+        self.schedule_many((reminder_id, next_trigger) for reminder_id, _, next_trigger in fired)
+
+def settings(config):
+    return {
+        'horizon': config.get('REMINDER_HORIZON_SECONDS', DEFAULT_HORIZON_SECONDS),
+        'poll_interval': config.get('REMINDER_POLL_INTERVAL', DEFAULT_POLL_INTERVAL),
+        'batch_size': config.get('REMINDER_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        'workers': config.get('REMINDER_WORKERS', DEFAULT_WORKERS),
+        'tick': config.get('REMINDER_TICK_SECONDS', DEFAULT_TICK_SECONDS),
+        'lease_seconds': config.get('REMINDER_LEASE_SECONDS', DEFAULT_LEASE_SECONDS),
+        'coalesce_seconds': config.get('REMINDER_COALESCE_SECONDS', DEFAULT_COALESCE_SECONDS),
+        'missed_after': config.get('REMINDER_MISSED_AFTER_SECONDS', DEFAULT_MISSED_AFTER_SECONDS),
+        'catch_up': config.get('REMINDER_CATCH_UP', DEFAULT_CATCH_UP),
+        'catch_up_grace': config.get('REMINDER_CATCH_UP_GRACE_SECONDS', DEFAULT_CATCH_UP_GRACE_SECONDS)
+    }
+
+def init_app(app):
+    """Attach a dispatcher to app; it runs in-process only when REMINDER_DISPATCHER_ENABLED is set"""
+    dispatcher = ReminderDispatcher(app, **settings(app.config))
+    app.extensions['reminder_dispatcher'] = dispatcher
+    if app.config.get('REMINDER_DISPATCHER_ENABLED'):
+        dispatcher.start()
+    return dispatcher
@@ -0,0 +1,92 @@
+"""Vectorized threshold screening over a cohort's latest vitals.
+
+The cohort's latest_vitals rows are fetched as plain columns and every rule
+is evaluated as one NumPy expression over the whole cohort, instead of
+running get_health_insights() once per patient.
+"""
+import numpy as np
+
+# Numeric latest_vitals columns the rules read
+COLUMNS = [
+    'blood_sugar',
+    'blood_pressure_systolic',
+    'blood_pressure_diastolic',
+    'oxygen_level',
+    'temperature',
+]
+
+# Defaults can be overridden per request with a query parameter of the same name
+DEFAULT_THRESHOLDS = {
+    'systolic_max': 140,
+    'diastolic_max': 90,
+    'systolic_min': 90,
+    'diastolic_min': 60,
+    'fasting_sugar_max': 130,
+    'post_meal_sugar_max': 180,
+    'oxygen_min': 94,
+    'temperature_max': 38.0,
+}
+
+RULES = {
+    'high_bp': 'Blood pressure above {systolic_max:g}/{diastolic_max:g}',
+    'low_bp': 'Blood pressure below {systolic_min:g}/{diastolic_min:g}',
+    'high_fasting_sugar': 'Fasting blood sugar above {fasting_sugar_max:g} mg/dL',
+    'high_post_meal_sugar': 'Post-meal blood sugar above {post_meal_sugar_max:g} mg/dL',
+    'low_oxygen': 'Oxygen saturation below {oxygen_min:g}%',
+    'fever': 'Temperature above {temperature_max:g}°C',
+}
+
+DEFAULT_RULES = ['high_bp', 'high_fasting_sugar', 'high_post_meal_sugar', 'low_oxygen']
+
+def thresholds_from(args):
+    """Default thresholds with any numeric overrides from args applied"""
+    return {name: float(args.get(name, default)) for name, default in DEFAULT_THRESHOLDS.items()}
+
+def to_array(values):
+    """Float column with NULL readings as NaN, which compares False against every threshold"""
+    return np.array(values, dtype=np.float64)
+
+def evaluate(columns, meal, rules, thresholds):
+    """Return {rule: boolean mask over the cohort} for the requested rules.
+
+    columns maps each name in COLUMNS to a float array, meal is the
+    before_after_meal value of each patient's latest blood sugar reading.
+    """
+    sugar = columns['blood_sugar']
+    systolic = columns['blood_pressure_systolic']
+    diastolic = columns['blood_pressure_diastolic']
+    t = thresholds
+
+    masks = {}
+    for rule in rules:
+        if rule == 'high_bp':
+            mask = (systolic > t['systolic_max']) | (diastolic > t['diastolic_max'])
+        elif rule == 'low_bp':
+            mask = (systolic < t['systolic_min']) | (diastolic < t['diastolic_min'])
+        elif rule == 'high_fasting_sugar':
+            mask = (meal == 'before') & (sugar > t['fasting_sugar_max'])
+        elif rule == 'high_post_meal_sugar':
+            mask = (meal == 'after') & (sugar > t['post_meal_sugar_max'])
+        elif rule == 'low_oxygen':
+            mask = columns['oxygen_level'] < t['oxygen_min']
+        elif rule == 'fever':
+            mask = columns['temperature'] > t['temperature_max']
+        else:
+            raise ValueError(f'Unknown screening rule: {rule}')
+        masks[rule] = mask
+    return masks
+
+def screen(rows, rules, thresholds):
+    """Evaluate rules over (user_id, meal, *COLUMNS) rows.
+
+    Returns (user_ids, columns, masks) where user_ids and every column and
+    mask are parallel arrays.
+    """
+    if rows:
+        fields = list(zip(*rows))
+    else:
+        fields = [()] * (len(COLUMNS) + 2)
+    user_ids = np.array(fields[0], dtype=np.int64)
+    meal = np.array(fields[1], dtype=object)
+    columns = {name: to_array(values) for name, values in zip(COLUMNS, fields[2:])}
+    return user_ids, columns, evaluate(columns, meal, rules, thresholds)
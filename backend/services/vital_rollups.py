@@ -0,0 +1,190 @@
+"""Incrementally maintained per-day vitals aggregates.
+
+Every logged reading is folded into its (user_id, day, measurement_time)
+row of vital_daily_rollups inside the same transaction, so long-range
+stats and trends read O(days) rollup rows instead of O(readings).
+"""
+from database import db, dialect_name, upsert_insert
+from datetime import datetime
+from functools import partial
+from models.vital_rollup import VitalDailyRollup
+from models.vitals import VitalRecord
+
+UNSPECIFIED_TIME = 'unspecified'
+
+# Rollup column prefix -> VitalRecord attribute
+METRICS = [
+    ('blood_sugar', 'blood_sugar'),
+    ('systolic', 'blood_pressure_systolic'),
+    ('diastolic', 'blood_pressure_diastolic'),
+    ('weight', 'weight'),
+    ('heart_rate', 'heart_rate'),
+    ('temperature', 'temperature'),
+    ('oxygen_level', 'oxygen_level'),
+]
+
+def upsert_statement():
+    """INSERT ... ON CONFLICT DO UPDATE folding its parameters into the existing rollup row"""
+    stmt = upsert_insert(VitalDailyRollup)
+    table = VitalDailyRollup.__table__
+    new = stmt.excluded
+
+    changes = {
+        'record_count': table.c.record_count + new.record_count,
+        'updated_at': new.updated_at
+    }
+    for prefix, _ in METRICS:
+        old_min, new_min = table.c[f'{prefix}_min'], new[f'{prefix}_min']
+        old_max, new_max = table.c[f'{prefix}_max'], new[f'{prefix}_max']
+        changes[f'{prefix}_sum'] = table.c[f'{prefix}_sum'] + new[f'{prefix}_sum']
+        changes[f'{prefix}_count'] = table.c[f'{prefix}_count'] + new[f'{prefix}_count']
+        # Spelled out as CASE because SQLite's scalar min()/max() return NULL if either side is NULL
+        changes[f'{prefix}_min'] = db.case(
+            (new_min.is_(None), old_min),
+            (old_min.is_(None), new_min),
+            (new_min < old_min, new_min),
+            else_=old_min
+        )
+        changes[f'{prefix}_max'] = db.case(
+            (new_max.is_(None), old_max),
+            (old_max.is_(None), new_max),
+            (new_max > old_max, new_max),
+            else_=old_max
+        )
+
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'measurement_time'],
+        set_=changes
+    )
+
+def rollup_values(reading):
+    """Rollup row contribution of a single reading (a VitalRecord or a dict of its columns)"""
+    get = reading.get if isinstance(reading, dict) else partial(getattr, reading)
+    values = {
+        'user_id': get('user_id'),
+        'day': get('recorded_at').date(),
+        'measurement_time': get('measurement_time') or UNSPECIFIED_TIME,
+        'record_count': 1,
+        'updated_at': datetime.utcnow()
+    }
+    for prefix, attr in METRICS:
+        value = get(attr)
+        values[f'{prefix}_sum'] = value or 0
+        values[f'{prefix}_min'] = value
+        values[f'{prefix}_max'] = value
+        values[f'{prefix}_count'] = 1 if value is not None else 0
+    return values
+
+def merge_values(into, values):
+    """Combine two contributions to the same rollup row in place"""
+    into['record_count'] += values['record_count']
+    into['updated_at'] = max(into['updated_at'], values['updated_at'])
+    for prefix, _ in METRICS:
+        into[f'{prefix}_sum'] += values[f'{prefix}_sum']
+        into[f'{prefix}_count'] += values[f'{prefix}_count']
+        for suffix, pick in (('min', min), ('max', max)):
+            key = f'{prefix}_{suffix}'
+            candidates = [v for v in (into[key], values[key]) if v is not None]
+            into[key] = pick(candidates) if candidates else None
+    return into
+
+def record_vital(vital):
+    """Fold a new reading into its daily rollup; runs in the caller's transaction"""
+    db.session.execute(upsert_statement(), rollup_values(vital))
+
+def record_vitals(readings):
+    """Fold many readings into their rollups with one upsert per distinct row.
+
+    Readings sharing a (user_id, day, measurement_time) key are combined
+    first, since a single multi-row upsert may not touch the same row twice.
+    """
+    grouped = {}
+    for reading in readings:
+        values = rollup_values(reading)
+        key = (values['user_id'], values['day'], values['measurement_time'])
+        if key in grouped:
+            merge_values(grouped[key], values)
+        else:
+            grouped[key] = values
+    if grouped:
+        db.session.execute(upsert_statement(), list(grouped.values()))
+
+def day_expression(column):
+    """SQL expression for the UTC calendar day of a DateTime column"""
+    if dialect_name() == 'postgresql':
+        return db.cast(column, db.Date)
+    return db.func.date(column)
+
+def bucket_expression(group_by):
+    """SQL expression truncating VitalDailyRollup.day to its day or ISO week start"""
+    if group_by == 'week':
+        if dialect_name() == 'postgresql':
+            return db.cast(db.func.date_trunc('week', VitalDailyRollup.day), db.Date)
+        # Jump to the Sunday ending this week, then back to its Monday
+        return db.func.date(VitalDailyRollup.day, 'weekday 0', '-6 days')
+    return VitalDailyRollup.day
+
+def aggregate_columns(metrics=None):
+    """Sum rollup rows into <prefix>_average/_min/_max/_count labels plus total_records"""
+    columns = [db.func.coalesce(db.func.sum(VitalDailyRollup.record_count), 0).label('total_records')]
+    for prefix, _ in METRICS:
+        if metrics is not None and prefix not in metrics:
+            continue
+        total = db.func.sum(getattr(VitalDailyRollup, f'{prefix}_sum'))
+        count = db.func.sum(getattr(VitalDailyRollup, f'{prefix}_count'))
+        columns.extend([
+            (total / db.func.nullif(count, 0)).label(f'{prefix}_average'),
+            db.func.min(getattr(VitalDailyRollup, f'{prefix}_min')).label(f'{prefix}_min'),
+            db.func.max(getattr(VitalDailyRollup, f'{prefix}_max')).label(f'{prefix}_max'),
+            db.func.coalesce(count, 0).label(f'{prefix}_count')
+        ])
+    return columns
+
+def rebuild(user_ids=None, chunk_size=500):
+    """Recompute rollups from vital_records with set-based INSERT ... SELECT.
+
+    Works through users in chunks, each chunk in its own transaction, so a
+    full backfill never holds one huge transaction open. A full rebuild also
+    covers users that only have rollups left, so rollups of deleted readings
+    go. Returns the number of users processed.
+    """
+    if user_ids is None:
+        user_ids = list(db.session.scalars(
+            db.union(db.select(VitalRecord.user_id), db.select(VitalDailyRollup.user_id)).order_by('user_id')
+        ))
+
+    day = day_expression(VitalRecord.recorded_at)
+    slot = db.func.coalesce(VitalRecord.measurement_time, UNSPECIFIED_TIME)
+
+    select_columns = [
+        VitalRecord.user_id,
+        day,
+        slot,
+        db.func.count(VitalRecord.id),
+        db.func.current_timestamp()
+    ]
+    insert_columns = ['user_id', 'day', 'measurement_time', 'record_count', 'updated_at']
+    for prefix, attr in METRICS:
+        column = getattr(VitalRecord, attr)
+        select_columns.extend([
+            db.func.coalesce(db.func.sum(column), 0),
+            db.func.min(column),
+            db.func.max(column),
+            db.func.count(column)
+        ])
+        insert_columns.extend([f'{prefix}_sum', f'{prefix}_min', f'{prefix}_max', f'{prefix}_count'])
+
+    for i in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[i:i + chunk_size]
+        db.session.execute(db.delete(VitalDailyRollup).where(VitalDailyRollup.user_id.in_(chunk)))
+        db.session.execute(
+            db.insert(VitalDailyRollup).from_select(
+                insert_columns,
+                db.select(*select_columns)
+                .where(VitalRecord.user_id.in_(chunk))
+                .group_by(VitalRecord.user_id, day, slot)
+            )
+        )
+        db.session.commit()
+
+    return len(user_ids)
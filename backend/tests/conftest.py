@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+# Make the backend modules importable when pytest runs from the backend directory or the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from database import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'CONTENT_INDEX_ENABLED': False,
+        'NOTIFICATION_FILE': str(tmp_path / 'notifications.ndjson'),
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a user through the API and return their id"""
+    counter = iter(range(1, 10000))
+
+    def make_user(**fields):
+        i = next(counter)
+        data = {
+            'name': f'Patient {i}',
+            'email': f'patient{i}@example.org',
+            'phone': f'9{i:09d}',
+            'password': 'secret',
+            'age': 50,
+            'gender': 'female',
+            'state': 'Maharashtra',
+            'district': 'Pune',
+            'village_city': 'Village',
+            'conditions': ['diabetes'],
+        }
+        data.update(fields)
+        response = client.post('/api/auth/register', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['user_id']
+
+    return make_user
+
+
+@pytest.fixture
+def make_reminder(client):
+    """Create a daily medication reminder through the API and return its id"""
+
+    def make_reminder(user_id, **fields):
+        data = {
+            'user_id': user_id,
+            'title': 'Metformin',
+            'reminder_type': 'medication',
+            'medication_name': 'Metformin',
+            'dosage': '500mg',
+            'scheduled_time': '09:30',
+            'frequency': 'daily',
+        }
+        data.update(fields)
+        response = client.post('/api/reminders/create', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['reminder']['id']
+
+    return make_reminder
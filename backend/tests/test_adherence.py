@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+from database import db
+from models.reminder import Reminder
+from models.reminder_event import ReminderAdherence
+from services import adherence
+from services.reminder_dispatcher import fire_reminders
+
+
+def fire_due(app, reminder_ids, now):
+    with app.app_context():
+        db.session.execute(
+            db.update(Reminder).where(Reminder.id.in_(reminder_ids)).values(next_trigger=now)
+        )
+        db.session.commit()
+        fire_reminders(reminder_ids, now, coalesce_seconds=0)
+
+
+def user_adherence(client, user_id):
+    response = client.get(f'/api/reminders/adherence/{user_id}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_acknowledged_and_missed_doses_are_counted_per_medication(app, client, make_user, make_reminder):
+    user_id = make_user()
+    metformin = make_reminder(user_id)
+    amlodipine = make_reminder(user_id, title='Amlodipine', medication_name='Amlodipine')
+    now = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+
+    fire_due(app, [metformin, amlodipine], now)
+    assert client.post(f'/api/reminders/{metformin}/acknowledge').status_code == 200
+    # A double tap records one acknowledgement
+    assert client.post(f'/api/reminders/{metformin}/acknowledge').status_code == 409
+    # Amlodipine fires again while its last dose is still pending: that dose was missed
+    fire_due(app, [metformin, amlodipine], now + timedelta(hours=1))
+
+    body = user_adherence(client, user_id)
+    overall = body['adherence']
+    assert (overall['fired'], overall['acknowledged'], overall['missed']) == (4, 1, 1)
+    assert overall['adherence_percent'] == 50.0
+    by_medication = {row['medication']: row for row in body['medications']}
+    assert by_medication['Metformin']['adherence_percent'] == 100.0
+    assert by_medication['Amlodipine']['adherence_percent'] == 0.0
+
+
+def test_doses_pending_past_the_cutoff_are_marked_missed(app, client, make_user, make_reminder):
+    user_id = make_user()
+    reminder_id = make_reminder(user_id)
+    fired_at = datetime.utcnow().replace(microsecond=0) - timedelta(hours=5)
+    fire_due(app, [reminder_id], fired_at)
+
+    with app.app_context():
+        assert adherence.mark_missed(fired_at + timedelta(hours=1), missed_after=4 * 3600) == 0
+        assert adherence.mark_missed(fired_at + timedelta(hours=4), missed_after=4 * 3600) == 1
+        assert db.session.get(Reminder, reminder_id).pending_occurrence is None
+
+    assert user_adherence(client, user_id)['adherence']['missed'] == 1
+    assert client.post(f'/api/reminders/{reminder_id}/acknowledge').status_code == 409
+
+
+def test_rebuild_matches_the_incremental_rollups(app, client, make_user, make_reminder):
+    user_id = make_user()
+    reminder_ids = [make_reminder(user_id), make_reminder(user_id, title='Amlodipine', medication_name='Amlodipine')]
+    now = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    fire_due(app, reminder_ids, now)
+    client.post(f'/api/reminders/{reminder_ids[0]}/acknowledge')
+    fire_due(app, reminder_ids, now + timedelta(hours=1))
+
+    def rollups():
+        return sorted(
+            (row.medication, row.fired_count, row.delivered_count, row.acknowledged_count, row.missed_count)
+            for row in db.session.scalars(db.select(ReminderAdherence))
+        )
+
+    with app.app_context():
+        incremental = rollups()
+        assert adherence.rebuild() == 1
+        assert rollups() == incremental
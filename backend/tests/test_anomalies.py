@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models.vital_baseline import VitalAnomaly, VitalBaseline
+from services import anomalies
+
+
+def log_batch(client, user_id, values, start):
+    response = client.post('/api/vitals/log-batch', json=[
+        dict(value, user_id=user_id, recorded_at=(start + timedelta(hours=i)).isoformat())
+        for i, value in enumerate(values)
+    ])
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def test_drop_against_the_patients_own_baseline_is_flagged(client, make_user):
+    user_id = make_user()
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=2)
+    steady = [{'oxygen_level': level} for level in (97, 98, 97, 98, 97, 98)]
+    assert log_batch(client, user_id, steady, start)['anomalies'] == []
+
+    # Still above the usual 90% alarm, but far below this patient's normal
+    body = log_batch(client, user_id, [{'oxygen_level': 92}, {'oxygen_level': 100}], start + timedelta(hours=6))
+
+    (flagged,) = body['anomalies']
+    assert flagged['metric'] == 'oxygen_level' and flagged['direction'] == 'low'
+    assert flagged['z_score'] <= -3
+    listed = client.get(f'/api/vitals/user/{user_id}/anomalies').get_json()
+    assert [anomaly['metric'] for anomaly in listed['anomalies']] == ['oxygen_level']
+
+
+def test_nothing_is_flagged_before_the_baseline_has_enough_samples(client, make_user):
+    user_id = make_user()
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+    body = log_batch(client, user_id, [{'heart_rate': rate} for rate in (70, 72, 71, 140)], start)
+    assert body['anomalies'] == []
+
+
+def test_replay_rebuilds_the_baselines_and_anomalies_of_the_write_path(app, client, make_user):
+    user_id = make_user()
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=2)
+    log_batch(client, user_id, [{'blood_sugar': value} for value in (100, 104, 98, 102, 101, 99, 190)], start)
+
+    def snapshot():
+        baselines = db.session.execute(
+            db.select(VitalBaseline.metric, VitalBaseline.count, VitalBaseline.mean)).all()
+        flagged = db.session.execute(db.select(VitalAnomaly.vital_id, VitalAnomaly.z_score)).all()
+        return sorted(baselines), sorted(flagged)
+
+    with app.app_context():
+        streamed = snapshot()
+        assert streamed[0] == [('blood_sugar', 7, pytest.approx(794 / 7))]
+        assert len(streamed[1]) == 1
+
+        assert anomalies.replay() == (1, 7)
+        assert snapshot() == streamed
+
+
+def test_anomaly_listing_rejects_unknown_metrics_and_bad_limits(client, make_user):
+    url = f'/api/vitals/user/{make_user()}/anomalies'
+    assert client.get(f'{url}?metric=oxygen').status_code == 400
+    for limit in [0, -1, 1001]:
+        assert client.get(f'{url}?limit={limit}').status_code == 400
+    assert client.get(f'{url}?metric=oxygen_level&limit=1000').status_code == 200
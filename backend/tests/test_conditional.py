@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+
+def log_vital(client, user_id, **fields):
+    response = client.post('/api/vitals/log-batch', json=[dict({'user_id': user_id, 'blood_sugar': 110}, **fields)])
+    assert response.status_code == 201, response.get_json()
+
+
+def fetch(client, url, **headers):
+    return client.get(url, headers=headers)
+
+
+def test_unchanged_list_revalidates_with_an_empty_304(client, make_user):
+    user_id = make_user()
+    log_vital(client, user_id)
+    url = f'/api/vitals/user/{user_id}'
+
+    first = fetch(client, url)
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    revalidated = fetch(client, url, **{'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == first.headers['ETag']
+
+    since = fetch(client, url, **{'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+
+def test_new_row_gives_a_new_etag(client, make_user):
+    user_id = make_user()
+    log_vital(client, user_id)
+    url = f'/api/vitals/user/{user_id}'
+    etag = fetch(client, url).headers['ETag']
+
+    log_vital(client, user_id, recorded_at=(datetime.utcnow() - timedelta(minutes=1)).isoformat())
+
+    changed = fetch(client, url, **{'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['count'] == 2
+    assert changed.headers['ETag'] != etag
+
+
+def test_etag_covers_the_query_string(client, make_user):
+    user_id = make_user()
+    log_vital(client, user_id)
+    etag = fetch(client, f'/api/vitals/user/{user_id}?limit=10').headers['ETag']
+
+    assert fetch(client, f'/api/vitals/user/{user_id}?limit=20', **{'If-None-Match': etag}).status_code == 200
+
+
+def test_deleted_row_changes_the_etag_through_the_count(client, make_user, make_reminder):
+    user_id = make_user()
+    make_reminder(user_id)
+    deleted = make_reminder(user_id, scheduled_time='21:00')
+    url = f'/api/reminders/user/{user_id}'
+    etag = fetch(client, url).headers['ETag']
+
+    assert client.delete(f'/api/reminders/{deleted}').status_code == 200
+
+    changed = fetch(client, url, **{'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['count'] == 1
+
+
+def test_updated_row_is_a_new_version(client, make_user, make_reminder):
+    user_id = make_user()
+    reminder_id = make_reminder(user_id)
+    url = f'/api/reminders/user/{user_id}'
+    etag = fetch(client, url).headers['ETag']
+
+    response = client.put(f'/api/reminders/{reminder_id}', json={'dosage': '850mg'})
+    assert response.status_code == 200, response.get_json()
+
+    changed = fetch(client, url, **{'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['reminders'][0]['dosage'] == '850mg'
+
+
+def test_single_content_item_and_categories_revalidate(client):
+    response = client.post('/api/health-feed/content', json={
+        'title': 'Walk after meals', 'content': 'Ten minutes helps.', 'content_type': 'tip',
+        'condition': 'diabetes', 'category': 'exercise', 'language': 'hindi',
+    })
+    content_id = response.get_json()['content']['id']
+
+    for url in [f'/api/health-feed/content/{content_id}', '/api/health-feed/categories']:
+        etag = fetch(client, url).headers['ETag']
+        assert fetch(client, url, **{'If-None-Match': etag}).status_code == 304
+
+    etag = fetch(client, f'/api/health-feed/content/{content_id}').headers['ETag']
+    client.put(f'/api/health-feed/content/{content_id}', json={'category': 'diet'})
+    changed = fetch(client, f'/api/health-feed/content/{content_id}', **{'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['content']['category'] == 'diet'
+
+
+def test_cached_personalized_feed_revalidates(client, make_user):
+    user_id = make_user()
+    client.post('/api/health-feed/content', json={
+        'title': 'Walk after meals', 'content': 'Ten minutes helps.', 'content_type': 'tip',
+        'condition': 'diabetes', 'category': 'exercise', 'language': 'hindi',
+    })
+    url = f'/api/health-feed/user/{user_id}'
+    etag = fetch(client, url).headers['ETag']
+
+    # Served from the feed cache, which keeps the validator alongside the feed
+    assert fetch(client, url, **{'If-None-Match': etag}).status_code == 304
+    assert fetch(client, url, **{'If-None-Match': '"something-else"'}).status_code == 200
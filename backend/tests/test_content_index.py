@@ -0,0 +1,84 @@
+import pytest
+
+from services.content_index import ContentIndex, normalize, transliteration_key
+
+
+def create_content(client, title, content, language='hindi', condition='diabetes', tags=()):
+    response = client.post('/api/health-feed/content', json={
+        'title': title, 'content': content, 'content_type': 'article', 'condition': condition,
+        'category': 'diet', 'language': language, 'tags': list(tags)
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['content']['id']
+
+
+@pytest.fixture
+def index(app):
+    """A built index attached to app, as init_app leaves it after the first request"""
+    index = ContentIndex()
+    app.extensions['content_index'] = index
+    with app.app_context():
+        index.build()
+    return index
+
+
+def search(client, q, language='hindi', **params):
+    response = client.get('/api/health-feed/search', query_string=dict(params, q=q, language=language))
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['ranking'] == 'memory'
+    return [result['id'] for result in body['results']]
+
+
+@pytest.mark.parametrize('variant, word', [
+    ('ज़रूरी', 'जरुरी'),  # nukta and long u
+    ('हिँदी', 'हिंदी'),  # chandrabindu and anusvara
+    ('Insulin', 'insulin'),
+])
+def test_spelling_variants_normalize_alike(variant, word):
+    assert normalize(variant) == normalize(word)
+
+
+@pytest.mark.parametrize('latin, native', [('madhumeh', 'मधुमेह'), ('neerizhivu', 'நீரிழிவு')])
+def test_latin_and_indic_spellings_share_a_transliteration_key(latin, native):
+    assert transliteration_key(normalize(latin)) == transliteration_key(normalize(native))
+
+
+def test_search_ranks_in_memory_and_matches_transliterations(client, index):
+    in_title = create_content(client, 'मधुमेह में आहार', 'रोज़ सब्ज़ियाँ खाएँ')
+    in_body = create_content(client, 'रोज़ का आहार', 'मधुमेह के रोगी मीठा कम खाएँ')
+    create_content(client, 'योग', 'सुबह टहलें')
+
+    assert search(client, 'मधुमेह') == [in_title, in_body]
+    assert search(client, 'madhumeh') == [in_title, in_body]
+    # Every word must match
+    assert search(client, 'मधुमेह मीठा') == [in_body]
+    assert search(client, 'मधुमेह', condition='hypertension') == []
+    assert search(client, 'मधुमेह', language='english') == []
+
+
+def test_writes_in_this_worker_are_searchable_at_once(client, index):
+    content_id = create_content(client, 'Insulin storage', 'Keep it cool.', language='english')
+    assert search(client, 'insulin', language='english') == [content_id]
+
+    client.put(f'/api/health-feed/content/{content_id}', json={'title': 'Pen storage'})
+    assert search(client, 'insulin', language='english') == []
+    assert search(client, 'pen', language='english') == [content_id]
+
+    client.put(f'/api/health-feed/content/{content_id}', json={'is_active': False})
+    assert search(client, 'pen', language='english') == []
+    assert index.stats()['documents'] == 0
+
+
+def test_other_workers_pick_up_changes_on_refresh(app, client, index):
+    content_id = create_content(client, 'Insulin storage', 'Keep it cool.', language='english')
+    other = ContentIndex(refresh_seconds=0)
+    with app.app_context():
+        other.build()
+        assert [data['id'] for data, _, _ in other.search('insulin', 'english')] == [content_id]
+
+    client.put(f'/api/health-feed/content/{content_id}', json={'is_active': False})
+
+    with app.app_context():
+        assert other.refresh_if_stale() == 1
+        assert other.search('insulin', 'english') == []
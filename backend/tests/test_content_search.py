@@ -0,0 +1,34 @@
+from models.health_content import HealthContent
+from services import content_search
+
+
+def create_content(client, title, content, tags):
+    response = client.post('/api/health-feed/content', json={
+        'title': title, 'content': content, 'content_type': 'article', 'condition': 'diabetes',
+        'category': 'medication', 'language': 'english', 'tags': tags
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['content']['id']
+
+
+def test_search_ranks_title_then_tags_then_body(client):
+    in_body = create_content(client, 'Taking your medicines', 'Store insulin in a cool place.', ['storage'])
+    in_tags = create_content(client, 'Morning routine', 'Check sugar before breakfast.', ['insulin', 'routine'])
+    in_title = create_content(client, 'Insulin basics', 'How the pen works.', ['pens'])
+    create_content(client, 'Walking', 'Thirty minutes a day.', ['exercise'])
+
+    body = client.get('/api/health-feed/search?q=insulin&language=english').get_json()
+
+    assert body['ranking'] == 'bm25'
+    assert [result['id'] for result in body['results']] == [in_title, in_tags, in_body]
+
+
+def test_postgres_search_vector_covers_the_fts5_columns_in_weight_order():
+    (index,) = [index for index in HealthContent.__table__.indexes if index.name == 'ix_health_content_search']
+    expression = str(index.expressions[0])
+
+    assert expression == f'({content_search.SEARCH_VECTOR})'
+    # title, content, tags on SQLite, weighted 10, 1 and 5
+    assert content_search.COLUMN_WEIGHTS == (10.0, 1.0, 5.0)
+    for column, weight in [('title', 'A'), ('tags', 'B'), ('content', 'C')]:
+        assert f"coalesce({column}, '')), '{weight}')" in expression
@@ -0,0 +1,92 @@
+import pytest
+
+from services import content_snapshot
+from services.content_snapshot import ContentSnapshots
+
+CONTENT = [
+    ('Sugar targets', 'diabetes', 'diet', 'tip', 'hindi', 1),
+    ('Salt and BP', 'hypertension', 'diet', 'article', 'hindi', 2),
+    ('Drink water', 'general', 'lifestyle', 'tip', 'hindi', 2),
+    ('Foot care', 'diabetes', 'lifestyle', 'article', 'hindi', 3),
+    ('Sleep well', 'general', 'lifestyle', 'tip', 'english', 1),
+    ('Insulin pens', 'diabetes', 'medication', 'video', 'hindi', 1),
+]
+
+
+@pytest.fixture
+def contents(client):
+    ids = []
+    for title, condition, category, content_type, language, priority in CONTENT:
+        response = client.post('/api/health-feed/content', json={
+            'title': title, 'content': f'{title}.', 'condition': condition, 'category': category,
+            'content_type': content_type, 'language': language, 'priority': priority, 'tags': ['care'],
+        })
+        assert response.status_code == 201, response.get_json()
+        ids.append(response.get_json()['content']['id'])
+    return ids
+
+
+def use_snapshot(app, tmp_path):
+    """Build a snapshot and serve reads from it, as init_app does once the file exists"""
+    snapshots = ContentSnapshots(str(tmp_path / 'content.snapshot'), check_seconds=0)
+    with app.app_context():
+        snapshots.build(content_snapshot.compact_dumps(app))
+    app.extensions['content_snapshot'] = snapshots
+    return snapshots
+
+
+@pytest.mark.parametrize('conditions, query', [
+    (['diabetes'], ''),
+    (['diabetes', 'hypertension'], '?limit=3'),
+    ([], ''),
+    (['diabetes'], '?category=lifestyle'),
+    (['diabetes'], '?content_type=tip&limit=1'),
+    (['diabetes'], '?category=unknown'),
+])
+def test_snapshot_feed_matches_the_database_feed(app, client, tmp_path, make_user, contents, conditions, query):
+    user_id = make_user(conditions=conditions)
+    url = f'/api/health-feed/user/{user_id}{query}'
+    from_database = client.get(url).get_json()
+
+    snapshots = use_snapshot(app, tmp_path)
+    from_snapshot = client.get(url).get_json()
+
+    assert from_snapshot == from_database
+    assert snapshots.counts['feeds'] == 1
+
+
+def test_snapshot_serves_items_by_id_and_leaves_inactive_ones_to_the_database(app, client, tmp_path, contents):
+    from_database = [client.get(f'/api/health-feed/content/{content_id}').get_json() for content_id in contents]
+    client.put(f'/api/health-feed/content/{contents[0]}', json={'is_active': False})
+    snapshots = use_snapshot(app, tmp_path)
+
+    for content_id, expected in list(zip(contents, from_database))[1:]:
+        assert client.get(f'/api/health-feed/content/{content_id}').get_json() == expected
+    assert snapshots.counts['items'] == len(contents) - 1
+    # Not in the snapshot: answered from the database
+    assert client.get(f'/api/health-feed/content/{contents[0]}').get_json()['content']['is_active'] is False
+
+
+def test_snapshot_feed_revalidates(app, client, tmp_path, make_user, contents):
+    user_id = make_user()
+    use_snapshot(app, tmp_path)
+    etag = client.get(f'/api/health-feed/user/{user_id}').headers['ETag']
+
+    assert client.get(f'/api/health-feed/user/{user_id}', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_a_new_generation_replaces_the_mapping_and_a_bad_file_keeps_the_last_one(app, tmp_path, contents):
+    snapshots = use_snapshot(app, tmp_path)
+    first = snapshots.current()
+    assert first.metadata['items'] == len(contents)
+
+    with app.app_context():
+        metadata = snapshots.build(content_snapshot.compact_dumps(app))
+    assert snapshots.current().generation == metadata['generation'] > first.generation
+    # The earlier mapping stays readable for requests still holding it
+    assert first.content(contents[0]) is not None
+
+    with open(snapshots.path, 'wb') as f:
+        f.write(b'not a snapshot')
+    assert snapshots.current().generation == metadata['generation']
+    assert snapshots.counts['errors'] == 1
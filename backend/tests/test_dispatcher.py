@@ -0,0 +1,182 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models.notification import NotificationOutbox
+from models.reminder import Reminder
+from models.reminder_event import ReminderEvent
+from services.reminder_dispatcher import ReminderDispatcher, fire_reminders
+
+
+def set_next_triggers(app, next_triggers):
+    with app.app_context():
+        for reminder_id, next_trigger in next_triggers.items():
+            db.session.get(Reminder, reminder_id).next_trigger = next_trigger
+        db.session.commit()
+
+
+def test_reminders_due_close_together_are_fired_as_one_message(app, make_user, make_reminder):
+    patient, other = make_user(), make_user()
+    due, soon, later = (make_reminder(patient, title=title, medication_name=title)
+                        for title in ('Metformin', 'Amlodipine', 'Atorvastatin'))
+    other_due = make_reminder(other)
+    now = datetime.utcnow().replace(microsecond=0)
+    set_next_triggers(app, {
+        due: now - timedelta(minutes=1),
+        soon: now + timedelta(minutes=3),
+        later: now + timedelta(minutes=20),
+        other_due: now,
+    })
+
+    with app.app_context():
+        fired, notifications = fire_reminders([due, other_due], now, coalesce_seconds=300)
+
+        assert sorted(reminder_id for reminder_id, _, _ in fired) == sorted([due, soon, other_due])
+        assert notifications == 2
+        messages = {row.user_id: row for row in db.session.scalars(db.select(NotificationOutbox))}
+        assert messages[patient].reminder_count == 2
+        assert sorted(json.loads(messages[patient].reminder_ids)) == sorted([due, soon])
+        assert 'Metformin' in messages[patient].message and 'Amlodipine' in messages[patient].message
+        assert messages[other].reminder_count == 1
+
+        # The companion fired early advances past its own occurrence, not just past now
+        companion = db.session.get(Reminder, soon)
+        assert companion.pending_occurrence == now + timedelta(minutes=3)
+        assert companion.next_trigger > now + timedelta(minutes=3)
+        assert db.session.get(Reminder, later).next_trigger == now + timedelta(minutes=20)
+        fired_events = db.session.scalars(
+            db.select(ReminderEvent.reminder_id).where(ReminderEvent.event_type == 'fired')).all()
+        assert sorted(fired_events) == sorted([due, soon, other_due])
+
+
+def test_without_a_window_only_the_due_reminder_fires(app, make_user, make_reminder):
+    patient = make_user()
+    due, soon = make_reminder(patient), make_reminder(patient)
+    now = datetime.utcnow().replace(microsecond=0)
+    set_next_triggers(app, {due: now, soon: now + timedelta(minutes=3)})
+
+    with app.app_context():
+        fired, notifications = fire_reminders([due, soon], now, coalesce_seconds=0)
+
+        assert [reminder_id for reminder_id, _, _ in fired] == [due]
+        assert notifications == 1
+        assert db.session.get(Reminder, soon).next_trigger == now + timedelta(minutes=3)
+
+
+@pytest.fixture
+def outage(app, make_user, make_reminder):
+    """Reminders as a dispatcher finds them after downtime: long overdue, just overdue and upcoming"""
+    now = datetime.utcnow().replace(microsecond=0)
+    reminders = {
+        'long_overdue': make_reminder(make_user()),
+        'just_overdue': make_reminder(make_user()),
+        'upcoming': make_reminder(make_user()),
+    }
+    set_next_triggers(app, {
+        reminders['long_overdue']: now - timedelta(hours=2),
+        reminders['just_overdue']: now - timedelta(minutes=5),
+        reminders['upcoming']: now + timedelta(seconds=30),
+    })
+    return now, reminders
+
+
+def rehydrate(app, now, catch_up):
+    dispatcher = ReminderDispatcher(app, catch_up=catch_up, catch_up_grace=900, horizon=60, coalesce_seconds=0)
+    dispatcher.executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        return dispatcher, dispatcher.rehydrate(now)
+    finally:
+        dispatcher.executor.shutdown()
+
+
+def test_catch_up_fires_reminders_missed_beyond_the_grace_period(app, outage):
+    now, reminders = outage
+    dispatcher, counts = rehydrate(app, now, 'fire')
+
+    assert counts == {'caught_up': 1, 'skipped': 0, 'loaded': 2}
+    with app.app_context():
+        assert db.session.scalars(db.select(NotificationOutbox.reminder_id)).all() == [reminders['long_overdue']]
+        assert db.session.get(Reminder, reminders['long_overdue']).next_trigger > now
+    # Within the grace period and the horizon, reminders wait in the heap to fire as usual
+    assert sorted(dispatcher.scheduled) == sorted([reminders['just_overdue'], reminders['upcoming']])
+
+
+def test_catch_up_skip_advances_missed_reminders_without_notifying(app, outage):
+    now, reminders = outage
+    dispatcher, counts = rehydrate(app, now, 'skip')
+
+    assert counts == {'caught_up': 0, 'skipped': 1, 'loaded': 2}
+    assert dispatcher.stats.to_dict()['skipped'] == 1
+    with app.app_context():
+        skipped = db.session.get(Reminder, reminders['long_overdue'])
+        assert skipped.next_trigger > now
+        assert skipped.last_triggered is None
+        assert db.session.scalar(db.select(db.func.count()).select_from(NotificationOutbox)) == 0
+        assert db.session.scalar(db.select(db.func.count()).select_from(ReminderEvent)) == 0
+
+
+def test_unknown_catch_up_policy_is_rejected(app):
+    with pytest.raises(ValueError):
+        ReminderDispatcher(app, catch_up='replay')
+
+
+def test_poll_loads_only_the_horizon_in_keyset_pages(app, make_user, make_reminder):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    soon = [make_reminder(user_id) for _ in range(5)]
+    later = make_reminder(user_id)
+    # Three share one next_trigger, so a page of two breaks inside the tie
+    next_triggers = {reminder_id: now + timedelta(seconds=10) for reminder_id in soon[:3]}
+    next_triggers.update({
+        soon[3]: now + timedelta(seconds=5),
+        soon[4]: now + timedelta(seconds=50),
+        later: now + timedelta(minutes=5),
+    })
+    set_next_triggers(app, next_triggers)
+    dispatcher = ReminderDispatcher(app, horizon=60, batch_size=2)
+
+    assert dispatcher.poll(now) == 5
+    assert sorted(dispatcher.scheduled) == sorted(soon)
+    assert dispatcher.take_due(now + timedelta(seconds=10)) == [soon[3]] + sorted(soon[:3])
+
+
+def test_rescheduled_and_deleted_reminders_leave_stale_heap_entries(app):
+    dispatcher = ReminderDispatcher(app)
+    now = datetime.utcnow()
+    dispatcher.loaded_until = now + timedelta(seconds=60)
+    dispatcher.schedule_many([(1, now), (2, now), (3, now)])
+
+    dispatcher.schedule(1, now + timedelta(seconds=30))
+    dispatcher.unschedule(2)
+    # Beyond the loaded window: left for the next poll
+    dispatcher.schedule(3, now + timedelta(minutes=5))
+
+    assert dispatcher.take_due(now) == []
+    assert dispatcher.take_due(now + timedelta(seconds=30)) == [1]
+    assert dispatcher.in_flight == {1}
+    # Not queued again while a batch is firing it
+    dispatcher.schedule(1, now)
+    assert dispatcher.take_due(now + timedelta(seconds=30)) == []
+
+
+def test_running_dispatcher_fires_due_reminders(app, make_user, make_reminder):
+    user_id = make_user()
+    reminder_id = make_reminder(user_id)
+    set_next_triggers(app, {reminder_id: datetime.utcnow() + timedelta(seconds=1)})
+    dispatcher = ReminderDispatcher(app, poll_interval=0.2, horizon=5, coalesce_seconds=0)
+
+    dispatcher.start()
+    try:
+        deadline = datetime.utcnow() + timedelta(seconds=10)
+        while not dispatcher.stats.to_dict()['fired'] and datetime.utcnow() < deadline:
+            time.sleep(0.05)
+    finally:
+        dispatcher.stop()
+
+    with app.app_context():
+        assert db.session.scalars(db.select(NotificationOutbox.reminder_id)).all() == [reminder_id]
+        assert db.session.get(Reminder, reminder_id).next_trigger > datetime.utcnow()
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from services.downsampling import lttb, minmax
+
+
+def series(n):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 10)
+    y[n // 3] = 5.0  # a spike the chart must keep
+    return x, y
+
+
+def test_lttb_keeps_the_ends_and_the_spike():
+    x, y = series(1000)
+    selected = lttb(x, y, 50)
+
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+    assert 1000 // 3 in selected
+
+
+def test_minmax_keeps_each_buckets_extremes_in_order():
+    x, y = series(1000)
+    selected = minmax(x, y, 50)
+
+    assert len(selected) <= 50
+    assert np.all(np.diff(selected) > 0)
+    assert np.argmax(y) in selected and np.argmin(y) in selected
+
+
+def test_short_series_are_returned_whole():
+    x, y = series(10)
+    assert lttb(x, y, 10).tolist() == minmax(x, y, 20).tolist() == list(range(10))
+
+
+def test_series_endpoint_downsamples_a_metric(client, make_user):
+    user_id = make_user()
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=10)
+    response = client.post('/api/vitals/log-batch', json=[
+        {'user_id': user_id, 'blood_sugar': 100 + i % 7, 'recorded_at': (start + timedelta(hours=i)).isoformat()}
+        for i in range(100)
+    ])
+    assert response.status_code == 201, response.get_json()
+
+    body = client.get(f'/api/vitals/user/{user_id}/series?metric=blood_sugar&points=20').get_json()
+
+    assert body['source_points'] == 100
+    assert body['points'] == len(body['timestamps']) == len(body['values']) == 20
+    # Epoch milliseconds of the stored UTC times
+    assert body['timestamps'][0] == int(start.replace(tzinfo=timezone.utc).timestamp()) * 1000
+    assert body['timestamps'] == sorted(body['timestamps'])
+
+
+def test_series_endpoint_validates_its_parameters(client, make_user):
+    user_id = make_user()
+    url = f'/api/vitals/user/{user_id}/series'
+    assert client.get(f'{url}?metric=notes').status_code == 400
+    assert client.get(f'{url}?metric=blood_sugar&points=2').status_code == 400
+    assert client.get(f'{url}?metric=blood_sugar&method=mean').status_code == 400
+    assert client.get(f'{url}?metric=blood_sugar').get_json()['source_points'] == 0
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from app import create_app
+from database import db
+from models.stream_event import StreamEvent
+from services import events
+
+
+@pytest.fixture
+def other_worker(app):
+    """A second app on the same database, as another gunicorn worker would be"""
+    worker = create_app(dict(app.config))
+    yield worker
+    worker.extensions['event_feed'].stop()
+    with worker.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def log_vitals(client, user_id, blood_sugar):
+    response = client.post('/api/vitals/log', json={'user_id': user_id, 'blood_sugar': blood_sugar})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['vital_id']
+
+
+def test_vitals_logged_on_one_worker_reach_streams_on_another(client, make_user, other_worker):
+    user_id = make_user()
+    with other_worker.app_context():
+        hub = other_worker.extensions['event_hub']
+        feed = other_worker.extensions['event_feed']
+        feed.skip_history()
+        subscription = hub.subscribe(user_id)
+
+    vital_id = log_vitals(client, user_id, 180)
+
+    with other_worker.app_context():
+        assert feed.poll() == 1
+    (event,) = subscription.drain()
+    event_id, event_user_id, event_type, data = event
+    assert (event_user_id, event_type) == (user_id, 'vitals')
+    assert json.loads(data)['vital']['id'] == vital_id
+    assert events.format_event(event).startswith(f'id: {event_id}\nevent: vitals\n')
+
+
+def test_reconnect_resumes_from_last_event_id_on_a_fresh_worker(client, make_user, other_worker):
+    user_id = make_user()
+    first = log_vitals(client, user_id, 110)
+    second = log_vitals(client, user_id, 120)
+    third = log_vitals(client, user_id, 130)
+    with other_worker.app_context():
+        event_ids = db.session.scalars(db.select(StreamEvent.id).order_by(StreamEvent.id)).all()
+        subscription = events.subscribe(other_worker, user_id, last_event_id=event_ids[0])
+
+    replayed = [json.loads(data)['vital']['id'] for _, _, _, data in subscription.drain()]
+    assert replayed == [second, third]
+    assert first not in replayed
+
+    # The feed started from the newest event, so the replayed ones are not sent twice
+    with other_worker.app_context():
+        other_worker.extensions['event_feed'].poll()
+    assert subscription.drain() == []
+
+
+def test_feed_waits_for_ids_committed_late_and_skips_abandoned_ones(app, make_user):
+    user_id = make_user()
+    hub = events.EventHub()
+    feed = events.EventFeed(app, hub, gap_seconds=3600)
+    subscription = hub.subscribe(user_id)
+
+    def commit_event(event_id):
+        db.session.add(StreamEvent(id=event_id, user_id=user_id, event_type='vitals', data='{}'))
+        db.session.commit()
+
+    with app.app_context():
+        feed.skip_history()
+        commit_event(1)
+        commit_event(3)
+        assert feed.poll() == 2
+        assert (feed.watermark, sorted(feed.gaps)) == (1, [2])
+
+        # Id 2 was allocated before 3 but committed after it was delivered
+        commit_event(2)
+        assert feed.poll() == 1
+        assert (feed.watermark, feed.gaps) == (3, {})
+        assert feed.counts['late'] == 1
+
+        # Id 4 never commits
+        commit_event(5)
+        assert feed.poll() == 1
+        assert feed.watermark == 3
+        feed.gap_seconds = 0
+        assert feed.poll() == 0
+        assert feed.watermark == 5
+        assert feed.counts['skipped'] == 1
+
+    assert [event[0] for event in subscription.drain()] == [1, 3, 2, 5]
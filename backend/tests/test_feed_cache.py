@@ -0,0 +1,98 @@
+from services.feed_cache import FeedCache, LRUCache, feed_key
+
+
+def add_content(client, title, language='hindi', condition='diabetes'):
+    response = client.post('/api/health-feed/content', json={
+        'title': title, 'content': f'{title} content', 'content_type': 'tip',
+        'condition': condition, 'category': 'diet', 'language': language,
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['content']['id']
+
+
+def feed(client, user_id):
+    response = client.get(f'/api/health-feed/user/{user_id}')
+    assert response.status_code == 200, response.get_json()
+    return [item['title'] for item in response.get_json()['content']]
+
+
+def feed_stats(client):
+    return client.get('/api/health-feed/cache/stats').get_json()
+
+
+def test_users_of_a_segment_share_one_cached_feed(client, make_user):
+    add_content(client, 'Walk after meals')
+    first, second = make_user(), make_user()
+
+    assert feed(client, first) == feed(client, second) == ['Walk after meals']
+    stats = feed_stats(client)
+    assert stats['feeds']['hits'] == 1 and stats['feeds']['size'] == 1
+
+
+def test_content_in_the_segment_invalidates_its_feed(client, make_user):
+    user_id = make_user()
+    add_content(client, 'Walk after meals')
+    assert feed(client, user_id) == ['Walk after meals']
+
+    added = add_content(client, 'Check your feet')
+    assert sorted(feed(client, user_id)) == ['Check your feet', 'Walk after meals']
+
+    # Moving content out of the segment drops it from the cached feed as well
+    response = client.put(f'/api/health-feed/content/{added}', json={'condition': 'asthma'})
+    assert response.status_code == 200, response.get_json()
+    assert feed(client, user_id) == ['Walk after meals']
+
+
+def test_content_for_other_segments_keeps_the_feed_cached(client, make_user):
+    user_id = make_user()
+    add_content(client, 'Walk after meals')
+    feed(client, user_id)
+
+    add_content(client, 'Use your inhaler', condition='asthma')
+    add_content(client, 'Walk after meals', language='english')
+
+    assert feed(client, user_id) == ['Walk after meals']
+    stats = feed_stats(client)
+    assert stats['invalidated'] == 0 and stats['feeds']['hits'] == 1
+
+
+def test_profile_update_moves_the_user_to_their_new_segment(client, make_user):
+    user_id = make_user()
+    add_content(client, 'Walk after meals')
+    add_content(client, 'Use your inhaler', language='english', condition='asthma')
+    assert feed(client, user_id) == ['Walk after meals']
+
+    response = client.put(f'/api/auth/users/{user_id}',
+                          json={'preferred_language': 'english', 'conditions': ['asthma']})
+    assert response.status_code == 200, response.get_json()
+    assert feed(client, user_id) == ['Use your inhaler']
+
+
+def test_feed_read_during_an_invalidation_is_not_cached():
+    cache = FeedCache(size=8, users=8, ttl=60)
+    key = feed_key('hindi', ['diabetes'])
+    generation = cache.generation
+    cache.invalidate([('hindi', 'diabetes')])
+
+    cache.store(key, 'stale', generation)
+    assert cache.feed(key) is None
+    cache.store(key, 'fresh', cache.generation)
+    assert cache.feed(key) == 'fresh'
+
+
+def test_feed_key_ignores_condition_order():
+    assert feed_key('hindi', ['diabetes', 'hypertension']) == feed_key('hindi', ['hypertension', 'diabetes'])
+
+
+def test_entries_expire_after_the_ttl_and_evict_least_recently_used():
+    now = [0.0]
+    cache = LRUCache(2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+
+    now[0] = 10.0
+    assert cache.get('a') is None and cache.get('c') is None
+    assert cache.stats()['evictions'] == 1 and cache.stats()['expirations'] == 2
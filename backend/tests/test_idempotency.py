@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from database import db
+from models.idempotency_key import IdempotencyKey
+from models.vitals import VitalRecord
+from services import vital_rollups
+
+
+def log_vitals(client, user_id, key, blood_sugar=110):
+    return client.post('/api/vitals/log', json={'user_id': user_id, 'blood_sugar': blood_sugar},
+                       headers={'Idempotency-Key': key})
+
+
+def count_vitals(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count()).select_from(VitalRecord))
+
+
+def test_retry_replays_the_stored_response(app, client, make_user):
+    user_id = make_user()
+    first = log_vitals(client, user_id, 'key-1')
+    retry = log_vitals(client, user_id, 'key-1')
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['vital_id'] == first.get_json()['vital_id']
+    assert count_vitals(app) == 1
+
+    reused = log_vitals(client, user_id, 'key-1', blood_sugar=150)
+    assert reused.status_code == 422
+    assert count_vitals(app) == 1
+
+
+def test_server_error_releases_the_key_for_a_retry(app, client, make_user, monkeypatch):
+    user_id = make_user()
+
+    def fail(vital):
+        raise RuntimeError('database hiccup')
+
+    monkeypatch.setattr(vital_rollups, 'record_vital', fail)
+    assert log_vitals(client, user_id, 'key-1').status_code == 500
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(IdempotencyKey)) == 0
+
+    monkeypatch.undo()
+    retry = log_vitals(client, user_id, 'key-1')
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert count_vitals(app) == 1
+
+
+def test_in_flight_key_blocks_retries_until_it_is_abandoned(app, client, make_user):
+    user_id = make_user()
+    first = log_vitals(client, user_id, 'key-1')
+    with app.app_context():
+        # As if the first request were still running
+        record = db.session.scalars(db.select(IdempotencyKey)).one()
+        record.status_code = record.response_body = None
+        record.created_at = datetime.utcnow()
+        db.session.commit()
+
+    assert log_vitals(client, user_id, 'key-1').status_code == 409
+
+    with app.app_context():
+        # ...and now as if it had crashed
+        db.session.scalars(db.select(IdempotencyKey)).one().created_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+
+    takeover = log_vitals(client, user_id, 'key-1')
+    assert takeover.status_code == 201
+    assert takeover.get_json()['vital_id'] != first.get_json()['vital_id']
+    assert log_vitals(client, user_id, 'key-1').headers['Idempotent-Replayed'] == 'true'
+
+
+def test_only_one_retry_takes_over_an_abandoned_key(app, client, make_user):
+    user_id = make_user()
+    log_vitals(client, user_id, 'key-1')
+    with app.app_context():
+        record = db.session.scalars(db.select(IdempotencyKey)).one()
+        record.status_code = record.response_body = None
+        record.created_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+        engine = db.engine
+
+    raced = []
+
+    def take_over_first(conn, cursor, statement, parameters, context, executemany):
+        # Another retry's takeover lands between this one's read and its UPDATE
+        if statement.startswith('UPDATE idempotency_keys') and not raced:
+            raced.append(statement)
+            with engine.connect() as other:
+                other.execute(db.update(IdempotencyKey).values(created_at=datetime.utcnow()))
+                other.commit()
+
+    event.listen(engine, 'before_cursor_execute', take_over_first)
+    try:
+        response = log_vitals(client, user_id, 'key-1')
+    finally:
+        event.remove(engine, 'before_cursor_execute', take_over_first)
+    assert raced
+    assert response.status_code == 409
+    assert count_vitals(app) == 1
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+from flask_migrate import downgrade, stamp, upgrade
+
+from database import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# Index each hot query should search, as the migration and the models declare it
+HOT_QUERIES = {
+    'ix_vital_records_user_id_recorded_at':
+        "SELECT * FROM vital_records WHERE user_id = 1 AND recorded_at >= '2026-01-01' "
+        "ORDER BY recorded_at DESC, id DESC LIMIT 50",
+    'ix_reminders_user_id_is_active_scheduled_time':
+        'SELECT * FROM reminders WHERE user_id = 1 AND is_active = 1 ORDER BY scheduled_time',
+    'ix_health_content_feed':
+        "SELECT * FROM health_content WHERE language = 'hindi' AND is_active = 1 "
+        "AND condition IN ('diabetes', 'general') ORDER BY priority, created_at DESC LIMIT 10",
+    'ix_health_workers_location':
+        "SELECT * FROM health_workers WHERE state = 'Maharashtra' AND district = 'Pune' "
+        'AND is_active = 1 AND verified = 1',
+    'ix_patient_worker_connections_user_id_status':
+        "SELECT * FROM patient_worker_connections WHERE user_id = 1 AND status = 'active'",
+    'ix_patient_worker_connections_health_worker_id_status':
+        "SELECT * FROM patient_worker_connections WHERE health_worker_id = 1 AND status = 'active'",
+}
+
+
+def query_plan(sql):
+    return ' '.join(row[3] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+
+
+def index_names():
+    inspector = db.inspect(db.engine)
+    return {index['name'] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+@pytest.mark.parametrize('index, sql', HOT_QUERIES.items())
+def test_hot_queries_search_their_index(app, index, sql):
+    with app.app_context():
+        assert f'USING INDEX {index} ' in query_plan(sql)
+
+
+def test_index_migration_creates_and_drops_the_indexes(app):
+    with app.app_context():
+        for index in HOT_QUERIES:
+            db.session.execute(db.text(f'DROP INDEX {index}'))
+        db.session.commit()
+        stamp(directory=MIGRATIONS, revision='e3d41416b2db')
+
+        upgrade(directory=MIGRATIONS, revision='1a7c2e9d4b10')
+        for index, sql in HOT_QUERIES.items():
+            assert f'USING INDEX {index} ' in query_plan(sql)
+
+        downgrade(directory=MIGRATIONS, revision='e3d41416b2db')
+        assert not index_names() & set(HOT_QUERIES)
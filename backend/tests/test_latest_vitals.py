@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+from database import db
+from models.latest_vitals import LatestVitals
+from models.vitals import VitalRecord
+from services import latest_vitals
+
+
+def log_batch(client, readings):
+    response = client.post('/api/vitals/log-batch', json=readings)
+    assert response.status_code == 201, response.get_json()
+    return [result['vital_id'] for result in response.get_json()['results']]
+
+
+def latest(client, user_id):
+    response = client.get(f'/api/vitals/user/{user_id}/latest')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_backfilled_reading_does_not_replace_newer_values(app, client, make_user):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    (newest,) = log_batch(client, [{'user_id': user_id, 'blood_sugar': 150, 'recorded_at': now.isoformat()}])
+    log_batch(client, [{'user_id': user_id, 'blood_sugar': 90, 'heart_rate': 70,
+                        'recorded_at': (now - timedelta(hours=2)).isoformat()}])
+
+    body = latest(client, user_id)
+    assert body['vital']['id'] == newest
+    assert body['latest_values']['blood_sugar']['value'] == 150
+    # The older reading still supplies the only heart rate
+    assert body['latest_values']['heart_rate'] == {
+        'value': 70, 'recorded_at': (now - timedelta(hours=2)).isoformat()
+    }
+    with app.app_context():
+        assert latest_vitals.check_consistency() == []
+
+
+def test_newest_reading_of_a_batch_wins_whatever_its_position(app, client, make_user):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    ids = log_batch(client, [
+        {'user_id': user_id, 'blood_sugar': 120, 'recorded_at': (now - timedelta(hours=1)).isoformat()},
+        {'user_id': user_id, 'blood_sugar': 130, 'recorded_at': now.isoformat()},
+        {'user_id': user_id, 'blood_sugar': 110, 'recorded_at': (now - timedelta(hours=3)).isoformat()},
+    ])
+
+    body = latest(client, user_id)
+    assert body['vital']['id'] == ids[1]
+    assert body['latest_values']['blood_sugar']['value'] == 130
+    with app.app_context():
+        assert latest_vitals.check_consistency() == []
+
+
+def test_reading_with_the_same_timestamp_replaces_the_earlier_one(app, client, make_user):
+    user_id = make_user()
+    recorded_at = datetime.utcnow().replace(microsecond=0).isoformat()
+    log_batch(client, [{'user_id': user_id, 'blood_sugar': 140, 'recorded_at': recorded_at}])
+    (later,) = log_batch(client, [{'user_id': user_id, 'blood_sugar': 145, 'recorded_at': recorded_at}])
+
+    body = latest(client, user_id)
+    assert body['vital']['id'] == later
+    assert body['latest_values']['blood_sugar']['value'] == 145
+    with app.app_context():
+        assert latest_vitals.check_consistency() == []
+
+
+def test_full_rebuild_drops_snapshots_of_users_without_vitals(app, client, make_user):
+    kept, emptied = make_user(), make_user()
+    log_batch(client, [{'user_id': kept, 'blood_sugar': 120}, {'user_id': emptied, 'blood_sugar': 180}])
+
+    with app.app_context():
+        db.session.execute(db.delete(VitalRecord).where(VitalRecord.user_id == emptied))
+        db.session.commit()
+        assert latest_vitals.check_consistency() == [(emptied, 'snapshot exists but user has no vitals')]
+
+        assert latest_vitals.rebuild() == 2
+        assert db.session.get(LatestVitals, emptied) is None
+        assert db.session.get(LatestVitals, kept).blood_sugar == 120
+        assert latest_vitals.check_consistency() == []
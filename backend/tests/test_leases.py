@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from database import claim_rows, db
+from models.notification import NotificationOutbox
+from models.reminder import Reminder
+from services.reminder_dispatcher import claim_reminders
+
+
+def make_due(app, reminder_ids, now):
+    with app.app_context():
+        db.session.execute(
+            db.update(Reminder).where(Reminder.id.in_(reminder_ids)).values(next_trigger=now - timedelta(minutes=1))
+        )
+        db.session.commit()
+
+
+def test_a_leased_reminder_is_claimed_by_one_worker_until_the_lease_lapses(app, make_user, make_reminder):
+    user_id = make_user()
+    reminder_ids = [make_reminder(user_id), make_reminder(user_id)]
+    now = datetime.utcnow()
+    make_due(app, reminder_ids, now)
+
+    with app.app_context():
+        assert sorted(claim_reminders(reminder_ids, 'worker-a', now, 60)) == reminder_ids
+        assert claim_reminders(reminder_ids, 'worker-b', now + timedelta(seconds=59), 60) == []
+        # worker-a crashed: its lease lapses and the reminders come back
+        assert sorted(claim_reminders(reminder_ids, 'worker-b', now + timedelta(seconds=60), 60)) == reminder_ids
+        owners = db.session.scalars(db.select(Reminder.claimed_by).where(Reminder.id.in_(reminder_ids))).all()
+        assert owners == ['worker-b', 'worker-b']
+
+
+def test_concurrent_claims_never_share_a_row(app, make_user):
+    user_id = make_user()
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(db.insert(NotificationOutbox), [
+            {'user_id': user_id, 'channel': 'file', 'recipient': 'x', 'message': f'message {i}',
+             'status': 'pending', 'attempts': 0, 'next_attempt_at': now}
+            for i in range(40)
+        ])
+        db.session.commit()
+    table = NotificationOutbox.__table__
+
+    def claim(owner):
+        with app.app_context():
+            claimed = []
+            while True:
+                ids = claim_rows(
+                    table,
+                    [table.c.claimed_by.is_(None)],
+                    {'claimed_by': owner},
+                    order_by=[table.c.next_attempt_at],
+                    limit=3
+                )
+                db.session.commit()
+                if not ids:
+                    return claimed
+                claimed.extend(ids)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        batches = list(executor.map(claim, [f'worker-{i}' for i in range(4)]))
+
+    claimed = [row_id for batch in batches for row_id in batch]
+    assert len(claimed) == len(set(claimed)) == 40
+    with app.app_context():
+        owners = dict(db.session.execute(db.select(table.c.id, table.c.claimed_by)).all())
+    for i, batch in enumerate(batches):
+        assert all(owners[row_id] == f'worker-{i}' for row_id in batch)
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from database import db
+from models.notification import NotificationOutbox
+from models.reminder import Reminder
+from models.reminder_event import ReminderEvent
+from services.notifications import Transport, claim_batch, deliver_batch, enqueue_reminders, register_transport
+
+
+class FailingTransport(Transport):
+    name = 'sms'
+
+    def deliver(self, message):
+        raise RuntimeError('gateway down')
+
+
+def enqueue(app, reminder_ids, now=None):
+    with app.app_context():
+        enqueue_reminders([db.session.get(Reminder, reminder_id) for reminder_id in reminder_ids], now)
+        db.session.commit()
+
+
+def deliver(app, owner='worker-1'):
+    with app.app_context():
+        messages = claim_batch(owner, 10, 300)
+        return len(messages), deliver_batch(messages, owner, app.extensions['notification_transports'])
+
+
+def test_push_goes_to_the_device_token_and_falls_back_to_sms_without_one(app, client, make_user, make_reminder):
+    app.config['REMINDER_CHANNEL'] = 'push'
+    with_token, without_token = make_user(), make_user()
+    response = client.put(f'/api/auth/users/{with_token}', json={'push_token': 'device-token-1'})
+    assert response.get_json()['user']['push_enabled'] is True
+
+    enqueue(app, [make_reminder(with_token), make_reminder(without_token)])
+
+    with app.app_context():
+        rows = {row.user_id: (row.channel, row.recipient) for row in db.session.scalars(db.select(NotificationOutbox))}
+    phone = client.get(f'/api/auth/users/{without_token}').get_json()['user']['phone']
+    assert rows == {with_token: ('push', 'device-token-1'), without_token: ('sms', phone)}
+
+
+def test_messages_are_queued_at_the_time_the_reminders_fired(app, make_user, make_reminder):
+    fired_at = datetime(2026, 10, 18, 9, 30)
+    enqueue(app, [make_reminder(make_user())], fired_at)
+
+    with app.app_context():
+        row = db.session.scalars(db.select(NotificationOutbox)).one()
+        assert (row.created_at, row.next_attempt_at) == (fired_at, fired_at)
+
+
+def test_failed_delivery_is_retried_with_backoff_then_dead_lettered(app, make_user, make_reminder):
+    app.config['REMINDER_CHANNEL'] = 'sms'
+    register_transport(app, FailingTransport(rate_per_second=None, max_attempts=2))
+    enqueue(app, [make_reminder(make_user())])
+
+    assert deliver(app) == (1, {'sent': 0, 'retried': 1, 'dead': 0})
+    with app.app_context():
+        row = db.session.scalars(db.select(NotificationOutbox)).one()
+        assert (row.status, row.attempts, row.last_error, row.claimed_by) == ('pending', 1, 'gateway down', None)
+        assert row.next_attempt_at > datetime.utcnow()
+
+    # Not due again until the backoff has passed
+    assert deliver(app) == (0, {'sent': 0, 'retried': 0, 'dead': 0})
+    with app.app_context():
+        row = db.session.scalars(db.select(NotificationOutbox)).one()
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    assert deliver(app) == (1, {'sent': 0, 'retried': 0, 'dead': 1})
+    with app.app_context():
+        row = db.session.scalars(db.select(NotificationOutbox)).one()
+        assert (row.status, row.attempts) == ('dead', 2)
+        assert db.session.scalar(db.select(db.func.count()).select_from(ReminderEvent)) == 0
+
+
+def test_delivered_message_is_marked_sent_and_recorded(app, make_user, make_reminder):
+    reminder_id = make_reminder(make_user())
+    enqueue(app, [reminder_id])
+
+    assert deliver(app) == (1, {'sent': 1, 'retried': 0, 'dead': 0})
+    with app.app_context():
+        row = db.session.scalars(db.select(NotificationOutbox)).one()
+        assert (row.status, row.attempts, row.claimed_by) == ('sent', 1, None)
+        event = db.session.scalars(db.select(ReminderEvent)).one()
+        assert (event.reminder_id, event.event_type, event.notification_id) == (reminder_id, 'delivered', row.id)
@@ -0,0 +1,96 @@
+from datetime import datetime, time
+from types import SimpleNamespace
+
+import pytest
+
+from services.recurrence import calculate_next_trigger, next_triggers, weekday_mask
+
+
+def reminder(frequency, at='09:00', days_of_week=None, created_at=datetime(2026, 10, 14, 12), tz='UTC'):
+    hour, minute = map(int, at.split(':'))
+    return SimpleNamespace(frequency=frequency, scheduled_time=time(hour, minute), days_of_week=days_of_week,
+                           created_at=created_at, timezone=tz)
+
+
+def test_weekday_mask_accepts_names_and_abbreviations():
+    assert weekday_mask('["monday", "Thu", " SUNDAY "]') == 0b1001001
+    assert weekday_mask('[]') == weekday_mask(None) == 0
+
+
+@pytest.mark.parametrize('now, expected', [
+    # 2026-10-19 is a Monday
+    (datetime(2026, 10, 19, 8, 0), datetime(2026, 10, 19, 9, 0)),
+    (datetime(2026, 10, 19, 10, 0), datetime(2026, 10, 22, 9, 0)),
+    # Strictly after now: an occurrence at now is the one being fired
+    (datetime(2026, 10, 22, 9, 0), datetime(2026, 10, 26, 9, 0)),
+    (datetime(2026, 10, 24, 0, 0), datetime(2026, 10, 26, 9, 0)),
+])
+def test_weekly_on_listed_days(now, expected):
+    assert calculate_next_trigger(reminder('weekly', days_of_week='["monday", "thursday"]'), now) == expected
+
+
+def test_weekly_without_days_repeats_on_the_weekday_it_was_created():
+    # Created on Wednesday 2026-10-14
+    assert calculate_next_trigger(reminder('weekly'), datetime(2026, 10, 18, 12)) == datetime(2026, 10, 21, 9, 0)
+
+
+@pytest.mark.parametrize('now, expected', [
+    (datetime(2026, 2, 10), datetime(2026, 2, 28, 9, 0)),
+    (datetime(2026, 2, 28, 10, 0), datetime(2026, 3, 31, 9, 0)),
+    (datetime(2026, 4, 30, 9, 0), datetime(2026, 5, 31, 9, 0)),
+    (datetime(2026, 12, 31, 10, 0), datetime(2027, 1, 31, 9, 0)),
+    (datetime(2028, 2, 1), datetime(2028, 2, 29, 9, 0)),
+])
+def test_monthly_on_the_31st_is_clamped_to_short_months(now, expected):
+    assert calculate_next_trigger(reminder('monthly', created_at=datetime(2026, 1, 31, 8)), now) == expected
+
+
+def test_custom_without_valid_days_fires_daily():
+    now = datetime(2026, 10, 19, 10, 0)
+    assert calculate_next_trigger(reminder('custom', days_of_week='["someday"]'), now) == datetime(2026, 10, 20, 9, 0)
+
+
+def test_batch_matches_one_at_a_time():
+    now = datetime(2026, 10, 19, 10, 0)
+    reminders = [
+        reminder('daily'), reminder('weekly', days_of_week='["fri"]'), reminder('daily'),
+        reminder('monthly', created_at=datetime(2026, 1, 31)), reminder('daily', at='23:45'),
+    ]
+    assert next_triggers(reminders, now) == [calculate_next_trigger(r, now) for r in reminders]
+
+
+def test_local_schedule_is_stored_in_utc():
+    # 09:00 in Kolkata (UTC+5:30)
+    now = datetime(2026, 10, 19, 1, 0)
+    assert calculate_next_trigger(reminder('daily', tz='Asia/Kolkata'), now) == datetime(2026, 10, 19, 3, 30)
+    assert calculate_next_trigger(reminder('daily', tz='Asia/Kolkata'), datetime(2026, 10, 19, 3, 30)) == \
+        datetime(2026, 10, 20, 3, 30)
+
+
+def test_time_skipped_when_clocks_go_forward_fires_at_the_shifted_time():
+    # New York skips 02:00-03:00 on 2026-03-08; 02:30 EST is 03:30 EDT
+    daily = reminder('daily', at='02:30', tz='America/New_York')
+    assert calculate_next_trigger(daily, datetime(2026, 3, 8, 6, 0)) == datetime(2026, 3, 8, 7, 30)
+    # Back to 02:30 EDT the next day
+    assert calculate_next_trigger(daily, datetime(2026, 3, 8, 7, 30)) == datetime(2026, 3, 9, 6, 30)
+
+
+def test_time_repeated_when_clocks_go_back_fires_once():
+    # New York repeats 01:00-02:00 on 2026-11-01: 01:30 EDT is 05:30 UTC, 01:30 EST 06:30 UTC
+    daily = reminder('daily', at='01:30', tz='America/New_York')
+    assert calculate_next_trigger(daily, datetime(2026, 11, 1, 4, 0)) == datetime(2026, 11, 1, 5, 30)
+    assert calculate_next_trigger(daily, datetime(2026, 11, 1, 5, 30)) == datetime(2026, 11, 2, 6, 30)
+    # Inside the repeated hour the first 01:30 has passed
+    assert calculate_next_trigger(daily, datetime(2026, 11, 1, 6, 0)) == datetime(2026, 11, 2, 6, 30)
+
+
+def test_weekly_schedule_keeps_its_local_weekday_across_midnight_utc():
+    # Monday 04:00 in Kolkata is Sunday 22:30 UTC
+    weekly = reminder('weekly', at='04:00', days_of_week='["monday"]', tz='Asia/Kolkata')
+    assert calculate_next_trigger(weekly, datetime(2026, 10, 18, 12, 0)) == datetime(2026, 10, 18, 22, 30)
+
+
+def test_unknown_timezone_falls_back_to_the_default():
+    now = datetime(2026, 10, 19, 1, 0)
+    assert calculate_next_trigger(reminder('daily', tz='Mars/Olympus'), now) == \
+        calculate_next_trigger(reminder('daily', tz='Asia/Kolkata'), now)
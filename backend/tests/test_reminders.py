@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+
+from database import db
+from models.notification import NotificationOutbox
+from models.reminder import Reminder
+from models.reminder_event import ReminderEvent
+from services.recurrence import to_local
+
+
+def test_manual_trigger_keeps_schedule_and_pending_dose(app, client, make_user, make_reminder):
+    reminder_id = make_reminder(make_user())
+    next_trigger = datetime.utcnow().replace(microsecond=0) + timedelta(hours=6)
+    with app.app_context():
+        db.session.get(Reminder, reminder_id).next_trigger = next_trigger
+        db.session.commit()
+
+    response = client.post(f'/api/reminders/trigger/{reminder_id}')
+    assert response.status_code == 200
+
+    with app.app_context():
+        reminder = db.session.get(Reminder, reminder_id)
+        assert reminder.next_trigger == next_trigger
+        assert reminder.pending_occurrence is None
+        assert reminder.claimed_by is None
+        assert reminder.last_triggered is not None
+        # The notification is sent, but no dose is recorded as fired
+        assert db.session.scalar(db.select(db.func.count()).select_from(NotificationOutbox)) == 1
+        assert db.session.scalar(db.select(db.func.count()).select_from(ReminderEvent)) == 0
+
+
+def test_timezone_change_keeps_wall_clock_times(app, client, make_user, make_reminder):
+    user_id = make_user()
+    reminder_id = make_reminder(user_id, scheduled_time='09:30')
+
+    response = client.put(f'/api/auth/users/{user_id}', json={'timezone': 'Europe/London'})
+    assert response.status_code == 200, response.get_json()
+
+    with app.app_context():
+        reminder = db.session.get(Reminder, reminder_id)
+        assert reminder.timezone == 'Europe/London'
+        assert to_local(reminder.next_trigger, 'Europe/London').time() == time(9, 30)
+        assert reminder.next_trigger > datetime.utcnow()
+
+    assert client.put(f'/api/auth/users/{user_id}', json={'timezone': 'Europe/Atlantis'}).status_code == 400
+
+
+TEMPLATE = {
+    'title': 'Amlodipine', 'reminder_type': 'medication', 'medication_name': 'Amlodipine',
+    'dosage': '5mg', 'scheduled_time': '20:00', 'frequency': 'daily',
+}
+
+
+def test_create_batch_applies_a_template_to_many_patients(app, client, make_user):
+    user_ids = [make_user(), make_user(timezone='Asia/Kolkata')]
+
+    response = client.post('/api/reminders/create-batch', json={'template': TEMPLATE, 'user_ids': user_ids})
+
+    assert response.status_code == 201, response.get_json()
+    created = response.get_json()['reminders']
+    assert [reminder['user_id'] for reminder in created] == user_ids
+    with app.app_context():
+        for reminder in created:
+            row = db.session.get(Reminder, reminder['id'])
+            assert row.next_trigger > datetime.utcnow()
+            assert to_local(row.next_trigger, row.timezone).time() == time(20, 0)
+
+
+def test_create_batch_is_all_or_nothing(app, client, make_user):
+    user_id = make_user()
+
+    response = client.post('/api/reminders/create-batch', json={'user_id': user_id, 'reminders': [
+        TEMPLATE, dict(TEMPLATE, scheduled_time='25:00'), dict(TEMPLATE, title=''), dict(TEMPLATE, user_id=999),
+    ]})
+
+    assert response.status_code == 400
+    assert [error['index'] for error in response.get_json()['errors']] == [1, 2, 3]
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Reminder)) == 0
+
+
+def test_update_batch_reschedules_every_reminder(app, client, make_user, make_reminder):
+    user_id = make_user()
+    reminder_ids = [make_reminder(user_id), make_reminder(user_id)]
+
+    response = client.post('/api/reminders/update-batch',
+                           json={'reminder_ids': reminder_ids, 'changes': {'scheduled_time': '07:15'}})
+
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        for reminder_id in reminder_ids:
+            row = db.session.get(Reminder, reminder_id)
+            assert row.scheduled_time == time(7, 15)
+            assert to_local(row.next_trigger, row.timezone).time() == time(7, 15)
+
+    rejected = client.post('/api/reminders/update-batch', json={'updates': [
+        {'id': reminder_ids[0], 'dosage': '850mg'}, {'id': 999, 'dosage': '850mg'},
+    ]})
+    assert rejected.status_code == 400
+    with app.app_context():
+        assert db.session.get(Reminder, reminder_ids[0]).dosage == '500mg'
+
+
+def test_deactivate_batch_stops_one_medication_for_many_patients(app, client, make_user, make_reminder):
+    user_ids = [make_user(), make_user()]
+    metformin = [make_reminder(user_id) for user_id in user_ids]
+    amlodipine = [make_reminder(user_id, **TEMPLATE) for user_id in user_ids]
+
+    response = client.post('/api/reminders/deactivate-batch',
+                           json={'user_ids': user_ids, 'medication_name': 'Metformin'})
+
+    assert response.status_code == 200, response.get_json()
+    assert sorted(response.get_json()['reminder_ids']) == sorted(metformin)
+    with app.app_context():
+        active = db.session.scalars(db.select(Reminder.id).where(Reminder.is_active == True)).all()
+        assert sorted(active) == sorted(amlodipine)
+    assert client.post('/api/reminders/deactivate-batch', json={}).status_code == 400
@@ -0,0 +1,71 @@
+import numpy as np
+
+from services import screening
+
+
+def log_vitals(client, user_id, **fields):
+    response = client.post('/api/vitals/log', json=dict(fields, user_id=user_id))
+    assert response.status_code == 201, response.get_json()
+
+
+def screen(client, query=''):
+    response = client.get(f'/api/vitals/screening{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_rules_compare_missing_readings_as_unflagged():
+    rows = [
+        (1, 'before', 150, 120, 80, 97, None),
+        (2, 'after', 150, None, None, 91, None),
+        (3, None, None, 150, 95, None, 38.5),
+    ]
+    user_ids, _, masks = screening.screen(rows, list(screening.RULES), dict(screening.DEFAULT_THRESHOLDS))
+
+    flagged = {rule: user_ids[mask].tolist() for rule, mask in masks.items()}
+    assert flagged == {
+        'high_bp': [3], 'low_bp': [], 'high_fasting_sugar': [1], 'high_post_meal_sugar': [],
+        'low_oxygen': [2], 'fever': [3],
+    }
+
+
+def test_empty_cohort():
+    user_ids, _, masks = screening.screen([], screening.DEFAULT_RULES, dict(screening.DEFAULT_THRESHOLDS))
+    assert len(user_ids) == 0 and all(not np.any(mask) for mask in masks.values())
+
+
+def test_screening_flags_a_districts_patients_by_their_latest_vitals(client, make_user):
+    worst = make_user(name='Asha')
+    improved = make_user(name='Meera')
+    elsewhere = make_user(name='Kavita', district='Nashik')
+    log_vitals(client, worst, blood_pressure_systolic=160, blood_pressure_diastolic=100)
+    log_vitals(client, worst, oxygen_level=90)
+    log_vitals(client, improved, blood_pressure_systolic=170, blood_pressure_diastolic=105)
+    log_vitals(client, improved, blood_pressure_systolic=120, blood_pressure_diastolic=80)
+    log_vitals(client, elsewhere, oxygen_level=88)
+
+    body = screen(client, '?district=Pune')
+
+    assert body['cohort_size'] == 2
+    assert body['flagged_count'] == 1
+    (patient,) = body['patients']
+    assert patient['name'] == 'Asha'
+    assert patient['flags'] == ['high_bp', 'low_oxygen']
+    assert patient['latest_values']['blood_sugar'] is None
+
+
+def test_thresholds_can_be_overridden_per_request(client, make_user):
+    user_id = make_user()
+    log_vitals(client, user_id, blood_pressure_systolic=135, blood_pressure_diastolic=85)
+
+    assert screen(client)['flagged_count'] == 0
+    body = screen(client, '?rules=high_bp&systolic_max=130')
+    assert [patient['user_id'] for patient in body['patients']] == [user_id]
+    assert body['rules'] == {'high_bp': 'Blood pressure above 130/90'}
+
+
+def test_unknown_rules_and_bad_thresholds_are_rejected(client):
+    assert client.get('/api/vitals/screening?rules=high_bp,obesity').status_code == 400
+    assert client.get('/api/vitals/screening?oxygen_min=low').status_code == 400
+    for limit in [0, -1, 1001]:
+        assert client.get(f'/api/vitals/screening?limit={limit}').status_code == 400
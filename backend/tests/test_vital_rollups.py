@@ -0,0 +1,42 @@
+from database import db
+from models.vital_rollup import VitalDailyRollup
+from models.vitals import VitalRecord
+from services import vital_rollups
+
+
+def log_vitals(client, user_id, blood_sugar):
+    response = client.post('/api/vitals/log', json={'user_id': user_id, 'blood_sugar': blood_sugar})
+    assert response.status_code == 201, response.get_json()
+
+
+def rollups(user_id):
+    return [(row.record_count, row.blood_sugar_sum) for row in db.session.scalars(
+        db.select(VitalDailyRollup).where(VitalDailyRollup.user_id == user_id))]
+
+
+def test_full_rebuild_recomputes_rollups_and_drops_those_without_readings(app, client, make_user):
+    kept, emptied = make_user(), make_user()
+    for user_id, blood_sugar in [(kept, 100), (kept, 140), (emptied, 180)]:
+        log_vitals(client, user_id, blood_sugar)
+
+    with app.app_context():
+        db.session.execute(db.update(VitalDailyRollup).where(VitalDailyRollup.user_id == kept).values(record_count=99))
+        db.session.execute(db.delete(VitalRecord).where(VitalRecord.user_id == emptied))
+        db.session.commit()
+        assert rollups(emptied) == [(1, 180)]
+
+        assert vital_rollups.rebuild() == 2
+        assert rollups(kept) == [(2, 240)]
+        assert rollups(emptied) == []
+
+
+def test_rebuild_of_named_users_drops_their_stale_rollups(app, client, make_user):
+    user_id = make_user()
+    log_vitals(client, user_id, 120)
+
+    with app.app_context():
+        db.session.execute(db.delete(VitalRecord).where(VitalRecord.user_id == user_id))
+        db.session.commit()
+
+        assert vital_rollups.rebuild([user_id]) == 1
+        assert rollups(user_id) == []
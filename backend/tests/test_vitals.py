@@ -0,0 +1,53 @@
+import json
+from datetime import datetime, timedelta
+
+
+def test_log_batch_rejects_bad_items_and_keeps_the_rest(client, make_user):
+    user_id = make_user()
+    recorded_at = (datetime.utcnow() - timedelta(hours=2)).replace(microsecond=0).isoformat() + 'Z'
+    readings = [
+        {'user_id': user_id, 'blood_sugar': 110, 'recorded_at': recorded_at},
+        {'user_id': user_id, 'blood_sugar': 120, 'recorded_at': 1760000000},
+        {'user_id': user_id, 'blood_sugar': 130, 'recorded_at': {'date': '2026-10-18'}},
+        {'user_id': user_id, 'blood_sugar': 140, 'recorded_at': 'yesterday'},
+        {'user_id': 999999, 'blood_sugar': 150},
+        'not a reading',
+        {'user_id': user_id, 'blood_pressure_systolic': 130, 'blood_pressure_diastolic': 85},
+    ]
+
+    response = client.post('/api/vitals/log-batch', json=readings)
+
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert body['accepted'] == 2
+    assert body['rejected'] == 5
+    statuses = [(result['index'], result['status']) for result in body['results']]
+    assert statuses == [(0, 'accepted'), (1, 'rejected'), (2, 'rejected'), (3, 'rejected'),
+                        (4, 'rejected'), (5, 'rejected'), (6, 'accepted')]
+    assert 'ISO-8601' in body['results'][1]['error']
+
+    vitals = client.get(f'/api/vitals/user/{user_id}').get_json()['vitals']
+    assert sorted(vital['blood_sugar'] for vital in vitals if vital['blood_sugar']) == [110]
+    assert len(vitals) == 2
+
+
+def test_log_batch_ndjson_rejects_invalid_lines(client, make_user):
+    user_id = make_user()
+    body = '\n'.join([
+        json.dumps({'user_id': user_id, 'heart_rate': 72}),
+        '{not json',
+        json.dumps({'user_id': user_id, 'heart_rate': 'fast'}),
+    ])
+
+    response = client.post('/api/vitals/log-batch', data=body, content_type='application/x-ndjson')
+
+    body = response.get_json()
+    assert response.status_code == 201, body
+    assert [result['status'] for result in body['results']] == ['accepted', 'rejected', 'rejected']
+
+
+def test_log_batch_with_only_invalid_items_is_a_bad_request(client):
+    response = client.post('/api/vitals/log-batch', json=[{'blood_sugar': 100}])
+
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'] == 'user_id is required'
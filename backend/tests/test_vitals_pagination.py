@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+
+def log_batch(client, user_id, recorded_ats):
+    response = client.post('/api/vitals/log-batch', json=[
+        {'user_id': user_id, 'blood_sugar': 100 + i, 'recorded_at': recorded_at.isoformat()}
+        for i, recorded_at in enumerate(recorded_ats)
+    ])
+    assert response.status_code == 201, response.get_json()
+    return [result['vital_id'] for result in response.get_json()['results']]
+
+
+def walk(client, user_id, limit):
+    """Vital ids of every page, following next_cursor from the first"""
+    pages, url = [], f'/api/vitals/user/{user_id}?limit={limit}'
+    while True:
+        body = client.get(url).get_json()
+        pages.append([vital['id'] for vital in body['vitals']])
+        if not body['next_cursor']:
+            return pages
+        url = f'/api/vitals/user/{user_id}?limit={limit}&before={body["next_cursor"]}'
+
+
+def test_pages_split_ties_on_recorded_at_without_skipping_or_repeating(client, make_user):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    # Five readings share one timestamp, so pages of two break inside the tie
+    tied = log_batch(client, user_id, [now - timedelta(hours=1)] * 5)
+    newer = log_batch(client, user_id, [now - timedelta(minutes=5)])
+    older = log_batch(client, user_id, [now - timedelta(days=3)])
+
+    pages = walk(client, user_id, 2)
+
+    walked = [vital_id for page in pages for vital_id in page]
+    assert walked == newer + sorted(tied, reverse=True) + older
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+
+def test_a_full_last_page_is_followed_by_an_empty_one(client, make_user):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    log_batch(client, user_id, [now - timedelta(minutes=i) for i in range(1, 5)])
+
+    assert [len(page) for page in walk(client, user_id, 2)] == [2, 2, 0]
+
+
+def test_cursor_walks_past_the_default_window(client, make_user):
+    user_id = make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    recent = log_batch(client, user_id, [now - timedelta(days=1)])
+    old = log_batch(client, user_id, [now - timedelta(days=45)])
+
+    first = client.get(f'/api/vitals/user/{user_id}?limit=1').get_json()
+    assert [vital['id'] for vital in first['vitals']] == recent
+    second = client.get(f'/api/vitals/user/{user_id}?limit=1&before={first["next_cursor"]}').get_json()
+    assert [vital['id'] for vital in second['vitals']] == old
+    # Without a cursor the 30 day window still applies
+    assert client.get(f'/api/vitals/user/{user_id}').get_json()['count'] == 1
+
+
+def test_malformed_cursor_is_rejected(client, make_user):
+    user_id = make_user()
+    for before in ['yesterday', '2026-10-18T09:30:00', '2026-10-18T09:30:00,abc']:
+        assert client.get(f'/api/vitals/user/{user_id}?before={before}').status_code == 400
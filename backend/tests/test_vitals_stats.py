@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+
+def log_batch(client, readings):
+    response = client.post('/api/vitals/log-batch', json=readings)
+    assert response.status_code == 201, response.get_json()
+
+
+def stats(client, user_id, query=''):
+    response = client.get(f'/api/vitals/user/{user_id}/stats{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['stats']
+
+
+def test_stats_aggregate_each_metric_over_the_window(client, make_user):
+    user_id = make_user()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    log_batch(client, [
+        {'user_id': user_id, 'blood_sugar': 100, 'recorded_at': today.isoformat()},
+        {'user_id': user_id, 'blood_sugar': 160, 'heart_rate': 80, 'recorded_at': today.isoformat()},
+        {'user_id': user_id, 'blood_pressure_systolic': 130, 'blood_pressure_diastolic': 85,
+         'recorded_at': (today - timedelta(days=2)).isoformat()},
+        # Outside a seven day window
+        {'user_id': user_id, 'blood_sugar': 300, 'recorded_at': (today - timedelta(days=10)).isoformat()},
+    ])
+
+    body = stats(client, user_id, '?days=7')
+
+    assert body['total_records'] == 3
+    assert body['blood_sugar'] == {'average': 130.0, 'min': 100, 'max': 160, 'count': 2}
+    assert body['heart_rate']['count'] == 1
+    assert body['blood_pressure']['systolic']['average'] == 130.0
+    assert body['blood_pressure']['count'] == 1
+    assert 'weight' not in body
+    assert stats(client, user_id)['blood_sugar']['max'] == 300
+
+
+def test_stats_group_by_day(client, make_user):
+    user_id = make_user()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    log_batch(client, [
+        {'user_id': user_id, 'blood_sugar': 100, 'recorded_at': (today - timedelta(days=1)).isoformat()},
+        {'user_id': user_id, 'blood_sugar': 120, 'measurement_time': 'evening',
+         'recorded_at': (today - timedelta(days=1)).isoformat()},
+        {'user_id': user_id, 'blood_sugar': 150, 'recorded_at': today.isoformat()},
+    ])
+
+    body = stats(client, user_id, '?days=7&group_by=day')
+
+    assert [bucket['start'] for bucket in body['buckets']] == [
+        (today - timedelta(days=1)).date().isoformat(), today.date().isoformat()
+    ]
+    # Rollups of different measurement times are combined into one bucket per day
+    assert [bucket['total_records'] for bucket in body['buckets']] == [2, 1]
+    assert body['buckets'][0]['blood_sugar']['average'] == 110.0
+
+
+def test_stats_reject_bad_parameters_and_report_no_data(client, make_user):
+    user_id = make_user()
+    assert client.get(f'/api/vitals/user/{user_id}/stats?days=0').status_code == 400
+    assert client.get(f'/api/vitals/user/{user_id}/stats?group_by=month').status_code == 400
+    assert client.get(f'/api/vitals/user/{user_id}/stats').status_code == 404
+    assert client.get('/api/vitals/user/999/stats').status_code == 404